@@ -1,4 +1,3 @@
-import requests
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -6,6 +5,12 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 
+from ons_charts import LARGURA_TV_PX, orcamento_pontos, reduzir_serie
+from ons_cliente import obter_cache_swr
+from ons_fetch import URLS_GERACAO, URLS_SIN, colunas_do_payload
+from ons_series import SeriesCompactas
+from ons_metricas import cache_instrumentado, iniciar_servidor_metricas
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Geração Energética",
@@ -13,6 +18,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# /metrics do processo (ONS_METRICAS_PORTA)
+iniciar_servidor_metricas()
+
 # CSS customizado para melhorar a aparência
 st.markdown("""
 <style>
@@ -46,25 +54,35 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Função para obter dados e cachear por 20 segundos
-@st.cache_data(ttl=20)
-def get_data(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data)
-        
-        # Ajustando o formato da data
-        df['instante'] = pd.to_datetime(df['instante'])
-        
-        # Convertendo geração para MW
-        df['geracao'] = df['geracao'] / 60
-        
-        return df
-    except Exception as e:
-        st.error(f"Erro ao obter dados: {e}")
-        return pd.DataFrame()
+# Função para obter dados: o cache SWR devolve na hora o último payload válido
+# e revalida em segundo plano. Todas as séries ficam num único bloco compacto
+# (minutos int32 + float32) compartilhado pelas sessões; cada DataFrame é uma view
+@cache_instrumentado('carregar_series', st.cache_resource(ttl=5, max_entries=2))
+def carregar_series(fontes):
+    cache = obter_cache_swr()
+    resultados = {chave: cache.obter(url) for chave, url in fontes}
+    # A versão de cada payload só muda com conteúdo novo: sem novidade, o bloco e as figuras são reaproveitados
+    versao = tuple((chave, resultado.versao) for chave, resultado in resultados.items())
+    series, invalidos = montar_series(resultados, versao)
+    for chave in invalidos:
+        resultados[chave] = resultados[chave]._replace(payload=None)
+    return series, resultados, versao
+
+@st.cache_resource(max_entries=2)
+def montar_series(_resultados, versao):
+    colunas, invalidos = {}, []
+    for chave, resultado in _resultados.items():
+        if resultado.payload is None:
+            continue
+        try:
+            # Colunas tipadas direto do payload (formato de data conhecido)
+            dados = colunas_do_payload(resultado.payload, 'geracao')
+            
+            # Convertendo geração para MW
+            colunas[chave] = (dados.instantes, dados.valores / 60)
+        except Exception:
+            invalidos.append(chave)
+    return SeriesCompactas.de_colunas(colunas), invalidos
 
 # Função para calcular tendência
 def calcular_tendencia(df, janela=10):
@@ -87,36 +105,162 @@ def calcular_tendencia(df, janela=10):
     else:
         return coef, "stable"
 
-# URLs das fontes de dados
-urls = {
-    'Eólica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SIN_Eolica_json",
-    'Solar': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SIN_Solar_json",
-    'Hidráulica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SIN_Hidraulica_json",
-    'Nuclear': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SIN_Nuclear_json",
-    'Térmica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SIN_Termica_json"
+# Cores personalizadas para cada fonte
+cores_fontes = {
+    'Eólica': '#00a8ff',
+    'Solar': '#fbc531', 
+    'Hidráulica': '#44bd32',
+    'Nuclear': '#e84118',
+    'Térmica': '#8c7ae6'
+}
+
+# Cores para regiões
+cores_regionais = {
+    'Norte Eólica': '#3742fa', 'Norte Solar': '#ffa502',
+    'Nordeste Eólica': '#2ed573', 'Nordeste Solar': '#ff6348',
+    'Sudeste/CO Eólica': '#5352ed', 'Sudeste/CO Solar': '#ff9f43',
+    'Sul Eólica': '#2f3542', 'Sul Solar': '#ff3838'
 }
 
+# Figuras compartilhadas pelas sessões, refeitas só quando a versão das séries muda
+@st.cache_resource(max_entries=2)
+def figura_rosca(_dataframes, total_gwh, versao):
+    df_composicao = pd.DataFrame({
+        'Fonte': list(_dataframes.keys()),
+        'Geração (MW)': [df['geracao'].iloc[-1] for df in _dataframes.values()]
+    })
+    
+    fig_rosca = go.Figure(data=[go.Pie(
+        labels=df_composicao['Fonte'],
+        values=df_composicao['Geração (MW)'],
+        hole=.6,
+        marker=dict(colors=[cores_fontes[fonte] for fonte in df_composicao['Fonte']]),
+        textinfo='label+percent',
+        textfont=dict(size=12),
+        hovertemplate='<b>%{label}</b><br>Geração: %{value:.0f} MW<br>Percentual: %{percent}<extra></extra>'
+    )])
+    
+    fig_rosca.add_annotation(
+        dict(
+            text=f'<b>{total_gwh:.2f} GW</b><br>Total SIN',
+            x=0.5, y=0.5,
+            font=dict(size=18, color='#2c3e50'),
+            showarrow=False
+        )
+    )
+    
+    fig_rosca.update_layout(
+        height=400,
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.1, xanchor="center", x=0.5),
+        margin=dict(t=20, b=20, l=20, r=20)
+    )
+    return fig_rosca
+
+@st.cache_resource(max_entries=2)
+def figura_evolucao(_dataframes, versao):
+    fig_evolucao = go.Figure()
+    
+    for fonte, df in _dataframes.items():
+        if len(df) > 0:
+            # Reduzir à largura da coluna (metade da tela) sem perder picos e vales
+            df = reduzir_serie(df, 'geracao', orcamento_pontos(LARGURA_TV_PX // 2))
+            fig_evolucao.add_trace(go.Scatter(
+                x=df['instante'],
+                y=df['geracao'],
+                mode='lines',
+                name=fonte,
+                line=dict(color=cores_fontes[fonte], width=3),
+                hovertemplate=f'<b>{fonte}</b><br>Hora: %{{x}}<br>Geração: %{{y:.0f}} MW<extra></extra>'
+            ))
+    
+    fig_evolucao.update_layout(
+        height=400,
+        xaxis_title="Horário",
+        yaxis_title="Geração (MW)",
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5),
+        margin=dict(t=20, b=60, l=50, r=20)
+    )
+    
+    fig_evolucao.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+    fig_evolucao.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+    return fig_evolucao
+
+@st.cache_resource(max_entries=2)
+def figura_regional(_dataframes_regionais, versao):
+    fig_regional = go.Figure()
+    
+    for nome, df in _dataframes_regionais.items():
+        if len(df) > 0:
+            df = reduzir_serie(df, 'geracao', orcamento_pontos(LARGURA_TV_PX))
+            fig_regional.add_trace(go.Scatter(
+                x=df['instante'],
+                y=df['geracao'],
+                mode='lines',
+                name=nome,
+                line=dict(color=cores_regionais.get(nome, '#95a5a6'), width=2.5),
+                hovertemplate=f'<b>{nome}</b><br>Hora: %{{x}}<br>Geração: %{{y:.0f}} MW<extra></extra>'
+            ))
+    
+    fig_regional.update_layout(
+        height=500,
+        xaxis_title="Horário",
+        yaxis_title="Geração (MW)",
+        hovermode='x unified',
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5,
+            font=dict(size=10)
+        ),
+        margin=dict(t=20, b=80, l=50, r=20)
+    )
+    
+    fig_regional.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+    fig_regional.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
+    return fig_regional
+
+# URLs das fontes de dados
+urls = URLS_SIN
+
 urls_regionais = {
-    'Norte Eólica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Eolica_json",
-    'Norte Solar': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Solar_json",
-    'Nordeste Eólica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Eolica_json",
-    'Nordeste Solar': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Solar_json",
-    'Sudeste/CO Eólica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Eolica_json",
-    'Sudeste/CO Solar': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Solar_json",
-    'Sul Eólica': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Eolica_json",
-    'Sul Solar': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Solar_json"
+    'Norte Eólica': URLS_GERACAO['Eólica']['Norte'],
+    'Norte Solar': URLS_GERACAO['Solar']['Norte'],
+    'Nordeste Eólica': URLS_GERACAO['Eólica']['Nordeste'],
+    'Nordeste Solar': URLS_GERACAO['Solar']['Nordeste'],
+    'Sudeste/CO Eólica': URLS_GERACAO['Eólica']['Sudeste/Centro-Oeste'],
+    'Sudeste/CO Solar': URLS_GERACAO['Solar']['Sudeste/Centro-Oeste'],
+    'Sul Eólica': URLS_GERACAO['Eólica']['Sul'],
+    'Sul Solar': URLS_GERACAO['Solar']['Sul']
 }
 
 # Obter dados
 with st.spinner('Carregando dados...'):
-    dataframes = {key: get_data(url) for key, url in urls.items()}
-    dataframes_regionais = {key: get_data(url) for key, url in urls_regionais.items()}
+    series, resultados, versao_series = carregar_series(tuple({**urls, **urls_regionais}.items()))
+    dataframes = {key: series.frame(key, 'geracao') for key in urls}
+    dataframes_regionais = {key: series.frame(key, 'geracao') for key in urls_regionais}
+
+# Endpoints sem nenhuma resposta válida até agora
+for key, resultado in resultados.items():
+    if resultado.payload is None:
+        st.error(f"Erro ao obter dados: sem resposta válida para {key}")
 
 # Verificar se os dados foram carregados
 if not any(len(df) > 0 for df in dataframes.values()):
     st.error("Não foi possível carregar os dados. Verifique a conexão.")
     st.stop()
 
+# Sinalizar fontes exibidas com o último dado válido enquanto a revalidação não chega
+atrasadas = [nome for nome, resultado in resultados.items() if resultado.payload is not None and resultado.stale]
+if atrasadas:
+    idade_max = max(resultados[nome].idade or 0 for nome in atrasadas)
+    st.warning(f"Exibindo últimos dados válidos ({idade_max:.0f}s atrás) para: {', '.join(atrasadas)}")
+
 # Calcular última atualização
 ultima_atualizacao = max(
     df['instante'].max() for df in dataframes.values() if len(df) > 0
@@ -186,126 +330,16 @@ col_left, col_right = st.columns([1, 1])
 # Gráfico de composição (rosca)
 with col_left:
     st.markdown("### 📊 Composição Atual da Geração")
-    
-    df_composicao = pd.DataFrame({
-        'Fonte': list(urls.keys()),
-        'Geração (MW)': [dataframes[fonte]['geracao'].iloc[-1] for fonte in urls.keys()]
-    })
-    
-    # Cores personalizadas para cada fonte
-    cores_fontes = {
-        'Eólica': '#00a8ff',
-        'Solar': '#fbc531', 
-        'Hidráulica': '#44bd32',
-        'Nuclear': '#e84118',
-        'Térmica': '#8c7ae6'
-    }
-    
-    fig_rosca = go.Figure(data=[go.Pie(
-        labels=df_composicao['Fonte'],
-        values=df_composicao['Geração (MW)'],
-        hole=.6,
-        marker=dict(colors=[cores_fontes[fonte] for fonte in df_composicao['Fonte']]),
-        textinfo='label+percent',
-        textfont=dict(size=12),
-        hovertemplate='<b>%{label}</b><br>Geração: %{value:.0f} MW<br>Percentual: %{percent}<extra></extra>'
-    )])
-    
-    fig_rosca.add_annotation(
-        dict(
-            text=f'<b>{total_gwh:.2f} GW</b><br>Total SIN',
-            x=0.5, y=0.5,
-            font=dict(size=18, color='#2c3e50'),
-            showarrow=False
-        )
-    )
-    
-    fig_rosca.update_layout(
-        height=400,
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.1, xanchor="center", x=0.5),
-        margin=dict(t=20, b=20, l=20, r=20)
-    )
-    
-    st.plotly_chart(fig_rosca, use_container_width=True)
+    st.plotly_chart(figura_rosca(dataframes, total_gwh, versao_series), use_container_width=True)
 
 # Gráfico de evolução temporal
 with col_right:
     st.markdown("### 📈 Evolução da Geração (Últimas 24h)")
-    
-    fig_evolucao = go.Figure()
-    
-    for fonte, df in dataframes.items():
-        if len(df) > 0:
-            fig_evolucao.add_trace(go.Scatter(
-                x=df['instante'],
-                y=df['geracao'],
-                mode='lines',
-                name=fonte,
-                line=dict(color=cores_fontes[fonte], width=3),
-                hovertemplate=f'<b>{fonte}</b><br>Hora: %{{x}}<br>Geração: %{{y:.0f}} MW<extra></extra>'
-            ))
-    
-    fig_evolucao.update_layout(
-        height=400,
-        xaxis_title="Horário",
-        yaxis_title="Geração (MW)",
-        hovermode='x unified',
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5),
-        margin=dict(t=20, b=60, l=50, r=20)
-    )
-    
-    fig_evolucao.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-    fig_evolucao.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-    
-    st.plotly_chart(fig_evolucao, use_container_width=True)
+    st.plotly_chart(figura_evolucao(dataframes, versao_series), use_container_width=True)
 
 # Gráfico regional (tela cheia)
 st.markdown("### 🗺️ Geração por Região")
-
-fig_regional = go.Figure()
-
-# Cores para regiões
-cores_regionais = {
-    'Norte Eólica': '#3742fa', 'Norte Solar': '#ffa502',
-    'Nordeste Eólica': '#2ed573', 'Nordeste Solar': '#ff6348',
-    'Sudeste/CO Eólica': '#5352ed', 'Sudeste/CO Solar': '#ff9f43',
-    'Sul Eólica': '#2f3542', 'Sul Solar': '#ff3838'
-}
-
-for nome, df in dataframes_regionais.items():
-    if len(df) > 0:
-        fig_regional.add_trace(go.Scatter(
-            x=df['instante'],
-            y=df['geracao'],
-            mode='lines',
-            name=nome,
-            line=dict(color=cores_regionais.get(nome, '#95a5a6'), width=2.5),
-            hovertemplate=f'<b>{nome}</b><br>Hora: %{{x}}<br>Geração: %{{y:.0f}} MW<extra></extra>'
-        ))
-
-fig_regional.update_layout(
-    height=500,
-    xaxis_title="Horário",
-    yaxis_title="Geração (MW)",
-    hovermode='x unified',
-    showlegend=True,
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        y=-0.2,
-        xanchor="center",
-        x=0.5,
-        font=dict(size=10)
-    ),
-    margin=dict(t=20, b=80, l=50, r=20)
-)
-
-fig_regional.update_xaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-fig_regional.update_yaxes(showgrid=True, gridwidth=1, gridcolor='rgba(128,128,128,0.2)')
-
-st.plotly_chart(fig_regional, use_container_width=True)
+st.plotly_chart(figura_regional(dataframes_regionais, versao_series), use_container_width=True)
 
 # Footer com informações adicionais
 st.markdown("""
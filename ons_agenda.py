@@ -0,0 +1,144 @@
+"""Agenda adaptativa de buscas, uma cadência por endpoint.
+
+Cada endpoint aprende com os próprios dados quando o ONS publica: o passo
+entre os 'instante' novos dá a cadência e a diferença entre o relógio local
+e o último instante dá o atraso de publicação (inclui o fuso, que é
+constante). A próxima busca cai na publicação esperada; erros e respostas
+sem instante novo recuam exponencialmente, e um sorteio pequeno espalha
+endpoints de mesma cadência para não chegarem juntos na API.
+
+O atraso é estimado entre a última busca vazia e a que achou o instante
+novo; quando acha de primeira, a próxima busca sonda um pouco mais cedo.
+"""
+import random
+import threading
+import time
+
+import numpy as np
+
+# Cadência (s) assumida até o primeiro instante novo de cada endpoint
+INTERVALO_INICIAL = 20.0
+
+# Antecipação (s) da sondagem quando a busca acha o dado de primeira e
+# sorteio máximo somado a cada agendamento
+SONDAGEM = 2.0
+ESPALHAMENTO = 2.0
+
+# Limites (s) do recuo exponencial: começa em ESPERA_MINIMA e dobra a cada falha
+ESPERA_MINIMA = 2.0
+ESPERA_MAXIMA = 300.0
+
+# Cadência mínima (s) e menor espera depois de um instante novo: séries que
+# mudam a todo segundo não viram uma busca a cada 2s
+INTERVALO_MINIMO = 10.0
+
+# Peso de cada observação nova na média móvel da cadência
+ALFA = 0.3
+
+
+def _segundos(instante):
+    """datetime64 -> segundos desde a época; o instante sem fuso é lido como UTC"""
+    return float(np.datetime64(instante, 's').astype('int64'))
+
+
+class Cadencia:
+    """Estado de um endpoint: cadência e atraso estimados e a próxima busca (time.time).
+
+    'falhas' conta buscas seguidas sem instante novo (controla o recuo),
+    'erros' só as que falharam, quando o salto até o próximo instante pode
+    cobrir várias publicações, 'vazia_em' guarda a última busca sem
+    novidade desde o último avanço e 'buscada_em' a última busca válida.
+    """
+
+    __slots__ = ('intervalo', 'atraso', 'ultimo_instante', 'falhas', 'erros', 'vazia_em', 'buscada_em', 'proxima')
+
+    def __init__(self, intervalo, proxima):
+        self.intervalo = intervalo
+        self.atraso = None
+        self.ultimo_instante = None
+        self.falhas = 0
+        self.erros = 0
+        self.vazia_em = None
+        self.buscada_em = None
+        self.proxima = proxima
+
+
+class Agenda:
+    """Quais endpoints buscar e quando; alimentada com o resultado de cada busca"""
+
+    def __init__(self, chaves, intervalo_inicial, semente=None):
+        self._sorteio = random.Random(semente)
+        self._lock = threading.Lock()
+        agora = time.time()
+        # Primeira rodada imediata, só espalhada pelo sorteio
+        self._estados = {
+            chave: Cadencia(intervalo_inicial, agora + self._sorteio.uniform(0, ESPALHAMENTO))
+            for chave in chaves
+        }
+
+    def vencidas(self, agora=None):
+        """Chaves com busca vencida"""
+        agora = agora or time.time()
+        with self._lock:
+            return [chave for chave, estado in self._estados.items() if estado.proxima <= agora]
+
+    def espera(self, agora=None):
+        """Segundos até a próxima busca vencer"""
+        agora = agora or time.time()
+        with self._lock:
+            return max(0.0, min(estado.proxima for estado in self._estados.values()) - agora)
+
+    def cadencias(self):
+        """Cadência estimada (s) de cada chave"""
+        with self._lock:
+            return {chave: estado.intervalo for chave, estado in self._estados.items()}
+
+    def _recuo(self, falhas, teto):
+        return min(ESPERA_MINIMA * 2 ** (falhas - 1), teto) + self._sorteio.uniform(0, ESPALHAMENTO)
+
+    def registrar(self, chave, instantes, agora=None):
+        """Resposta válida; 'instantes' são os instantes novos (vazio se nada mudou)"""
+        agora = agora or time.time()
+        with self._lock:
+            estado = self._estados[chave]
+            if not len(instantes):
+                # Sem novidade: tentar de novo logo, sem passar de uma cadência de espera
+                estado.falhas += 1
+                estado.vazia_em = estado.buscada_em = agora
+                estado.proxima = agora + self._recuo(estado.falhas, max(estado.intervalo, ESPERA_MINIMA))
+                return
+
+            ultimo = _segundos(instantes[-1])
+            if estado.ultimo_instante is None:
+                if len(instantes) > 1:
+                    passos = np.diff(np.asarray(instantes[-10:], dtype='datetime64[s]').astype('int64'))
+                    estado.intervalo = float(np.median(passos)) or estado.intervalo
+            elif estado.erros == 0:
+                estado.intervalo += ALFA * ((ultimo - estado.ultimo_instante) - estado.intervalo)
+            estado.intervalo = min(max(estado.intervalo, INTERVALO_MINIMO), ESPERA_MAXIMA)
+
+            atraso = agora - ultimo
+            if estado.atraso is None or estado.erros:
+                estado.atraso = atraso if estado.atraso is None else min(atraso, estado.atraso)
+            elif estado.vazia_em is not None:
+                # Publicado entre a última busca vazia e esta: mirar no meio do intervalo
+                estado.atraso += ALFA * ((estado.vazia_em - ultimo + atraso) / 2 - estado.atraso)
+            else:
+                # Achou de primeira: a publicação pode ter sido antes, mas não antes da busca anterior
+                estado.atraso = max(min(atraso, estado.atraso) - SONDAGEM, estado.buscada_em - ultimo)
+
+            estado.ultimo_instante = ultimo
+            estado.falhas = estado.erros = 0
+            estado.vazia_em = None
+            estado.buscada_em = agora
+            esperada = ultimo + estado.intervalo + estado.atraso
+            estado.proxima = max(agora + INTERVALO_MINIMO, esperada) + self._sorteio.uniform(0, ESPALHAMENTO)
+
+    def falhou(self, chave, agora=None):
+        """Erro, timeout ou payload vazio: recuo exponencial até ESPERA_MAXIMA"""
+        agora = agora or time.time()
+        with self._lock:
+            estado = self._estados[chave]
+            estado.falhas += 1
+            estado.erros += 1
+            estado.proxima = agora + self._recuo(estado.falhas, ESPERA_MAXIMA)
@@ -0,0 +1,250 @@
+"""Benchmark headless do ciclo de atualização do dashboard, etapa por etapa.
+
+Roda o pipeline de produção contra o simulador local (fixtures gravadas ou
+séries sintéticas): cliente HTTP do poller, SeriesStore, grafo de KPIs de
+ons_estado e as figuras de ons_charts, com uma FiguraCache por sessão
+simulada. O relógio do simulador avança um minuto por ciclo, então cada
+ciclo traz um instante novo, como no ar. Reporta p50/p95/p99 de cada etapa:
+
+    python ons_benchmark.py                              # cenário padrão
+    python ons_benchmark.py --dias 1 7 30 --sessoes 1 8  # escala tamanho e sessões
+    python ons_benchmark.py --regioes 1 4 --fixtures fixtures/ --json resultado.json
+    python ons_benchmark.py --parse --dias 1 30         # conversão antiga x colunar por payload
+
+Compare o JSON de duas execuções para saber se uma mudança deixou o ciclo
+mais rápido ou mais lento.
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+import ons_cliente
+import ons_fetch
+from ons_charts import LARGURA_TV_PX, atualizar_matriz, figura_geracao, figura_matriz, orcamento_pontos, series_geracao
+from ons_estado import calcular_estado, criar_grafo, entradas_grafo
+from ons_poller import Poller
+from ons_simulador import Simulador, nome_endpoint, servir
+
+ETAPAS = ('fetch', 'ingest', 'process_data', 'calculos', 'figuras', 'serializacao')
+PERCENTIS = (50, 95, 99)
+
+# Ordem em que as regiões entram quando o cenário limita a quantidade
+REGIOES = ('Nordeste', 'Sudeste/Centro-Oeste', 'Sul', 'Norte')
+
+# Momento simulado do primeiro ciclo: meio do dia, com meio dia de pontos no payload
+INICIO_SIMULADO = 12
+
+
+def requisicoes_cenario(n_regioes, base_url):
+    """Requisições do ciclo restritas às n primeiras regiões, apontadas para o simulador"""
+    regioes = set(REGIOES[:n_regioes])
+    requisicoes = {}
+    for chave, (url, parser, coluna) in ons_fetch.requisicoes_padrao().items():
+        _, regiao = ons_fetch.separar_chave(chave)
+        if regiao and regiao not in regioes:
+            continue
+        requisicoes[chave] = (f'{base_url}/{nome_endpoint(url)}', parser, coluna)
+    return requisicoes
+
+
+class Cronometro:
+    """Acumula amostras (s) por etapa; seguro para várias sessões simultâneas"""
+
+    def __init__(self):
+        self._amostras = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def medir(self, etapa, funcao, *args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        self.registrar(etapa, time.perf_counter() - inicio)
+        return resultado
+
+    def registrar(self, etapa, duracao):
+        with self._lock:
+            self._amostras[etapa].append(duracao)
+
+    def resumo(self):
+        resumo = {}
+        for etapa in ETAPAS:
+            amostras = self._amostras.get(etapa)
+            if amostras:
+                valores = np.percentile(np.asarray(amostras) * 1000, PERCENTIS)
+                resumo[etapa] = {f'p{p}': round(float(v), 3) for p, v in zip(PERCENTIS, valores)}
+                resumo[etapa]['n'] = len(amostras)
+        return resumo
+
+
+class Relogio:
+    """Relógio do simulador que só avança quando o benchmark manda"""
+
+    def __init__(self, inicio):
+        self.agora = inicio
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self, minutos=1):
+        self.agora += timedelta(minutes=minutos)
+
+
+class Sessao:
+    """Uma tela do dashboard: figuras próprias, atualizadas in-place a cada snapshot"""
+
+    def __init__(self):
+        self.geracao = figura_geracao()
+        self.matriz = figura_matriz()
+
+    def desenhar(self, estado, cronometro):
+        def figuras():
+            series = series_geracao(estado['timeline_data'], estado['carga_data'], orcamento_pontos(LARGURA_TV_PX // 2))
+            geracao = self.geracao.atualizar(series)
+            matriz = atualizar_matriz(self.matriz, estado['fonte_totals'], estado['total_geracao'])
+            return geracao, matriz
+        figuras = cronometro.medir('figuras', figuras)
+        # O que st.plotly_chart faz com cada figura antes de enviar ao navegador
+        cronometro.medir('serializacao', lambda: [pio.to_json(fig, validate=False) for fig in figuras])
+
+
+def ciclo(simulador, requisicoes, poller, grafo, sessoes, executor, cronometro):
+    """Um ciclo completo: buscas e KPIs uma vez por processo, figuras uma vez por sessão.
+
+    Devolve quantas séries ficaram sem resposta, que seguem com o último dado válido.
+    """
+    # Corpos do minuto montados antes de medir: o fetch mede a rede e o cliente, não o simulador
+    for url, _, _ in requisicoes.values():
+        simulador.corpo(nome_endpoint(url))
+    rodada = cronometro.medir('fetch', ons_cliente.buscar_varios, requisicoes)
+    snapshot = cronometro.medir('ingest', poller.processar, rodada)
+
+    cronometro.medir('process_data', grafo.calcular, entradas_grafo(snapshot), ['processado'])
+    estado = cronometro.medir('calculos', calcular_estado, snapshot, grafo)
+    if estado['disponivel']:
+        for futuro in [executor.submit(sessao.desenhar, estado, cronometro) for sessao in sessoes]:
+            futuro.result()
+    return len(rodada['faltantes'])
+
+
+def _parse_legado(conteudo, coluna):
+    """Caminho anterior: dicts -> DataFrame -> to_datetime com inferência -> to_numeric"""
+    df = pd.DataFrame(json.loads(conteudo))
+    df['instante'] = pd.to_datetime(df['instante'], errors='coerce')
+    df[coluna] = pd.to_numeric(df[coluna], errors='coerce')
+    return df
+
+
+def comparar_parse(base_url, repeticoes):
+    """Tempo (ms, p50) por payload: bytes até DataFrame, caminho antigo x colunar"""
+    resultado = {}
+    for chave, (url, _, coluna) in requisicoes_cenario(len(REGIOES), base_url).items():
+        conteudo = ons_cliente.baixar(url)
+        if conteudo is None:
+            # Timeout, erro HTTP ou circuito aberto: a série fica de fora, como no poller
+            resultado[chave] = {'faltante': True}
+            continue
+        tempos = {'legado': [], 'colunar': []}
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            _parse_legado(conteudo, coluna)
+            meio = time.perf_counter()
+            colunas = ons_fetch.decodificar_colunas(conteudo, coluna)
+            pd.DataFrame({'instante': colunas.instantes, coluna: colunas.valores})
+            tempos['legado'].append(meio - inicio)
+            tempos['colunar'].append(time.perf_counter() - meio)
+        legado, colunar = (float(np.median(tempos[k])) * 1000 for k in ('legado', 'colunar'))
+        resultado[chave] = {'bytes': len(conteudo), 'legado_ms': round(legado, 3), 'colunar_ms': round(colunar, 3)}
+    return resultado
+
+
+def imprimir_parse(dias, resultado):
+    print(f"\nparse por payload, dias={dias}")
+    print(f"  {'série':<34}{'KiB':>8}{'legado ms':>12}{'colunar ms':>12}{'ganho':>8}")
+    for chave, valores in resultado.items():
+        if valores.get('faltante'):
+            print(f"  {chave:<34}{'sem resposta':>40}")
+            continue
+        ganho = valores['legado_ms'] / valores['colunar_ms'] if valores['colunar_ms'] else float('nan')
+        print(f"  {chave:<34}{valores['bytes'] / 1024:>8.0f}{valores['legado_ms']:>12.2f}"
+              f"{valores['colunar_ms']:>12.2f}{ganho:>7.1f}x")
+
+
+def executar_cenario(simulador, relogio, base_url, n_regioes, n_sessoes, repeticoes):
+    requisicoes = requisicoes_cenario(n_regioes, base_url)
+    poller = Poller(requisicoes=requisicoes)
+    grafo = criar_grafo()
+    sessoes = [Sessao() for _ in range(n_sessoes)]
+    cronometro = Cronometro()
+    faltantes = 0
+    with ThreadPoolExecutor(max_workers=n_sessoes) as executor:
+        # Aquecimento: conexões, o dia inteiro ingerido e as figuras criadas
+        ciclo(simulador, requisicoes, poller, grafo, sessoes, executor, Cronometro())
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            relogio.avancar()
+            faltantes += ciclo(simulador, requisicoes, poller, grafo, sessoes, executor, cronometro)
+        duracao = time.perf_counter() - inicio
+    return {
+        'series': len(requisicoes),
+        'faltantes': faltantes,
+        'ciclos_por_segundo': round(repeticoes / duracao, 3),
+        'etapas': cronometro.resumo()
+    }
+
+
+def imprimir(cenario, resultado):
+    print(f"\nregiões={cenario['regioes']} dias={cenario['dias']} sessões={cenario['sessoes']} "
+          f"séries={resultado['series']} faltantes={resultado['faltantes']} ciclos/s={resultado['ciclos_por_segundo']}")
+    print(f"  {'etapa':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'n':>7}")
+    for etapa, valores in resultado['etapas'].items():
+        print(f"  {etapa:<14}{valores['p50']:>10.2f}{valores['p95']:>10.2f}{valores['p99']:>10.2f}{valores['n']:>7}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=None, help='fixtures gravadas (padrão: séries sintéticas)')
+    parser.add_argument('--regioes', type=int, nargs='+', default=[len(REGIOES)], help='quantidade de regiões (1 a 4)')
+    parser.add_argument('--dias', type=int, nargs='+', default=[1], help='tamanho das séries em dias')
+    parser.add_argument('--sessoes', type=int, nargs='+', default=[1], help='sessões simultâneas')
+    parser.add_argument('--repeticoes', type=int, default=10, help='ciclos medidos por cenário')
+    parser.add_argument('--latencia', type=float, default=0, help='latência simulada da API (ms)')
+    parser.add_argument('--parse', action='store_true', help='só comparar a conversão dos payloads')
+    parser.add_argument('--json', default=None, help='gravar os resultados neste arquivo')
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for dias in args.dias:
+        relogio = Relogio(datetime.now().replace(hour=INICIO_SIMULADO, minute=0, second=0, microsecond=0))
+        simulador = Simulador(fixtures=args.fixtures, dias=dias, latencia_ms=args.latencia, semente=0, relogio=relogio)
+        servidor = servir(simulador, porta=0)
+        host, porta = servidor.server_address[:2]
+        base_url = f'http://{host}:{porta}/api/energiaagora/Get'
+        try:
+            if args.parse:
+                resultado = comparar_parse(base_url, args.repeticoes)
+                imprimir_parse(dias, resultado)
+                resultados.append({'dias': dias, 'parse': resultado})
+                continue
+            for n_regioes in args.regioes:
+                for sessoes in args.sessoes:
+                    cenario = {'regioes': n_regioes, 'dias': dias, 'sessoes': sessoes}
+                    resultado = executar_cenario(simulador, relogio, base_url, n_regioes, sessoes, args.repeticoes)
+                    imprimir(cenario, resultado)
+                    resultados.append(dict(cenario, **resultado))
+        finally:
+            servidor.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Cálculos derivados das séries do ONS (totais, tendências, picos e vales)"""
+import math
+import threading
+import warnings
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ons_metricas import cronometrado
+from ons_series import agregar_series
+
+
+TENDENCIA_NEUTRA = {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
+
+
+def _resultado_tendencia(coef, valor_inicial, valor_final):
+    """Inclinação e variação da janela no formato consumido pelos cards"""
+    # Calcular variação percentual
+    variacao_absoluta = valor_final - valor_inicial
+    variacao_pct = (variacao_absoluta / valor_inicial * 100) if valor_inicial != 0 else 0
+
+    # Verificar se os valores são válidos
+    if np.isnan(variacao_pct) or np.isinf(variacao_pct):
+        variacao_pct = 0
+    if np.isnan(variacao_absoluta) or np.isinf(variacao_absoluta):
+        variacao_absoluta = 0
+    if np.isnan(coef) or np.isinf(coef):
+        coef = 0
+
+    if coef > 5:
+        tipo = "up"
+    elif coef < -5:
+        tipo = "down"
+    else:
+        tipo = "stable"
+
+    return {
+        "coef": coef,
+        "tipo": tipo,
+        "variacao_pct": variacao_pct,
+        "variacao_absoluta": variacao_absoluta
+    }
+
+
+@cronometrado('calcular_tendencia_avancada')
+def calcular_tendencia_avancada(df, janela=10):
+    """Calcular tendência mais detalhada com variação percentual"""
+    if len(df) < janela or len(df) == 0:
+        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
+
+    coluna = 'geracao' if 'geracao' in df.columns else 'carga' if 'carga' in df.columns else 'frequencia'
+    valores_recentes = df[coluna].tail(janela).values
+
+    if len(valores_recentes) < 2:
+        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
+
+    try:
+        # Remover valores NaN e infinitos
+        valores_recentes = valores_recentes[~np.isnan(valores_recentes)]
+        valores_recentes = valores_recentes[np.isfinite(valores_recentes)]
+
+        if len(valores_recentes) < 2:
+            return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
+
+        x = np.arange(len(valores_recentes))
+        coef = np.polyfit(x, valores_recentes, 1)[0]
+
+        return _resultado_tendencia(coef, valores_recentes[0], valores_recentes[-1])
+    except Exception:
+        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
+
+
+# Resultado de process_data acompanhado do bloco alinhado que o originou
+Processado = namedtuple('Processado', ['agregado', 'fonte_totals', 'timeline_data', 'total_sin'])
+
+
+@cronometrado('process_data')
+def processar_series(dataframes):
+    agregado = agregar_series(dataframes)
+    if agregado is None:
+        return Processado(None, {}, {}, pd.DataFrame(columns=['instante', 'geracao']))
+
+    # Valor atual por fonte: última linha do bloco alinhado
+    ultimo = agregado.por_fonte.iloc[-1]
+    fonte_totals = {
+        fonte: float(valor) if np.isfinite(valor) and valor > 0 else 0
+        for fonte, valor in ultimo.items()
+    }
+
+    # Séries por fonte e total SIN no índice de instantes comum: views sobre o
+    # bloco agregado, sem copiar uma coluna por fonte a cada snapshot (não alterar)
+    instantes = agregado.instantes.to_numpy()
+    timeline_data = {
+        fonte: pd.DataFrame({'instante': instantes, 'geracao': agregado.por_fonte[fonte].to_numpy()}, copy=False)
+        for fonte in agregado.por_fonte.columns
+    }
+    total_sin = pd.DataFrame({'instante': instantes, 'geracao': agregado.sin.to_numpy()}, copy=False)
+
+    return Processado(agregado, fonte_totals, timeline_data, total_sin)
+
+
+def process_data(dataframes):
+    _, fonte_totals, timeline_data, total_sin = processar_series(dataframes)
+    return fonte_totals, timeline_data, total_sin
+
+
+VARIACAO_NEUTRA = {"variacao_media": 0, "pico_hora": "N/A", "vale_hora": "N/A", "maior_variacao": 0}
+
+# Percentis da taxa de rampa (|ΔMW| entre pontos consecutivos)
+PERCENTIS_RAMPA = (50, 90, 99)
+
+
+@cronometrado('analisar_rampas')
+def analisar_rampas(instantes, matriz, nomes, percentis=PERCENTIS_RAMPA):
+    """Picos, vales e rampas de várias séries alinhadas numa única passada vetorizada.
+
+    matriz tem uma coluna por série (tempo × séries) no índice 'instantes',
+    já ordenado. Devolve nome -> variação média, maior variação, hora e valor
+    do pico e do vale e 'rampa_p<percentil>'.
+    """
+    matriz = np.asarray(matriz, dtype=np.float64)
+    if matriz.ndim == 1:
+        matriz = matriz[:, None]
+    if matriz.shape[0] < 2:
+        return {nome: dict(VARIACAO_NEUTRA) for nome in nomes}
+
+    finitos = np.isfinite(matriz)
+    validas = finitos.any(axis=0)
+    pico_idx = np.where(finitos, matriz, -np.inf).argmax(axis=0)
+    vale_idx = np.where(finitos, matriz, np.inf).argmin(axis=0)
+
+    variacao = np.diff(matriz, axis=0)
+    rampa = np.abs(variacao)
+    with warnings.catch_warnings():
+        # Séries sem nenhuma variação válida resultam em NaN, tratadas abaixo
+        warnings.simplefilter('ignore', RuntimeWarning)
+        variacao_media = np.nanmean(variacao, axis=0)
+        maior_variacao = np.nanmax(rampa, axis=0)
+        rampa_percentis = np.nanpercentile(rampa, percentis, axis=0)
+
+    # Só os instantes de pico e vale são formatados
+    instantes = np.asarray(instantes)
+    horas = pd.DatetimeIndex(instantes[np.concatenate([pico_idx, vale_idx])]).strftime('%H:%M')
+    n_series = matriz.shape[1]
+    resultado = {}
+    for j, nome in enumerate(nomes):
+        if not validas[j]:
+            resultado[nome] = dict(VARIACAO_NEUTRA)
+            continue
+        resultado[nome] = {
+            "variacao_media": variacao_media[j],
+            "pico_hora": horas[j],
+            "vale_hora": horas[n_series + j],
+            "maior_variacao": maior_variacao[j],
+            "pico_valor": matriz[pico_idx[j], j],
+            "vale_valor": matriz[vale_idx[j], j],
+            **{f"rampa_p{p}": rampa_percentis[i, j] for i, p in enumerate(percentis)}
+        }
+    return resultado
+
+
+def analisar_frame(df, coluna, nome=None):
+    """analisar_rampas de uma série avulsa (ex.: carga), sem copiar a coluna"""
+    if df is None or len(df) < 2:
+        return dict(VARIACAO_NEUTRA)
+    nome = nome or coluna
+    return analisar_rampas(df['instante'].to_numpy(), df[coluna].to_numpy(dtype=np.float64), [nome])[nome]
+
+
+# Janelas (em pontos) mantidas pelo motor de tendências; a primeira é a dos cards
+JANELAS_TENDENCIA = (10,)
+
+# Somas correntes são refeitas do zero a cada tantas janelas para não acumular erro
+RECALCULO_JANELAS = 100
+
+
+def _coluna_valor(df):
+    return 'geracao' if 'geracao' in df.columns else 'carga' if 'carga' in df.columns else 'frequencia'
+
+
+class RegressaoMovel:
+    """Regressão linear dos últimos n valores com somas correntes: cada ponto novo custa O(1)"""
+
+    def __init__(self, janela):
+        self.janela = janela
+        self._valores = deque(maxlen=janela)
+        self._soma_y = 0.0
+        self._soma_xy = 0.0
+        self._nao_finitos = 0
+        self._adicoes = 0
+
+    def __len__(self):
+        return len(self._valores)
+
+    def adicionar(self, valor):
+        valor = float(valor)
+        finito = math.isfinite(valor)
+        y = valor if finito else 0.0
+        if len(self._valores) == self.janela:
+            saindo = self._valores[0]
+            y_saindo = saindo if math.isfinite(saindo) else 0.0
+            self._nao_finitos -= not math.isfinite(saindo)
+            # Os pontos que ficam recuam uma posição em x; o novo entra na última
+            self._soma_xy -= self._soma_y - y_saindo
+            self._soma_y -= y_saindo
+            posicao = self.janela - 1
+        else:
+            posicao = len(self._valores)
+        self._soma_xy += posicao * y
+        self._soma_y += y
+        self._nao_finitos += not finito
+        self._valores.append(valor)
+
+        self._adicoes += 1
+        if self._adicoes >= RECALCULO_JANELAS * self.janela:
+            self._recalcular()
+
+    def recentes(self, n):
+        """Últimos n valores da janela (ou menos, se ainda não houver n)"""
+        return np.asarray(self._valores, dtype=np.float64)[max(0, len(self._valores) - n):]
+
+    def _recalcular(self):
+        y = np.nan_to_num(np.asarray(self._valores, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+        self._soma_y = float(y.sum())
+        self._soma_xy = float(np.arange(len(y)) @ y)
+        self._adicoes = 0
+
+    def resultado(self):
+        """Mesmo resultado de calcular_tendencia_avancada sobre os últimos n pontos"""
+        n = len(self._valores)
+        if n < self.janela or n < 2:
+            return dict(TENDENCIA_NEUTRA)
+        if self._nao_finitos:
+            # Com NaN/inf na janela os x são renumerados: calcula direto (só n pontos)
+            valores = np.asarray(self._valores, dtype=np.float64)
+            valores = valores[np.isfinite(valores)]
+            if len(valores) < 2:
+                return dict(TENDENCIA_NEUTRA)
+            coef = np.polyfit(np.arange(len(valores)), valores, 1)[0]
+            return _resultado_tendencia(coef, valores[0], valores[-1])
+
+        soma_x = n * (n - 1) / 2
+        soma_x2 = (n - 1) * n * (2 * n - 1) / 6
+        coef = (n * self._soma_xy - soma_x * self._soma_y) / (n * soma_x2 - soma_x ** 2)
+        return _resultado_tendencia(coef, self._valores[0], self._valores[-1])
+
+
+class MotorTendencias:
+    """Tendências de todas as séries, alimentadas só com os pontos novos de cada atualização.
+
+    Uma instância por processo: cada série é atualizada uma vez por
+    snapshot e todos os cards leem o mesmo resultado.
+    """
+
+    def __init__(self, janelas=JANELAS_TENDENCIA):
+        self.janelas = tuple(janelas)
+        self._maior = max(self.janelas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _reconstruir(self, nome, instantes, valores):
+        regressoes = {janela: RegressaoMovel(janela) for janela in self.janelas}
+        for valor in valores[-self._maior:]:
+            for regressao in regressoes.values():
+                regressao.adicionar(valor)
+        self._series[nome] = {'ultimo': instantes[-1] if len(instantes) else None, 'regressoes': regressoes}
+
+    @cronometrado('tendencias')
+    def atualizar(self, nome, df, coluna=None):
+        """Acrescentar à série os pontos posteriores ao último já visto"""
+        if df is None or df.empty:
+            with self._lock:
+                self._series.pop(nome, None)
+            return
+        coluna = coluna or _coluna_valor(df)
+        instantes = df['instante'].to_numpy()
+        valores = df[coluna].to_numpy(dtype=np.float64)
+
+        with self._lock:
+            estado = self._series.get(nome)
+            if estado is None or estado['ultimo'] is None or instantes[-1] < estado['ultimo']:
+                self._reconstruir(nome, instantes, valores)
+                return
+
+            inicio = int(np.searchsorted(instantes, estado['ultimo'], side='right'))
+            maior = estado['regressoes'][self._maior]
+            # Pontos já vistos podem ter sido revisados (alinhamento com ffill): confere a sobreposição
+            vistos = valores[max(0, inicio - len(maior)):inicio]
+            recentes = maior.recentes(len(vistos))
+            novos = valores[inicio:]
+            if len(novos) > self._maior or not np.array_equal(vistos, recentes, equal_nan=True):
+                self._reconstruir(nome, instantes, valores)
+                return
+
+            for valor in novos:
+                for regressao in estado['regressoes'].values():
+                    regressao.adicionar(valor)
+            estado['ultimo'] = instantes[-1]
+
+    def tendencia(self, nome, janela=None):
+        with self._lock:
+            estado = self._series.get(nome)
+            if estado is None:
+                return dict(TENDENCIA_NEUTRA)
+            return estado['regressoes'][janela or self.janelas[0]].resultado()
@@ -0,0 +1,267 @@
+"""Utilitários dos gráficos Plotly do dashboard"""
+import functools
+
+import numpy as np
+import plotly.graph_objects as go
+
+from ons_metricas import ETAPA_DURACAO
+
+# Cores originais para fontes de energia
+ENERGY_COLORS = {
+    'Hidráulica': '#60A5FA',    # Blue 400
+    'Eólica': '#34D399',        # Emerald 400
+    'Solar': '#FBBF24',         # Amber 400
+    'Térmica': '#F87171',       # Red 400
+    'Nuclear': '#A78BFA',       # Purple 400
+    'Carga': '#EC4899'          # Pink 400
+}
+
+# Largura útil (px) dos gráficos numa TV 1920px e pontos enviados por pixel
+LARGURA_TV_PX = 1920
+PONTOS_POR_PIXEL = 1.0
+
+
+def orcamento_pontos(largura_px, pontos_por_pixel=PONTOS_POR_PIXEL):
+    """Quantidade máxima de pontos por trace para uma largura em pixels"""
+    return max(3, int(largura_px * pontos_por_pixel))
+
+
+def _eixo_numerico(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype('int64').astype('float64')
+    return x.astype('float64')
+
+
+def lttb_indices(x, y, n_saida):
+    """Largest-Triangle-Three-Buckets: índices dos pontos que preservam a forma visual"""
+    n = len(y)
+    if n_saida >= n or n_saida < 3:
+        return np.arange(n)
+
+    x = _eixo_numerico(x)
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    limites = np.linspace(1, n - 1, n_saida - 1).astype(int)
+
+    indices = np.empty(n_saida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_saida - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo bucket (ou o último ponto) é o terceiro vértice do triângulo
+        prox_inicio, prox_fim = fim, limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[prox_inicio:prox_fim].mean() if prox_fim > prox_inicio else x[-1]
+        media_y = y[prox_inicio:prox_fim].mean() if prox_fim > prox_inicio else y[-1]
+
+        area = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(area)) if len(area) else inicio
+        indices[i + 1] = anterior
+    return indices
+
+
+def minmax_indices(y, n_saida):
+    """Mínimo e máximo de cada bucket, mantendo a ordem temporal"""
+    n = len(y)
+    if n_saida >= n or n_saida < 4:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    # Buckets de tamanhos quase iguais cobrindo a série inteira: a sobra da
+    # divisão não vira pontos extras além do orçamento
+    limites = np.linspace(0, n, n_saida // 2 + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(len(limites) - 1), np.diff(limites))
+
+    def primeiro(extremos):
+        # Primeira posição de cada bucket onde o valor é o extremo do bucket
+        candidatos = np.flatnonzero(y == extremos[bucket])
+        return candidatos[np.unique(bucket[candidatos], return_index=True)[1]]
+
+    inicio = limites[:-1]
+    return np.unique(np.concatenate([primeiro(np.minimum.reduceat(y, inicio)), primeiro(np.maximum.reduceat(y, inicio))]))
+
+
+def indices_reduzidos(x, y, n_saida, metodo='lttb'):
+    """Índices reduzidos que sempre incluem o pico e o vale globais da série"""
+    y = np.asarray(y, dtype='float64')
+    if len(y) <= n_saida:
+        return np.arange(len(y))
+    indices = lttb_indices(x, y, n_saida) if metodo == 'lttb' else minmax_indices(y, n_saida)
+    extremos = [int(np.nanargmax(y)), int(np.nanargmin(y))] if np.isfinite(y).any() else []
+    return np.unique(np.concatenate([indices, extremos]).astype(np.int64))
+
+
+def reduzir_serie(df, coluna, n_saida, metodo='lttb'):
+    """DataFrame reduzido a n_saida pontos (aprox.) sem perder pico e vale"""
+    if df is None or len(df) <= n_saida:
+        return df
+    return df.iloc[indices_reduzidos(df['instante'].to_numpy(), df[coluna].to_numpy(), n_saida, metodo)]
+
+
+def reduzir_series_alinhadas(frames, coluna, n_saida, metodo='lttb'):
+    """Reduzir séries que compartilham o mesmo índice de instantes (área empilhada).
+
+    Os índices são escolhidos sobre a soma das séries, para o empilhamento
+    continuar coerente, e recebem o pico e o vale de cada série individual.
+    """
+    frames = {nome: df for nome, df in frames.items() if df is not None and not df.empty}
+    if not frames:
+        return frames
+    referencia = next(iter(frames.values()))
+    if len(referencia) <= n_saida or any(len(df) != len(referencia) for df in frames.values()):
+        return {nome: reduzir_serie(df, coluna, n_saida, metodo) for nome, df in frames.items()}
+
+    total = np.sum([np.nan_to_num(df[coluna].to_numpy(dtype='float64')) for df in frames.values()], axis=0)
+    indices = [indices_reduzidos(referencia['instante'].to_numpy(), total, n_saida, metodo)]
+    for df in frames.values():
+        valores = df[coluna].to_numpy(dtype='float64')
+        if np.isfinite(valores).any():
+            indices.append([int(np.nanargmax(valores)), int(np.nanargmin(valores))])
+    indices = np.unique(np.concatenate(indices).astype(np.int64))
+    return {nome: df.iloc[indices] for nome, df in frames.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def template_tv():
+    """Template dark da TV (hover, legenda, eixos), construído e validado uma única vez"""
+    eixo = dict(
+        showgrid=True,
+        gridcolor='rgba(59, 66, 82, 0.3)',
+        gridwidth=1,
+        title=dict(font=dict(color='#94A3B8', size=12, family='Inter')),
+        tickfont=dict(color='#94A3B8', size=10, family='Inter'),
+        linecolor='#3B4252'
+    )
+    return go.layout.Template(layout=dict(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(37, 43, 58, 0.3)',
+        font=dict(family='Inter', color='#F8FAFC'),
+        hoverlabel=dict(
+            bgcolor='rgba(37, 43, 58, 0.95)',
+            bordercolor='#3B4252',
+            font=dict(color='#F8FAFC', family='Inter', size=11)
+        ),
+        legend=dict(
+            bgcolor='rgba(37, 43, 58, 0.8)',
+            bordercolor='#3B4252',
+            borderwidth=1,
+            font=dict(color='#F8FAFC', family='Inter', size=10)
+        ),
+        xaxis=eixo,
+        yaxis=eixo
+    ))
+
+
+class FiguraCache:
+    """Figura com layout montado uma vez; cada atualização só troca os dados dos traces.
+
+    criar_trace(nome, **dados) monta um trace novo quando o conjunto de
+    traces muda; enquanto os nomes se mantêm, os arrays são trocados in-place.
+    """
+
+    def __init__(self, criar_trace, **layout):
+        self._criar_trace = criar_trace
+        self._nomes = ()
+        self.fig = go.Figure(layout=dict(layout, template=template_tv()))
+
+    def atualizar(self, series):
+        """series: nome -> propriedades de dados do trace (x/y, labels/values...)"""
+        nomes = tuple(series)
+        with ETAPA_DURACAO.medir(etapa='figura'):
+            if nomes != self._nomes:
+                self.fig.data = ()
+                self.fig.add_traces([self._criar_trace(nome, **dados) for nome, dados in series.items()])
+                self._nomes = nomes
+            else:
+                with self.fig.batch_update():
+                    for trace, dados in zip(self.fig.data, series.values()):
+                        trace.update(dados)
+        return self.fig
+
+
+def criar_trace_geracao(formato_hora):
+    """Traces do gráfico Geração vs Carga: fontes empilhadas e a linha de carga"""
+    def criar(nome, x, y):
+        if nome == 'Carga Total':
+            return go.Scatter(
+                x=x, y=y,
+                name=nome,
+                line=dict(color='#EC4899', width=4, dash='solid'),
+                hovertemplate=f'<b>Carga Total</b><br>%{{x|{formato_hora}}}<br>%{{y:,.0f}} MW<extra></extra>'
+            )
+        return go.Scatter(
+            x=x, y=y,
+            name=nome,
+            stackgroup='geracao',
+            line=dict(width=0),
+            fillcolor=ENERGY_COLORS.get(nome, '#94A3B8'),
+            hovertemplate=f'<b>{nome}</b><br>%{{x|{formato_hora}}}<br>%{{y:,.0f}} MW<extra></extra>'
+        )
+    return criar
+
+
+def criar_trace_matriz(nome, labels, values, marker):
+    return go.Pie(
+        labels=labels,
+        values=values,
+        hole=0.6,
+        marker=dict(marker, line=dict(color='#252B3A', width=2)),
+        textinfo='percent',
+        textfont=dict(size=10, color='#F8FAFC', family='Inter'),
+        hovertemplate='<b>%{label}</b><br>%{value:,.0f} MW<extra></extra>'
+    )
+
+
+def figura_geracao(formato_hora='%H:%M'):
+    """Gráfico Geração vs Carga com o layout da TV, pronto para atualizar in-place"""
+    return FiguraCache(
+        criar_trace_geracao(formato_hora),
+        height=500,
+        margin=dict(t=10, b=50, l=20, r=20),
+        hovermode='x unified',
+        legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5),
+        xaxis=dict(title=dict(text="Horário")),
+        yaxis=dict(title=dict(text="Potência (MW)"))
+    )
+
+
+def series_geracao(timeline, carga, pontos):
+    """Dados dos traces do gráfico de geração reduzidos a 'pontos'; {} sem geração ou sem carga.
+
+    Hidráulica fica na base da área empilhada e a carga vai por último, como linha.
+    """
+    timeline = reduzir_series_alinhadas(timeline, 'geracao', pontos)
+    carga = reduzir_serie(carga, 'carga', pontos)
+    if not timeline or carga is None or carga.empty:
+        return {}
+    series = {
+        fonte: dict(x=timeline[fonte]['instante'], y=timeline[fonte]['geracao'])
+        for fonte in sorted(timeline, key=lambda x: 0 if x == 'Hidráulica' else 1)
+    }
+    series['Carga Total'] = dict(x=carga['instante'], y=carga['carga'])
+    return series
+
+
+def figura_matriz():
+    """Rosca da matriz energética com o total no centro"""
+    return FiguraCache(
+        criar_trace_matriz,
+        height=220,
+        margin=dict(t=5, b=5, l=5, r=5),
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        annotations=[dict(x=0.5, y=0.5, font=dict(size=14, family='Inter', color='#F8FAFC'), showarrow=False)]
+    )
+
+
+def atualizar_matriz(figura, fonte_totals, total_geracao):
+    """Trocar as fatias da matriz e o total do centro; devolve a figura"""
+    fig = figura.atualizar({'Matriz': dict(
+        labels=list(fonte_totals.keys()),
+        values=list(fonte_totals.values()),
+        marker=dict(colors=[ENERGY_COLORS.get(fonte, '#94A3B8') for fonte in fonte_totals.keys()])
+    )})
+    fig.layout.annotations[0].text = f"<b>{total_geracao:,.0f}</b><br><span style='font-size:10px;'>MW</span>"
+    return fig
@@ -0,0 +1,431 @@
+"""Cliente assíncrono da API do ONS, compartilhado pelos dashboards e reutilizável por outros serviços.
+
+    async with ClienteONS() as cliente:
+        ciclo = await cliente.buscar_varios(requisicoes_padrao())
+        async for chave, delta in cliente.novos_pontos():
+            ...
+
+Pedidos simultâneos da mesma URL viram uma única requisição em voo. Cada
+endpoint tem um disjuntor: depois de falhas seguidas ele abre e as chamadas
+falham na hora, até uma sondagem (meio-aberto) voltar a responder. Em
+buscar_varios, o prazo do lote cancela o que ainda estiver pendente.
+
+As buscas são condicionais (ETag/Last-Modified quando o servidor os envia)
+e cada corpo recebe um hash: uma resposta igual à anterior devolve o mesmo
+objeto bytes e o mesmo resultado decodificado, sem decodificar de novo, e
+quem consome compara por identidade para pular o reprocessamento. Os
+dashboards, síncronos, usam o cliente do processo pelas funções baixar,
+buscar_json e buscar_varios, que rodam num event loop próprio em segundo
+plano; assim o poller e o cache SWR do app.py também compartilham as
+requisições em voo.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+import aiohttp
+
+from ons_agenda import INTERVALO_INICIAL, Agenda
+from ons_fetch import PRAZO_CICLO, TAMANHO_POOL, TIMEOUT, decodificar_colunas, requisicoes_padrao
+from ons_metricas import (
+    CIRCUITO_ESTADO, ETAPA_DURACAO, FETCH_BYTES, FETCH_DEDUPLICADAS, FETCH_DURACAO, FETCH_ERROS, FETCH_INALTERADAS,
+    IDADE_ENDPOINT, endpoint
+)
+from ons_series import SeriesStore
+
+CABECALHOS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+
+# Falhas seguidas que abrem o circuito e quanto tempo (s) ele fica aberto antes
+# da sondagem; cada sondagem que falha dobra a espera até o máximo
+FALHAS_PARA_ABRIR = 3
+ESPERA_ABERTO = 10.0
+ESPERA_ABERTO_MAXIMA = 300.0
+
+
+# Validadores da última resposta boa de uma URL: cabeçalhos para a busca
+# condicional, hash do conteúdo e o próprio corpo, devolvido quando nada mudou
+Validador = namedtuple('Validador', ['etag', 'modificado', 'digest', 'corpo'])
+
+
+class Disjuntor:
+    """Circuito de um endpoint: fechado (normal), aberto (falha na hora) ou meio-aberto (uma sondagem).
+
+    Só é usado de dentro do event loop do cliente, então dispensa lock.
+    """
+
+    FECHADO, MEIO_ABERTO, ABERTO = 'fechado', 'meio_aberto', 'aberto'
+
+    def __init__(self):
+        self.estado = self.FECHADO
+        self.falhas = 0
+        self.espera = ESPERA_ABERTO
+        self.aberto_ate = 0.0
+        self._sondando = False
+
+    def permitir(self, agora):
+        if self.estado == self.ABERTO and agora >= self.aberto_ate:
+            self.estado = self.MEIO_ABERTO
+            self._sondando = False
+        if self.estado == self.MEIO_ABERTO:
+            if self._sondando:
+                return False
+            self._sondando = True
+            return True
+        return self.estado == self.FECHADO
+
+    def sucesso(self):
+        self.estado = self.FECHADO
+        self.falhas = 0
+        self.espera = ESPERA_ABERTO
+        self._sondando = False
+
+    def falha(self, agora):
+        self.falhas += 1
+        if self.estado == self.MEIO_ABERTO:
+            self.espera = min(self.espera * 2, ESPERA_ABERTO_MAXIMA)
+        elif self.falhas < FALHAS_PARA_ABRIR:
+            return
+        self.estado = self.ABERTO
+        self.aberto_ate = agora + self.espera
+        self._sondando = False
+
+
+class ClienteONS:
+    """Sessão aiohttp com pool de conexões keep-alive, deduplicação de URLs em voo e busca condicional"""
+
+    def __init__(self, timeout=TIMEOUT, conexoes=TAMANHO_POOL):
+        self.timeout = timeout
+        self.conexoes = conexoes
+        self._sessao = None
+        self._em_voo = {}
+        self._disjuntores = {}
+        self._validadores = {}
+        self._decodificados = {}
+
+    async def abrir(self):
+        if self._sessao is None:
+            self._sessao = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.conexoes, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=CABECALHOS
+            )
+        return self
+
+    async def fechar(self):
+        if self._sessao is not None:
+            await self._sessao.close()
+            self._sessao = None
+
+    async def __aenter__(self):
+        return await self.abrir()
+
+    async def __aexit__(self, *exc):
+        await self.fechar()
+
+    def disjuntor(self, url):
+        disjuntor = self._disjuntores.get(url)
+        if disjuntor is None:
+            disjuntor = self._disjuntores[url] = Disjuntor()
+        return disjuntor
+
+    def saude(self):
+        """Estado do circuito de cada URL já consultada"""
+        return {url: disjuntor.estado for url, disjuntor in list(self._disjuntores.items())}
+
+    def _validar(self, url, resposta, conteudo):
+        """Guardar os validadores; conteúdo igual ao anterior devolve o corpo anterior"""
+        digest = hashlib.blake2b(conteudo, digest_size=16).digest()
+        anterior = self._validadores.get(url)
+        if anterior is not None and anterior.digest == digest:
+            FETCH_INALTERADAS.inc(endpoint=endpoint(url), via='hash')
+            conteudo = anterior.corpo
+        self._validadores[url] = Validador(
+            resposta.headers.get('ETag'), resposta.headers.get('Last-Modified'), digest, conteudo
+        )
+        return conteudo
+
+    async def _baixar(self, url, timeout):
+        rotulo = endpoint(url)
+        disjuntor = self.disjuntor(url)
+        validador = self._validadores.get(url)
+        condicionais = {}
+        if validador is not None and validador.etag:
+            condicionais['If-None-Match'] = validador.etag
+        if validador is not None and validador.modificado:
+            condicionais['If-Modified-Since'] = validador.modificado
+        try:
+            with FETCH_DURACAO.medir(endpoint=rotulo):
+                async with self._sessao.get(
+                    url, headers=condicionais, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as resposta:
+                    conteudo = await resposta.read()
+            FETCH_BYTES.inc(len(conteudo), endpoint=rotulo)
+            if resposta.status == 304 and validador is not None:
+                FETCH_INALTERADAS.inc(endpoint=rotulo, via='304')
+                disjuntor.sucesso()
+                return validador.corpo
+            if resposta.status != 200:
+                FETCH_ERROS.inc(endpoint=rotulo, motivo=f'http_{resposta.status}')
+            elif not conteudo:
+                FETCH_ERROS.inc(endpoint=rotulo, motivo='vazio')
+            else:
+                disjuntor.sucesso()
+                return self._validar(url, resposta, conteudo)
+        except asyncio.CancelledError:
+            # Estourou o prazo do lote sem resposta: conta como falha do endpoint
+            FETCH_ERROS.inc(endpoint=rotulo, motivo='prazo')
+            disjuntor.falha(time.monotonic())
+            raise
+        except asyncio.TimeoutError:
+            FETCH_ERROS.inc(endpoint=rotulo, motivo='timeout')
+        except Exception:
+            FETCH_ERROS.inc(endpoint=rotulo, motivo='erro')
+        disjuntor.falha(time.monotonic())
+        return None
+
+    def _liberar(self, url, voo):
+        # Só remove a própria requisição: a cancelada pode terminar depois de outra já ter começado
+        if self._em_voo.get(url) is voo:
+            del self._em_voo[url]
+
+    async def baixar(self, url, timeout=None):
+        """Corpo da resposta de um endpoint; None em caso de falha ou circuito aberto"""
+        await self.abrir()
+        voo = self._em_voo.get(url)
+        if voo is None:
+            if not self.disjuntor(url).permitir(time.monotonic()):
+                FETCH_ERROS.inc(endpoint=endpoint(url), motivo='circuito_aberto')
+                return None
+            # [tarefa, interessados]: a requisição só é cancelada quando todos desistem
+            voo = self._em_voo[url] = [asyncio.ensure_future(self._baixar(url, timeout or self.timeout)), 0]
+            voo[0].add_done_callback(lambda _: self._liberar(url, voo))
+        else:
+            FETCH_DEDUPLICADAS.inc(endpoint=endpoint(url))
+        voo[1] += 1
+        try:
+            # shield: cancelar um dos interessados não derruba a requisição dos outros
+            return await asyncio.shield(voo[0])
+        except asyncio.CancelledError:
+            if voo[1] == 1:
+                voo[0].cancel()
+                self._liberar(url, voo)
+            raise
+        finally:
+            voo[1] -= 1
+
+    async def _decodificar(self, url, timeout, decodificar, *args):
+        conteudo = await self.baixar(url, timeout)
+        if conteudo is None:
+            return None
+        # Mesmo corpo da última vez (304 ou hash igual): o mesmo resultado, que não deve ser alterado
+        chave = (url, decodificar, args)
+        anterior = self._decodificados.get(chave)
+        if anterior is not None and anterior[0] is conteudo:
+            return anterior[1]
+        try:
+            # Payloads de vários dias levam milissegundos para decodificar: fora do event loop
+            with ETAPA_DURACAO.medir(etapa='decode'):
+                resultado = await asyncio.to_thread(decodificar, conteudo, *args)
+        except ValueError:
+            FETCH_ERROS.inc(endpoint=endpoint(url), motivo='json')
+            return None
+        self._decodificados[chave] = (conteudo, resultado)
+        return resultado
+
+    async def buscar_json(self, url, timeout=None):
+        """Payload bruto (lista de dicts) de um endpoint; None em caso de falha"""
+        return await self._decodificar(url, timeout, json.loads)
+
+    async def buscar_colunas(self, url, coluna, timeout=None):
+        """Endpoint direto em colunas tipadas; None em caso de falha"""
+        return await self._decodificar(url, timeout, decodificar_colunas, coluna)
+
+    async def buscar_varios(self, requisicoes=None, prazo=PRAZO_CICLO, timeout=None):
+        """Buscar endpoints em paralelo dentro de um prazo, no formato do ciclo do poller.
+
+        Devolve {'dados': chave -> Colunas, 'faltantes': [...], 'duracao': s};
+        quem não responde até o prazo fica de fora (a requisição é cancelada),
+        permitindo dados parciais. 'timeout' ainda limita cada requisição.
+        """
+        if requisicoes is None:
+            requisicoes = requisicoes_padrao()
+        inicio = time.monotonic()
+        tarefas = {
+            asyncio.ensure_future(self.buscar_colunas(url, coluna, timeout)): chave
+            for chave, (url, _, coluna) in requisicoes.items()
+        }
+        resultados = {}
+        if tarefas:
+            concluidas, pendentes = await asyncio.wait(tarefas, timeout=prazo)
+            for tarefa in pendentes:
+                tarefa.cancel()
+            for tarefa in concluidas:
+                if not tarefa.cancelled() and tarefa.exception() is None and tarefa.result() is not None:
+                    resultados[tarefas[tarefa]] = tarefa.result()
+        return {
+            'dados': resultados,
+            'faltantes': sorted(set(requisicoes) - set(resultados)),
+            'duracao': time.monotonic() - inicio
+        }
+
+    async def novos_pontos(self, requisicoes=None, intervalo=INTERVALO_INICIAL):
+        """Gerador assíncrono de (chave, DataFrame só com os pontos novos).
+
+        Cada endpoint segue a própria agenda (ons_agenda): buscado logo depois
+        da publicação esperada, com recuo em erros ou sem dado novo.
+        """
+        if requisicoes is None:
+            requisicoes = requisicoes_padrao()
+        agenda = Agenda(requisicoes, intervalo)
+        store = SeriesStore()
+        while True:
+            await asyncio.sleep(agenda.espera())
+            vencidas = agenda.vencidas()
+            if not vencidas:
+                continue
+            ciclo = await self.buscar_varios({chave: requisicoes[chave] for chave in vencidas})
+            agora = time.time()
+            for chave in ciclo['faltantes']:
+                agenda.falhou(chave, agora)
+            for chave, colunas in ciclo['dados'].items():
+                _, parser, coluna = requisicoes[chave]
+                delta = store.ingerir(chave, colunas, parser, coluna)
+                agenda.registrar(chave, delta['instante'].to_numpy() if not delta.empty else (), agora)
+                if not delta.empty:
+                    yield chave, delta
+
+
+# Valor de ons_circuito_estado para cada estado do disjuntor
+NIVEL_CIRCUITO = {Disjuntor.FECHADO: 0, Disjuntor.MEIO_ABERTO: 1, Disjuntor.ABERTO: 2}
+
+# Cliente do processo, num event loop em segundo plano, para os chamadores síncronos
+_loop = None
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def obter_cliente():
+    """Event loop e cliente compartilhados pelo processo, iniciados na primeira chamada"""
+    global _loop, _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='ons-cliente', daemon=True).start()
+            _cliente = ClienteONS()
+            atexit.register(_fechar_cliente)
+            CIRCUITO_ESTADO.registrar_coletor(lambda: {
+                (('endpoint', endpoint(url)),): NIVEL_CIRCUITO[estado] for url, estado in _cliente.saude().items()
+            })
+        return _loop, _cliente
+
+
+def _fechar_cliente():
+    try:
+        asyncio.run_coroutine_threadsafe(_cliente.fechar(), _loop).result(2)
+    except Exception:
+        pass
+
+
+def executar(corrotina, timeout=None):
+    """Rodar uma corrotina no event loop do processo e esperar o resultado"""
+    loop, _ = obter_cliente()
+    return asyncio.run_coroutine_threadsafe(corrotina, loop).result(timeout)
+
+
+def baixar(url, timeout=TIMEOUT):
+    return executar(obter_cliente()[1].baixar(url, timeout))
+
+
+def buscar_json(url, timeout=TIMEOUT):
+    return executar(obter_cliente()[1].buscar_json(url, timeout))
+
+
+def buscar_varios(requisicoes=None, prazo=PRAZO_CICLO, timeout=TIMEOUT):
+    return executar(obter_cliente()[1].buscar_varios(requisicoes, prazo, timeout))
+
+
+# Último payload válido de uma URL, o momento (time.time) em que foi obtido e
+# a versão, que só avança quando o conteúdo muda
+Entrada = namedtuple('Entrada', ['payload', 'obtido_em', 'versao'])
+Resultado = namedtuple('Resultado', ['payload', 'idade', 'stale', 'versao'])
+
+_revalidacoes = concurrent.futures.ThreadPoolExecutor(max_workers=TAMANHO_POOL, thread_name_prefix='ons-swr')
+
+
+class CacheSWR:
+    """Stale-while-revalidate por URL com fallback para o último payload válido.
+
+    Só a primeira busca de uma URL bloqueia; depois disso o último payload
+    bom é devolvido na hora e, vencido o ttl, revalidado em segundo plano.
+    Falhas nunca substituem um payload bom por um vazio. Revalidações com o
+    mesmo conteúdo mantêm o objeto e a versão, para quem deriva dados dele
+    reaproveitar o que já calculou.
+    """
+
+    def __init__(self, ttl=20, buscar=None, timeout=TIMEOUT):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._buscar = buscar or buscar_json
+        self._entradas = {}
+        self._em_voo = set()
+        self._lock = threading.Lock()
+
+    def _revalidar(self, url):
+        try:
+            payload = self._buscar(url, self.timeout)
+            if payload:
+                with self._lock:
+                    anterior = self._entradas.get(url)
+                    if anterior is not None and payload is anterior.payload:
+                        versao = anterior.versao
+                    else:
+                        versao = anterior.versao + 1 if anterior is not None else 1
+                    self._entradas[url] = Entrada(payload, time.time(), versao)
+        finally:
+            with self._lock:
+                self._em_voo.discard(url)
+
+    def idades(self):
+        """Idade (s) do último payload válido de cada URL, para as métricas"""
+        agora = time.time()
+        with self._lock:
+            return {(('endpoint', endpoint(url)),): agora - entrada.obtido_em for url, entrada in self._entradas.items()}
+
+    def obter(self, url):
+        with self._lock:
+            entrada = self._entradas.get(url)
+            vencida = entrada is None or time.time() - entrada.obtido_em > self.ttl
+            disparar = vencida and url not in self._em_voo
+            if disparar:
+                self._em_voo.add(url)
+
+        if entrada is None:
+            if disparar:
+                self._revalidar(url)
+            with self._lock:
+                entrada = self._entradas.get(url)
+            if entrada is None:
+                return Resultado(None, None, True, 0)
+        elif disparar:
+            _revalidacoes.submit(self._revalidar, url)
+
+        idade = time.time() - entrada.obtido_em
+        return Resultado(entrada.payload, idade, idade > self.ttl, entrada.versao)
+
+
+_cache_swr = None
+
+
+def obter_cache_swr(ttl=20):
+    """Cache SWR compartilhado pelo processo"""
+    global _cache_swr
+    with _cliente_lock:
+        if _cache_swr is None:
+            _cache_swr = CacheSWR(ttl=ttl)
+            IDADE_ENDPOINT.registrar_coletor(_cache_swr.idades)
+        return _cache_swr
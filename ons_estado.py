@@ -0,0 +1,166 @@
+"""Estado derivado de um snapshot do poller, independente da interface.
+
+Usado pelas sessões do streamlit_app.py e pelo painel pré-renderizado
+(ons_painel.py): os mesmos números nos dois caminhos. Os KPIs são nós de um
+grafo (ons_grafo) sobre as séries do snapshot: cada um só é recalculado
+quando as séries de que depende mudaram.
+"""
+import pandas as pd
+
+from ons_calculos import (
+    TENDENCIA_NEUTRA, VARIACAO_NEUTRA, MotorTendencias, analisar_frame, analisar_rampas, processar_series
+)
+from ons_fetch import URLS_GERACAO, CHAVE_CARGA, CHAVE_FREQUENCIA, chave_serie
+from ons_frequencia import DetectorFrequencia
+from ons_grafo import Grafo
+from ons_metricas import cronometrado
+
+ESTADO_VAZIO = {'disponivel': False, 'erro': None}
+
+# Chave da tendência da geração total no motor de tendências
+TENDENCIA_SIN = 'SIN'
+
+# Entradas do grafo: uma por série regional de geração, mais carga e frequência
+CHAVES_GERACAO = tuple(chave_serie(fonte, regiao) for fonte, regioes in URLS_GERACAO.items() for regiao in regioes)
+CHAVES_ENTRADA = CHAVES_GERACAO + (CHAVE_CARGA, CHAVE_FREQUENCIA)
+FONTES_ZERADAS = {'Hidráulica': 0, 'Eólica': 0, 'Solar': 0, 'Térmica': 0, 'Nuclear': 0}
+
+# Nós que compõem o estado devolvido por calcular_estado
+NOS_ESTADO = (
+    'dataframes', 'carga_data', 'frequencia_data', 'fonte_totals', 'timeline_data', 'total_sin',
+    'total_geracao', 'total_carga', 'percentual_renovavel', 'eficiencia', 'margem', 'reserva_pct',
+    'fonte_dominante', 'maior_crescimento', 'tendencias', 'variacoes', 'variacao_carga', 'variacao_geracao',
+    'excursoes'
+)
+
+
+def _carga(df):
+    return df if df is not None else pd.DataFrame(columns=['instante', 'carga'])
+
+def _frequencia(df):
+    return df if df is not None else pd.DataFrame(columns=['instante', 'frequencia'])
+
+@cronometrado('load_data')
+def _dataframes(*frames):
+    return {chave: df for chave, df in zip(CHAVES_GERACAO, frames) if df is not None and not df.empty}
+
+def _tendencia(motor, nome, df):
+    try:
+        motor.atualizar(nome, df)
+        return motor.tendencia(nome)
+    except Exception:
+        return dict(TENDENCIA_NEUTRA)
+
+def _variacao(df, coluna):
+    try:
+        return analisar_frame(df, coluna)
+    except Exception:
+        return dict(VARIACAO_NEUTRA)
+
+def _variacoes_fontes(processado):
+    # Picos, vales e rampas: todas as fontes numa passada sobre o bloco alinhado
+    agregado = processado.agregado
+    try:
+        return analisar_rampas(agregado.instantes, agregado.por_fonte.to_numpy(), list(agregado.por_fonte.columns)) if agregado else {}
+    except Exception:
+        return {}
+
+def _total_geracao(fonte_totals):
+    return sum(v for v in fonte_totals.values() if not pd.isna(v) and v > 0)
+
+def _total_carga(carga_data):
+    return carga_data['carga'].iloc[-1] if len(carga_data) > 0 and not pd.isna(carga_data['carga'].iloc[-1]) else 0
+
+def _percentual_renovavel(fonte_totals, total_geracao):
+    renovaveis = sum([
+        fonte_totals.get('Hidráulica', 0),
+        fonte_totals.get('Eólica', 0),
+        fonte_totals.get('Solar', 0)
+    ])
+    percentual = (renovaveis / total_geracao * 100) if total_geracao > 0 else 0
+    return 0 if pd.isna(percentual) else percentual
+
+def _reserva_pct(margem, total_carga):
+    reserva_pct = (margem / total_carga * 100) if total_carga > 0 else 0
+    return 0 if pd.isna(reserva_pct) else reserva_pct
+
+def _fonte_dominante(fonte_totals, total_geracao):
+    """(fonte, % da geração) da maior fonte"""
+    if not fonte_totals:
+        return None
+    fonte, valor = max(fonte_totals.items(), key=lambda x: x[1])
+    return fonte, (valor / total_geracao * 100) if total_geracao > 0 else 0
+
+def _maior_crescimento(tendencias_fontes):
+    """(fonte, variação %) da fonte que mais cresce; 'Estável' se nenhuma cresce"""
+    maior_crescimento, fonte_crescimento = 0, "Estável"
+    for fonte, trend_f in tendencias_fontes.items():
+        variacao_pct_f = trend_f.get("variacao_pct", 0)
+        if not pd.isna(variacao_pct_f) and variacao_pct_f > maior_crescimento:
+            maior_crescimento, fonte_crescimento = variacao_pct_f, fonte
+    return fonte_crescimento, maior_crescimento
+
+def criar_grafo(motor=None, detector=None):
+    """Grafo dos KPIs; motor (MotorTendencias) e detector (DetectorFrequencia) persistem com ele"""
+    motor = motor or MotorTendencias()
+    detector = detector or DetectorFrequencia()
+    grafo = Grafo()
+    grafo.no('dataframes', CHAVES_GERACAO, _dataframes)
+    grafo.no('carga_data', [CHAVE_CARGA], _carga)
+    grafo.no('frequencia_data', [CHAVE_FREQUENCIA], _frequencia)
+    grafo.no('processado', ['dataframes'], processar_series)
+    grafo.no('fonte_totals', ['processado'], lambda processado: processado.fonte_totals or dict(FONTES_ZERADAS))
+    grafo.no('timeline_data', ['processado'], lambda processado: processado.timeline_data)
+    grafo.no('total_sin', ['processado'], lambda processado: processado.total_sin)
+
+    grafo.no('total_geracao', ['fonte_totals'], _total_geracao)
+    grafo.no('total_carga', ['carga_data'], _total_carga)
+    grafo.no('percentual_renovavel', ['fonte_totals', 'total_geracao'], _percentual_renovavel)
+    grafo.no('eficiencia', ['total_carga', 'total_geracao'], lambda carga, geracao: (carga / geracao * 100) if geracao > 0 else 0)
+    grafo.no('margem', ['total_geracao', 'total_carga'], lambda geracao, carga: geracao - carga)
+    grafo.no('reserva_pct', ['margem', 'total_carga'], _reserva_pct)
+    grafo.no('fonte_dominante', ['fonte_totals', 'total_geracao'], _fonte_dominante)
+
+    # Tendências: cada série alimenta o motor só quando muda
+    grafo.no('tendencia_carga', ['carga_data'], lambda df: _tendencia(motor, CHAVE_CARGA, df))
+    grafo.no('tendencia_sin', ['total_sin'], lambda df: _tendencia(motor, TENDENCIA_SIN, df))
+    grafo.no('tendencia_frequencia', ['frequencia_data'], lambda df: _tendencia(motor, CHAVE_FREQUENCIA, df))
+    # Excursões de frequência: o detector só lê as amostras novas
+    grafo.no('excursoes', ['frequencia_data'], detector.atualizar)
+    grafo.no('tendencias_fontes', ['timeline_data'], lambda timeline: {
+        fonte: _tendencia(motor, fonte, df) for fonte, df in timeline.items()
+    })
+    grafo.no('tendencias', ['tendencia_carga', 'tendencia_sin', 'tendencia_frequencia', 'tendencias_fontes'],
+             lambda carga, sin, frequencia, fontes: {CHAVE_CARGA: carga, TENDENCIA_SIN: sin, CHAVE_FREQUENCIA: frequencia, **fontes})
+    grafo.no('maior_crescimento', ['tendencias_fontes'], _maior_crescimento)
+
+    grafo.no('variacoes_fontes', ['processado'], _variacoes_fontes)
+    grafo.no('variacao_geracao', ['total_sin'], lambda df: _variacao(df, 'geracao'))
+    grafo.no('variacao_carga', ['carga_data'], lambda df: _variacao(df, 'carga'))
+    grafo.no('variacoes', ['variacoes_fontes', 'variacao_geracao', 'variacao_carga'],
+             lambda fontes, sin, carga: {**fontes, TENDENCIA_SIN: sin, CHAVE_CARGA: carga})
+    return grafo
+
+def entradas_grafo(snapshot):
+    """Séries do snapshot nas entradas do grafo; None para as que ainda não chegaram (ou sem snapshot)"""
+    dados = snapshot.dados if snapshot else {}
+    return {chave: dados.get(chave) for chave in CHAVES_ENTRADA}
+
+def calcular_estado(snapshot, grafo):
+    """KPIs, tendências e variações de um snapshot; grafo vem de criar_grafo e persiste entre snapshots"""
+    try:
+        valores = grafo.calcular(entradas_grafo(snapshot), NOS_ESTADO)
+    except Exception as e:
+        return dict(ESTADO_VAZIO, erro=e)
+
+    if valores['carga_data'].empty:
+        return dict(ESTADO_VAZIO)
+
+    tendencias = valores['tendencias']
+    return dict(
+        valores,
+        disponivel=True,
+        erro=None,
+        trend_carga=tendencias[CHAVE_CARGA],
+        trend_geracao=tendencias[TENDENCIA_SIN]
+    )
@@ -0,0 +1,260 @@
+"""Endpoints, decodificação e parsers da API do ONS (Energia Agora); as requisições ficam em ons_cliente"""
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ons_metricas import cronometrado
+
+# ONS_API_BASE_URL permite apontar os dashboards para o simulador local (ons_simulador.py)
+BASE_URL = os.environ.get('ONS_API_BASE_URL', "https://integra.ons.org.br/api/energiaagora/Get").rstrip('/')
+
+# Endpoints de geração consolidada do SIN por fonte (usados pelo app.py)
+URLS_SIN = {
+    'Eólica': f"{BASE_URL}/Geracao_SIN_Eolica_json",
+    'Solar': f"{BASE_URL}/Geracao_SIN_Solar_json",
+    'Hidráulica': f"{BASE_URL}/Geracao_SIN_Hidraulica_json",
+    'Nuclear': f"{BASE_URL}/Geracao_SIN_Nuclear_json",
+    'Térmica': f"{BASE_URL}/Geracao_SIN_Termica_json"
+}
+
+# Endpoints regionais de geração: fonte -> região -> URL
+URLS_GERACAO = {
+    'Eólica': {
+        'Norte': f"{BASE_URL}/Geracao_Norte_Eolica_json",
+        'Nordeste': f"{BASE_URL}/Geracao_Nordeste_Eolica_json",
+        'Sudeste/Centro-Oeste': f"{BASE_URL}/Geracao_SudesteECentroOeste_Eolica_json",
+        'Sul': f"{BASE_URL}/Geracao_Sul_Eolica_json"
+    },
+    'Solar': {
+        'Norte': f"{BASE_URL}/Geracao_Norte_Solar_json",
+        'Nordeste': f"{BASE_URL}/Geracao_Nordeste_Solar_json",
+        'Sudeste/Centro-Oeste': f"{BASE_URL}/Geracao_SudesteECentroOeste_Solar_json",
+        'Sul': f"{BASE_URL}/Geracao_Sul_Solar_json"
+    },
+    'Hidráulica': {
+        'Norte': f"{BASE_URL}/Geracao_Norte_Hidraulica_json",
+        'Nordeste': f"{BASE_URL}/Geracao_Nordeste_Hidraulica_json",
+        'Sudeste/Centro-Oeste': f"{BASE_URL}/Geracao_SudesteECentroOeste_Hidraulica_json",
+        'Sul': f"{BASE_URL}/Geracao_Sul_Hidraulica_json"
+    },
+    'Nuclear': {
+        'Sudeste/Centro-Oeste': f"{BASE_URL}/Geracao_SudesteECentroOeste_Nuclear_json"
+    },
+    'Térmica': {
+        'Norte': f"{BASE_URL}/Geracao_Norte_Termica_json",
+        'Nordeste': f"{BASE_URL}/Geracao_Nordeste_Termica_json",
+        'Sudeste/Centro-Oeste': f"{BASE_URL}/Geracao_SudesteECentroOeste_Termica_json",
+        'Sul': f"{BASE_URL}/Geracao_Sul_Termica_json"
+    }
+}
+
+URL_CARGA = f"{BASE_URL}/Carga_SIN_json"
+URL_FREQUENCIA = f"{BASE_URL}/Frequencia_SIN_json"
+
+# Chaves das séries que não são de geração
+CHAVE_CARGA = 'Carga'
+CHAVE_FREQUENCIA = 'Frequência'
+
+# Timeout (s) de cada requisição e orçamento (s) de um lote do ciclo. As
+# requisições do lote correm em paralelo: o prazo fica abaixo do timeout para
+# que um endpoint travado seja cancelado por ele, e não espere o timeout inteiro
+TIMEOUT = 5
+PRAZO_CICLO = 4.0
+
+# Uma conexão keep-alive por endpoint do ciclo
+TAMANHO_POOL = sum(len(regioes) for regioes in URLS_GERACAO.values()) + 2
+
+
+def todas_as_urls():
+    """Todos os endpoints consumidos pelos dois dashboards, sem repetição"""
+    urls = list(URLS_SIN.values())
+    urls += [url for regioes in URLS_GERACAO.values() for url in regioes.values()]
+    urls += [URL_CARGA, URL_FREQUENCIA]
+    return list(dict.fromkeys(urls))
+
+
+def chave_serie(fonte, regiao):
+    return f'{fonte} - {regiao}'
+
+
+def separar_chave(chave):
+    """Inverso de chave_serie: 'Eólica - Sul' -> ('Eólica', 'Sul')"""
+    fonte, _, regiao = chave.partition(' - ')
+    return fonte, regiao
+
+
+# Formato dos instantes devolvidos pela API; conhecido, dispensa a inferência do pandas
+FORMATO_INSTANTE = '%Y-%m-%dT%H:%M:%S'
+
+
+class Colunas:
+    """Payload decodificado em colunas tipadas: instantes datetime64[ns] e valores float64.
+
+    Montadas a partir dos itens JSON (de_itens), as colunas só são convertidas
+    no primeiro acesso: quem precisa só da cauda nova acha a posição pelos
+    textos dos instantes (depois_de) e converte apenas a fatia.
+    """
+
+    __slots__ = ('_instantes', '_valores', '_itens', '_coluna')
+
+    def __init__(self, instantes, valores):
+        self._instantes = instantes
+        self._valores = valores
+        self._itens = None
+        self._coluna = None
+
+    @classmethod
+    def de_itens(cls, itens, coluna):
+        colunas = cls(None, None)
+        colunas._itens = itens
+        colunas._coluna = coluna
+        return colunas
+
+    def _converter(self):
+        if self._instantes is None:
+            self._valores = converter_valores([item.get(self._coluna) for item in self._itens])
+            self._instantes = converter_instantes([item.get('instante') for item in self._itens])
+
+    @property
+    def instantes(self):
+        self._converter()
+        return self._instantes
+
+    @property
+    def valores(self):
+        self._converter()
+        return self._valores
+
+    def __len__(self):
+        return len(self._itens) if self._instantes is None else len(self._instantes)
+
+    def __getitem__(self, fatia):
+        if self._instantes is None:
+            return Colunas.de_itens(self._itens[fatia], self._coluna)
+        return Colunas(self._instantes[fatia], self._valores[fatia])
+
+    def texto(self, posicao):
+        """'instante' da posição como veio no JSON; None sem os itens"""
+        return self._itens[posicao].get('instante') if self._itens is not None else None
+
+    def depois_de(self, texto):
+        """Posição logo após o último item com esse 'instante', varrendo do fim; None se não houver"""
+        if self._itens is None or texto is None:
+            return None
+        for posicao in range(len(self._itens) - 1, -1, -1):
+            if self._itens[posicao].get('instante') == texto:
+                return posicao + 1
+        return None
+
+
+def converter_instantes(textos):
+    """Textos ISO do ONS -> datetime64[ns]; None e textos inválidos viram NaT"""
+    try:
+        with warnings.catch_warnings():
+            # Fuso horário no texto cai no caminho do pandas em vez de ser convertido para UTC
+            warnings.simplefilter('error')
+            return np.array(textos, dtype='datetime64[ms]').astype('datetime64[ns]')
+    except (ValueError, TypeError, DeprecationWarning, UserWarning):
+        textos = pd.Series(textos, dtype=object)
+        instantes = pd.to_datetime(textos, format=FORMATO_INSTANTE, errors='coerce')
+        if instantes.isna().any():
+            try:
+                # Variações ISO (frações, fuso): mantém o horário local do texto
+                iso = pd.to_datetime(textos, format='ISO8601', errors='coerce')
+                if iso.dt.tz is not None:
+                    iso = iso.dt.tz_localize(None)
+                instantes = instantes.fillna(iso)
+            except (ValueError, TypeError, AttributeError):
+                pass
+        return instantes.to_numpy('datetime64[ns]')
+
+
+def converter_valores(valores):
+    """Números do payload -> float64; None e textos não numéricos viram NaN"""
+    try:
+        return np.array(valores, dtype=np.float64)
+    except (ValueError, TypeError):
+        return pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce').to_numpy(np.float64)
+
+
+def itens_do_payload(data, coluna):
+    """Lista de objetos JSON -> Colunas ainda não convertidas (ver Colunas.de_itens)"""
+    if not isinstance(data, list):
+        data = []
+    return Colunas.de_itens([item for item in data if isinstance(item, dict)], coluna)
+
+
+def colunas_do_payload(data, coluna):
+    """Lista de objetos JSON -> Colunas, sem montar um DataFrame intermediário"""
+    colunas = itens_do_payload(data, coluna)
+    colunas._converter()
+    return colunas
+
+
+def decodificar_colunas(conteudo, coluna):
+    """Bytes da resposta -> Colunas; None se o corpo não for uma lista JSON.
+
+    A conversão fica para o primeiro acesso: o SeriesStore só converte a cauda nova
+    """
+    data = json.loads(conteudo)
+    return itens_do_payload(data, coluna) if isinstance(data, list) else None
+
+
+def _colunas(data, coluna):
+    return data if isinstance(data, Colunas) else colunas_do_payload(data, coluna)
+
+
+def _frame(instantes, valores, coluna):
+    return pd.DataFrame({'instante': instantes, coluna: valores})
+
+
+@cronometrado('parse')
+def parse_geracao(data):
+    """Converter payload de geração em DataFrame com tratamento de NaN"""
+    colunas = _colunas(data, 'geracao')
+    valores = np.where(np.isnan(colunas.valores), 0.0, colunas.valores)  # Substituir NaN por 0
+    validos = ~np.isnat(colunas.instantes) & (valores >= 0)  # Remover valores negativos
+    return _frame(colunas.instantes[validos], valores[validos], 'geracao')
+
+
+@cronometrado('parse')
+def parse_carga(data):
+    """Converter payload de carga em DataFrame com forward fill"""
+    colunas = _colunas(data, 'carga')
+    validos = ~np.isnat(colunas.instantes)
+    instantes, valores = colunas.instantes[validos], colunas.valores[validos]
+    # Forward fill para NaN: cada posição aponta para o último valor conhecido
+    conhecidos = np.where(np.isnan(valores), 0, np.arange(len(valores)))
+    valores = valores[np.maximum.accumulate(conhecidos)] if len(valores) else valores
+    validos = ~np.isnan(valores)  # Remover linhas ainda com NaN (início da série)
+    return _frame(instantes[validos], valores[validos], 'carga')
+
+
+# Faixa fisicamente plausível (Hz): fora dela é erro de medição, não excursão.
+# Larga o bastante para não esconder eventos reais do detector (ons_frequencia)
+FREQUENCIA_PLAUSIVEL = (55.0, 65.0)
+
+
+@cronometrado('parse')
+def parse_frequencia(data):
+    """Converter payload de frequência em DataFrame filtrando anomalias"""
+    colunas = _colunas(data, 'frequencia')
+    valores = colunas.valores
+    # Amostras ausentes (NaN) são descartadas, não viram 60Hz: não mascaram excursões
+    minimo, maximo = FREQUENCIA_PLAUSIVEL
+    validos = ~np.isnat(colunas.instantes) & (valores >= minimo) & (valores <= maximo)
+    return _frame(colunas.instantes[validos], valores[validos], 'frequencia')
+
+
+def requisicoes_padrao():
+    """Todas as requisições de um ciclo: chave -> (url, parser, coluna)"""
+    requisicoes = {}
+    for fonte, regioes in URLS_GERACAO.items():
+        for regiao, url in regioes.items():
+            requisicoes[chave_serie(fonte, regiao)] = (url, parse_geracao, 'geracao')
+    requisicoes[CHAVE_CARGA] = (URL_CARGA, parse_carga, 'carga')
+    requisicoes[CHAVE_FREQUENCIA] = (URL_FREQUENCIA, parse_frequencia, 'frequencia')
+    return requisicoes
@@ -0,0 +1,190 @@
+"""Detector de excursões de frequência do SIN sobre um buffer circular.
+
+Cada amostra custa O(1): entra num anel de tamanho fixo, é classificada nas
+faixas (normal 59,9–60,1 Hz; atenção 59,5–60,5 Hz; crítico fora delas) e
+atualiza a excursão em curso: duração, nadir (valor mais distante de 60 Hz)
+e ROCOF (df/dt, Hz/s). Excursões encerradas vão para um log de tamanho fixo.
+atualizar() recebe a série do dia, mas só lê os pontos posteriores ao
+último já visto: o dia não é percorrido de novo a cada snapshot.
+"""
+import threading
+from collections import deque, namedtuple
+
+import numpy as np
+
+from ons_metricas import FREQUENCIA_EXCURSOES
+
+NOMINAL = 60.0
+FAIXA_NORMAL = (59.9, 60.1)
+FAIXA_ATENCAO = (59.5, 60.5)
+
+NORMAL, ATENCAO, CRITICO = 'normal', 'atencao', 'critico'
+_GRAVIDADE = {NORMAL: 0, ATENCAO: 1, CRITICO: 2}
+
+# Amostras no anel (um dia minuto a minuto) e excursões mantidas no log
+CAPACIDADE = 1440
+LIMITE_EVENTOS = 50
+
+# ROCOF entre a amostra nova e a de JANELA_ROCOF posições antes; buracos
+# maiores que INTERVALO_ROCOF (s) não contam como derivada
+JANELA_ROCOF = 1
+INTERVALO_ROCOF = 300
+
+# Uma excursão fora da faixa normal: 'sentido' é 'sub' ou 'sobre', 'nadir' o
+# valor mais distante de 60 Hz, 'rocof' o maior |df/dt| (Hz/s) e 'duracao' em
+# segundos. Instantes em datetime64[s]; 'fim' é None enquanto está em curso
+Evento = namedtuple('Evento', ['inicio', 'fim', 'sentido', 'severidade', 'nadir', 'rocof', 'duracao', 'amostras'])
+
+# Situação publicada a cada atualização; 'eventos' do mais antigo ao mais recente
+EstadoFrequencia = namedtuple('EstadoFrequencia', ['atual', 'faixa', 'rocof', 'evento', 'eventos'])
+
+ESTADO_INICIAL = EstadoFrequencia(None, NORMAL, 0.0, None, ())
+
+
+def classificar(valor):
+    """Faixa de um valor de frequência (Hz)"""
+    if FAIXA_NORMAL[0] <= valor <= FAIXA_NORMAL[1]:
+        return NORMAL
+    if FAIXA_ATENCAO[0] <= valor <= FAIXA_ATENCAO[1]:
+        return ATENCAO
+    return CRITICO
+
+
+class _Excursao:
+    __slots__ = ('inicio', 'ultimo', 'sentido', 'severidade', 'nadir', 'rocof', 'amostras')
+
+    def __init__(self, instante, sentido):
+        self.inicio = self.ultimo = instante
+        self.sentido = sentido
+        self.severidade = NORMAL
+        self.nadir = NOMINAL
+        self.rocof = 0.0
+        self.amostras = 0
+
+    def atualizar(self, instante, valor, faixa, rocof):
+        self.ultimo = instante
+        self.amostras += 1
+        if _GRAVIDADE[faixa] > _GRAVIDADE[self.severidade]:
+            self.severidade = faixa
+        if abs(valor - NOMINAL) > abs(self.nadir - NOMINAL):
+            self.nadir = valor
+        self.rocof = max(self.rocof, abs(rocof))
+
+    def evento(self, fim=None):
+        return Evento(
+            inicio=np.datetime64(self.inicio, 's'),
+            fim=np.datetime64(fim, 's') if fim is not None else None,
+            sentido=self.sentido,
+            severidade=self.severidade,
+            nadir=self.nadir,
+            rocof=self.rocof,
+            duracao=int((fim if fim is not None else self.ultimo) - self.inicio),
+            amostras=self.amostras
+        )
+
+
+class DetectorFrequencia:
+    """Excursões de frequência em streaming; uma instância por processo (ou por grafo de KPIs)"""
+
+    def __init__(self, capacidade=CAPACIDADE, limite_eventos=LIMITE_EVENTOS):
+        self.capacidade = capacidade
+        self._instantes = np.zeros(capacidade, dtype=np.int64)
+        self._valores = np.zeros(capacidade, dtype=np.float64)
+        self._proximo = 0
+        self._tamanho = 0
+        self._rocof = 0.0
+        self._aberta = None
+        self._eventos = deque(maxlen=limite_eventos)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._tamanho
+
+    def _posicao(self, atras):
+        """Índice no anel da amostra 'atras' posições antes da última (0 = última)"""
+        return (self._proximo - 1 - atras) % self.capacidade
+
+    def _adicionar(self, instante, valor):
+        if not np.isfinite(valor):
+            return
+        if self._tamanho:
+            if instante <= self._instantes[self._posicao(0)]:
+                return
+            anterior = self._posicao(min(JANELA_ROCOF, self._tamanho) - 1)
+            intervalo = instante - self._instantes[anterior]
+            self._rocof = float((valor - self._valores[anterior]) / intervalo) if intervalo <= INTERVALO_ROCOF else 0.0
+        self._instantes[self._proximo] = instante
+        self._valores[self._proximo] = valor
+        self._proximo = (self._proximo + 1) % self.capacidade
+        self._tamanho = min(self._tamanho + 1, self.capacidade)
+
+        faixa = classificar(valor)
+        sentido = 'sub' if valor < NOMINAL else 'sobre'
+        aberta = self._aberta
+        # Volta à faixa normal (ou cruza direto para o outro lado): encerra a excursão
+        if aberta is not None and (faixa == NORMAL or sentido != aberta.sentido):
+            evento = aberta.evento(fim=instante)
+            self._eventos.append(evento)
+            FREQUENCIA_EXCURSOES.inc(severidade=evento.severidade, sentido=evento.sentido)
+            aberta = self._aberta = None
+        if faixa != NORMAL:
+            if aberta is None:
+                aberta = self._aberta = _Excursao(instante, sentido)
+            aberta.atualizar(instante, valor, faixa, self._rocof)
+
+    def adicionar(self, instante, valor):
+        """Uma amostra: instante (datetime64) e valor em Hz; fora de ordem é ignorada"""
+        with self._lock:
+            self._adicionar(int(np.datetime64(instante, 's').astype(np.int64)), float(valor))
+
+    def atualizar(self, df, coluna='frequencia'):
+        """Alimentar com a série do dia (DataFrame ordenado por instante) e devolver o estado"""
+        with self._lock:
+            if df is not None and len(df):
+                instantes = df['instante'].to_numpy()
+                inicio = 0
+                if self._tamanho:
+                    ultimo = np.datetime64(int(self._instantes[self._posicao(0)]), 's')
+                    inicio = int(np.searchsorted(instantes, ultimo, side='right'))
+                if inicio < len(instantes):
+                    novos = instantes[inicio:].astype('datetime64[s]').astype(np.int64)
+                    valores = df[coluna].to_numpy(dtype=np.float64)[inicio:]
+                    for instante, valor in zip(novos.tolist(), valores.tolist()):
+                        self._adicionar(instante, valor)
+            return self._estado()
+
+    def _estado(self):
+        if not self._tamanho:
+            return ESTADO_INICIAL
+        atual = float(self._valores[self._posicao(0)])
+        return EstadoFrequencia(
+            atual=atual,
+            faixa=classificar(atual),
+            rocof=self._rocof,
+            evento=self._aberta.evento() if self._aberta is not None else None,
+            eventos=tuple(self._eventos)
+        )
+
+    def estado(self):
+        with self._lock:
+            return self._estado()
+
+    def recentes(self, n=None):
+        """Últimas n amostras do anel (todas por padrão): (instantes datetime64[s], valores)"""
+        with self._lock:
+            n = self._tamanho if n is None else min(n, self._tamanho)
+            posicoes = (self._proximo - n + np.arange(n)) % self.capacidade
+            return self._instantes[posicoes].astype('datetime64[s]'), self._valores[posicoes].copy()
+
+
+def evento_serializavel(evento):
+    """Evento em tipos JSON, com horários HH:MM:SS, para o painel e os cards"""
+    return {
+        'inicio': str(evento.inicio)[11:19],
+        'fim': str(evento.fim)[11:19] if evento.fim is not None else None,
+        'sentido': evento.sentido,
+        'severidade': evento.severidade,
+        'nadir': float(evento.nadir),
+        'rocof': float(evento.rocof),
+        'duracao': evento.duracao
+    }
@@ -0,0 +1,105 @@
+"""Grafo de dependências para derivados incrementais (KPIs do dashboard).
+
+Entradas são versionadas por identidade: a versão só avança quando chega
+outro objeto, como os frames do SeriesStore, que se mantêm enquanto a série
+não recebe pontos novos. Cada nó guarda as versões das dependências com que
+foi calculado e só recalcula quando alguma mudou; se o resultado sai igual
+ao anterior (escalares, tuplas, dicts), a versão do nó não avança e os
+dependentes não recalculam.
+
+    grafo = Grafo()
+    grafo.no('total', ['a', 'b'], lambda a, b: a + b)
+    grafo.entrada('a', 1)
+    grafo.entrada('b', 2)
+    grafo.valor('total')
+"""
+import threading
+
+from ons_metricas import GRAFO_RECALCULOS
+
+
+class _No:
+    __slots__ = ('funcao', 'dependencias', 'valor', 'versao', 'versoes_dependencias')
+
+    def __init__(self, funcao=None, dependencias=()):
+        self.funcao = funcao
+        self.dependencias = tuple(dependencias)
+        self.valor = None
+        self.versao = 0
+        self.versoes_dependencias = None
+
+
+def _igual(a, b):
+    """Corte antecipado: só compara valores simples; frames e objetos contam como novos"""
+    if a is b:
+        return True
+    if type(a) is not type(b) or not isinstance(a, (bool, int, float, str, tuple, dict)):
+        return False
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+
+class Grafo:
+    """Nós declarados sobre entradas versionadas; compartilhável entre threads e sessões"""
+
+    def __init__(self):
+        self._nos = {}
+        self._lock = threading.RLock()
+
+    def no(self, nome, dependencias, funcao=None):
+        """Declarar um nó; funcao recebe os valores das dependências na ordem. Serve como decorator"""
+        def registrar(funcao):
+            with self._lock:
+                self._nos[nome] = _No(funcao, dependencias)
+            return funcao
+        return registrar(funcao) if funcao is not None else registrar
+
+    def _entrada(self, nome, valor):
+        no = self._nos.get(nome)
+        if no is None:
+            no = self._nos[nome] = _No()
+        if no.versao == 0 or valor is not no.valor:
+            no.valor = valor
+            no.versao += 1
+
+    def entrada(self, nome, valor):
+        """Definir uma entrada; a versão só avança se 'valor' for outro objeto"""
+        with self._lock:
+            self._entrada(nome, valor)
+
+    def _atualizar(self, nome):
+        no = self._nos[nome]
+        if no.funcao is None:
+            return no
+        dependencias = [self._atualizar(dependencia) for dependencia in no.dependencias]
+        versoes = tuple(dependencia.versao for dependencia in dependencias)
+        if versoes != no.versoes_dependencias:
+            valor = no.funcao(*(dependencia.valor for dependencia in dependencias))
+            no.versoes_dependencias = versoes
+            GRAFO_RECALCULOS.inc(no=nome)
+            if no.versao == 0 or not _igual(valor, no.valor):
+                no.valor = valor
+                no.versao += 1
+        return no
+
+    def valor(self, nome):
+        with self._lock:
+            return self._atualizar(nome).valor
+
+    def valores(self, nomes):
+        """Valores de vários nós numa passada: nome -> valor"""
+        with self._lock:
+            return {nome: self._atualizar(nome).valor for nome in nomes}
+
+    def calcular(self, entradas, nomes):
+        """Definir entradas e ler nós sob o mesmo lock: os valores nunca misturam entradas de outro chamador"""
+        with self._lock:
+            for nome, valor in entradas.items():
+                self._entrada(nome, valor)
+            return {nome: self._atualizar(nome).valor for nome in nomes}
+
+    def versao(self, nome):
+        with self._lock:
+            return self._atualizar(nome).versao
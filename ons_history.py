@@ -0,0 +1,171 @@
+"""Histórico local append-only das séries do ONS em Parquet particionado por dia"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from ons_series import SeriesCompactas
+
+try:
+    import pyarrow  # noqa: F401 - engine do to_parquet/read_parquet
+    HISTORICO_DISPONIVEL = True
+except ImportError:
+    HISTORICO_DISPONIVEL = False
+
+DIRETORIO_PADRAO = os.environ.get('ONS_HISTORICO_DIR', 'historico')
+
+# Os deltas de cada série são acumulados e gravados em lotes para não gerar
+# um arquivo por minuto; o dia corrente é sempre rebuscado da API no boot
+INTERVALO_GRAVACAO = 600
+
+
+def _gravar_parquet(df, caminho):
+    """Gravar num temporário da mesma pasta e renomear: uma queda no meio não corrompe a parte"""
+    temporario = os.path.join(os.path.dirname(caminho), f'.{os.path.basename(caminho)}.tmp')
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def _partes(pasta):
+    """Partes gravadas de uma pasta de dia, em ordem; temporários de escrita ficam de fora"""
+    return sorted(nome for nome in os.listdir(pasta) if nome.endswith('.parquet') and not nome.startswith('.'))
+
+
+def _slug(chave):
+    """'Eólica - Sudeste/Centro-Oeste' -> 'eolica_sudeste_centro_oeste'"""
+    ascii_ = unicodedata.normalize('NFKD', chave).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', ascii_.lower()).strip('_')
+
+
+class HistoricoStore:
+    """Histórico por série: <dir>/<serie>/<AAAA-MM-DD>/parte-*.parquet
+
+    Os deltas ingeridos viram partes imutáveis gravadas em lote; dias
+    encerrados são compactados num único <AAAA-MM-DD>.parquet.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, intervalo_gravacao=INTERVALO_GRAVACAO):
+        self.diretorio = diretorio
+        self.intervalo_gravacao = intervalo_gravacao
+        self._lock = threading.Lock()
+        self._pendentes = {}
+        self._ultima_gravacao = {}
+
+    def _dir_serie(self, chave):
+        return os.path.join(self.diretorio, _slug(chave))
+
+    def anexar(self, chave, delta):
+        """Acumular os pontos novos de uma série e gravar quando o lote vencer"""
+        if not HISTORICO_DISPONIVEL or delta is None or delta.empty:
+            return
+        with self._lock:
+            self._pendentes.setdefault(chave, []).append(delta)
+            ultima = self._ultima_gravacao.setdefault(chave, time.monotonic())
+            if time.monotonic() - ultima >= self.intervalo_gravacao:
+                self._gravar(chave)
+
+    def descarregar(self):
+        """Gravar todos os lotes pendentes (ex.: ao encerrar o processo)"""
+        with self._lock:
+            for chave in list(self._pendentes):
+                self._gravar(chave)
+
+    def _gravar(self, chave):
+        blocos = self._pendentes.pop(chave, [])
+        self._ultima_gravacao[chave] = time.monotonic()
+        if not blocos:
+            return
+        delta = pd.concat(blocos, ignore_index=True)
+        for dia, parte in delta.groupby(delta['instante'].dt.date):
+            pasta = os.path.join(self._dir_serie(chave), dia.isoformat())
+            os.makedirs(pasta, exist_ok=True)
+            nome = f"parte-{parte['instante'].iloc[-1]:%H%M%S}-{len(_partes(pasta)):05d}.parquet"
+            _gravar_parquet(parte.reset_index(drop=True), os.path.join(pasta, nome))
+
+    def compactar(self, chave, dia):
+        """Fundir as partes de um dia encerrado num único arquivo"""
+        if not HISTORICO_DISPONIVEL:
+            return
+        with self._lock:
+            self._compactar_pasta(_slug(chave), dia.isoformat())
+
+    def compactar_dias_encerrados(self, hoje=None):
+        if not HISTORICO_DISPONIVEL or not os.path.isdir(self.diretorio):
+            return
+        hoje = (hoje or date.today()).isoformat()
+        with self._lock:
+            for slug in os.listdir(self.diretorio):
+                for nome in os.listdir(os.path.join(self.diretorio, slug)):
+                    if nome < hoje and os.path.isdir(os.path.join(self.diretorio, slug, nome)):
+                        self._compactar_pasta(slug, nome)
+
+    def _compactar_pasta(self, slug, dia_iso):
+        pasta = os.path.join(self.diretorio, slug, dia_iso)
+        if not os.path.isdir(pasta):
+            return
+        partes = _partes(pasta)
+        destino = os.path.join(self.diretorio, slug, f'{dia_iso}.parquet')
+        if os.path.exists(destino):
+            partes_caminho = [destino] + [os.path.join(pasta, p) for p in partes]
+        else:
+            partes_caminho = [os.path.join(pasta, p) for p in partes]
+        df = self._ler_arquivos(partes_caminho)
+        if not df.empty:
+            _gravar_parquet(df, destino)
+        # Sobras de escritas interrompidas também saem com a pasta
+        for nome in os.listdir(pasta):
+            os.remove(os.path.join(pasta, nome))
+        os.rmdir(pasta)
+
+    @staticmethod
+    def _ler_arquivos(arquivos):
+        frames = [pd.read_parquet(arquivo) for arquivo in arquivos]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        return df.drop_duplicates(subset='instante', keep='last').sort_values('instante', ignore_index=True)
+
+    def _arquivos_do_dia(self, chave, dia):
+        base = self._dir_serie(chave)
+        compactado = os.path.join(base, f'{dia.isoformat()}.parquet')
+        pasta = os.path.join(base, dia.isoformat())
+        arquivos = [compactado] if os.path.exists(compactado) else []
+        if os.path.isdir(pasta):
+            arquivos += [os.path.join(pasta, p) for p in _partes(pasta)]
+        return arquivos
+
+    def consultar(self, chave, inicio, fim=None):
+        """Pontos de uma série em [inicio, fim]; só lê as partições dos dias do intervalo"""
+        if not HISTORICO_DISPONIVEL:
+            return pd.DataFrame()
+        inicio = pd.Timestamp(inicio)
+        fim = pd.Timestamp(fim) if fim is not None else pd.Timestamp(datetime.now())
+        # Sob o lock: a compactação não troca as partes no meio da leitura
+        with self._lock:
+            arquivos = []
+            dia = inicio.date()
+            while dia <= fim.date():
+                arquivos += self._arquivos_do_dia(chave, dia)
+                dia += timedelta(days=1)
+            df = self._ler_arquivos(arquivos)
+        if df.empty:
+            return df
+        return df[(df['instante'] >= inicio) & (df['instante'] <= fim)].reset_index(drop=True)
+
+    def carregar_dia(self, chave, dia=None):
+        """Série de um dia inteiro, usada para reiniciar o processo com dados do disco"""
+        if not HISTORICO_DISPONIVEL:
+            return pd.DataFrame()
+        dia = dia or date.today()
+        with self._lock:
+            return self._ler_arquivos(self._arquivos_do_dia(chave, dia))
+
+    def carregar_compacto(self, chaves, dia):
+        """Um dia de várias séries em SeriesCompactas (float32, índice de minutos comum)"""
+        frames = {chave: self.carregar_dia(chave, dia) for chave in chaves}
+        return SeriesCompactas.de_frames(frames, dia)
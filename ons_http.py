@@ -0,0 +1,24 @@
+"""Base dos servidores HTTP locais (painel, simulador e /metrics)"""
+from http.server import BaseHTTPRequestHandler
+
+
+class HandlerKeepAlive(BaseHTTPRequestHandler):
+    """HTTP/1.1 com keep-alive e sem log por requisição; responder() monta a resposta inteira"""
+
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalhos e corpo saem em escritas separadas: com Nagle ligado, o ACK
+    # atrasado do cliente soma ~40 ms a cada resposta keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, status, corpo=b'', cabecalhos=()):
+        """Status, cabeçalhos (pares nome/valor), Content-Length e o corpo (omitido em HEAD)"""
+        self.send_response(status)
+        for nome, valor in cabecalhos:
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(corpo)
@@ -0,0 +1,241 @@
+"""Métricas do processo no formato texto do Prometheus.
+
+Latência e erros por endpoint, bytes recebidos, tempo das etapas de
+cálculo e de gráficos, acertos de cache e idade dos dados. Expostas em
+http://<host>:<ONS_METRICAS_PORTA>/metrics (padrão 9108; vazio desativa).
+"""
+import functools
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import ThreadingHTTPServer
+
+from ons_http import HandlerKeepAlive
+
+PORTA_PADRAO = os.environ.get('ONS_METRICAS_PORTA', '9108')
+
+# Buckets (s) pensados para chamadas HTTP de ~50ms a alguns segundos
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    pares = ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos)
+    return '{' + pares + '}'
+
+
+class Contador:
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1.0, **rotulos):
+        with self._lock:
+            self._valores[tuple(sorted(rotulos.items()))] += valor
+
+    def valor(self, **rotulos):
+        return self._valores.get(tuple(sorted(rotulos.items())), 0.0)
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} counter']
+        with self._lock:
+            for rotulos, valor in sorted(self._valores.items()):
+                linhas.append(f'{self.nome}{_rotulos(rotulos)} {valor}')
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, buckets=BUCKETS_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._series.setdefault(chave, [[0] * len(self.buckets), 0.0, 0])
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def medir(self, **rotulos):
+        """Context manager que observa a duração do bloco"""
+        return _Medicao(self, rotulos)
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} histogram']
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                for limite, contagem in zip(self.buckets, contagens):
+                    linhas.append(f'{self.nome}_bucket{_rotulos(chave + (("le", limite),))} {contagem}')
+                linhas.append(f'{self.nome}_bucket{_rotulos(chave + (("le", "+Inf"),))} {total}')
+                linhas.append(f'{self.nome}_sum{_rotulos(chave)} {soma}')
+                linhas.append(f'{self.nome}_count{_rotulos(chave)} {total}')
+        return linhas
+
+
+class _Medicao:
+    def __init__(self, histograma, rotulos):
+        self._histograma = histograma
+        self._rotulos = rotulos
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histograma.observar(time.perf_counter() - self._inicio, **self._rotulos)
+        return False
+
+
+class Gauge:
+    """Valor instantâneo; 'coletar' (opcional) devolve {rotulos: valor} no momento da exportação"""
+
+    def __init__(self, nome, ajuda, coletar=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._coletores = [coletar] if coletar else []
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def set(self, valor, **rotulos):
+        with self._lock:
+            self._valores[tuple(sorted(rotulos.items()))] = valor
+
+    def registrar_coletor(self, coletar):
+        with self._lock:
+            self._coletores.append(coletar)
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} gauge']
+        with self._lock:
+            valores = dict(self._valores)
+            coletores = list(self._coletores)
+        for coletar in coletores:
+            try:
+                for rotulos, valor in coletar().items():
+                    valores[tuple(sorted(rotulos))] = valor
+            except Exception:
+                continue
+        for rotulos, valor in sorted(valores.items()):
+            linhas.append(f'{self.nome}{_rotulos(rotulos)} {valor}')
+        return linhas
+
+
+FETCH_DURACAO = Histograma('ons_fetch_duracao_segundos', 'Latência das requisições à API do ONS por endpoint')
+FETCH_ERROS = Contador('ons_fetch_erros_total', 'Requisições sem payload válido por endpoint e motivo')
+FETCH_BYTES = Contador('ons_fetch_bytes_total', 'Bytes de payload recebidos por endpoint')
+FETCH_DEDUPLICADAS = Contador('ons_fetch_deduplicadas_total', 'Pedidos atendidos por uma requisição já em voo')
+FETCH_INALTERADAS = Contador('ons_fetch_inalteradas_total', 'Respostas iguais à anterior (304 ou mesmo hash), sem nova decodificação')
+ETAPA_DURACAO = Histograma('ons_etapa_duracao_segundos', 'Duração das etapas de processamento e gráficos')
+CACHE_ACERTOS = Contador('ons_cache_acertos_total', 'Chamadas atendidas pelo cache')
+CACHE_FALHAS = Contador('ons_cache_falhas_total', 'Chamadas que recalcularam o valor cacheado')
+IDADE_SERIE = Gauge('ons_idade_serie_segundos', 'Segundos desde a última resposta válida de cada série do poller')
+IDADE_ENDPOINT = Gauge('ons_idade_endpoint_segundos', 'Segundos desde o último payload válido de cada endpoint no cache SWR')
+CICLO_DURACAO = Gauge('ons_ciclo_duracao_segundos', 'Duração do último ciclo de busca do poller')
+SERIES_FALTANTES = Gauge('ons_series_faltantes', 'Séries sem resposta no último ciclo')
+POLLER_ERROS = Contador('ons_poller_erros_total', 'Exceções no loop do poller por etapa (ciclo, publicar, historico, restaurar)')
+CIRCUITO_ESTADO = Gauge('ons_circuito_estado', 'Disjuntor de cada endpoint: 0 fechado, 1 meio-aberto, 2 aberto')
+CADENCIA = Gauge('ons_cadencia_segundos', 'Cadência de publicação estimada de cada série pela agenda de buscas')
+FREQUENCIA_EXCURSOES = Contador('ons_frequencia_excursoes_total', 'Excursões de frequência encerradas, por severidade e sentido')
+GRAFO_RECALCULOS = Contador('ons_grafo_recalculos_total', 'Nós do grafo de KPIs recalculados, por nó')
+PAINEL_RESPOSTAS = Contador('ons_painel_respostas_total', 'Respostas do painel pré-renderizado por rota e status')
+
+METRICAS = (
+    FETCH_DURACAO, FETCH_ERROS, FETCH_BYTES, FETCH_DEDUPLICADAS, FETCH_INALTERADAS, ETAPA_DURACAO,
+    CACHE_ACERTOS, CACHE_FALHAS, IDADE_SERIE, IDADE_ENDPOINT, CICLO_DURACAO, SERIES_FALTANTES, POLLER_ERROS, CADENCIA,
+    CIRCUITO_ESTADO, GRAFO_RECALCULOS, FREQUENCIA_EXCURSOES, PAINEL_RESPOSTAS
+)
+
+
+def endpoint(url):
+    """Rótulo curto do endpoint: '.../Get/Carga_SIN_json' -> 'Carga_SIN_json'"""
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def cronometrado(etapa):
+    """Decorator que registra a duração de cada chamada em ons_etapa_duracao_segundos"""
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def medir(*args, **kwargs):
+            with ETAPA_DURACAO.medir(etapa=etapa):
+                return funcao(*args, **kwargs)
+        return medir
+    return decorar
+
+
+_recalculou = threading.local()
+
+
+def cache_instrumentado(nome, cache):
+    """Aplicar um decorator de cache (ex.: st.cache_data(ttl=5)) contando acertos e falhas.
+
+    O corpo da função só executa quando o cache falha; o wrapper externo
+    vê se isso aconteceu na chamada corrente.
+    """
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def calcular(*args, **kwargs):
+            _recalculou.valor = True
+            return funcao(*args, **kwargs)
+        cacheada = cache(calcular)
+
+        @functools.wraps(funcao)
+        def chamar(*args, **kwargs):
+            anterior = getattr(_recalculou, 'valor', False)
+            _recalculou.valor = False
+            try:
+                return cacheada(*args, **kwargs)
+            finally:
+                (CACHE_FALHAS if _recalculou.valor else CACHE_ACERTOS).inc(cache=nome)
+                _recalculou.valor = anterior
+        chamar.clear = getattr(cacheada, 'clear', None)
+        return chamar
+    return decorar
+
+
+def exportar():
+    """Todas as métricas no formato texto de exposição do Prometheus"""
+    linhas = []
+    for metrica in METRICAS:
+        linhas += metrica.exportar()
+    return '\n'.join(linhas) + '\n'
+
+
+class _Handler(HandlerKeepAlive):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        self.responder(200, exportar().encode(), [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+
+
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def iniciar_servidor_metricas(porta=PORTA_PADRAO, host='0.0.0.0'):
+    """Servir /metrics uma vez por processo; porta vazia ou ocupada não derruba o dashboard"""
+    global _servidor
+    with _servidor_lock:
+        if _servidor is not None or not porta:
+            return _servidor
+        try:
+            _servidor = ThreadingHTTPServer((host, int(porta)), _Handler)
+        except (OSError, ValueError):
+            return None
+        _servidor.daemon_threads = True
+        threading.Thread(target=_servidor.serve_forever, name='ons-metricas', daemon=True).start()
+        return _servidor
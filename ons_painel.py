@@ -0,0 +1,399 @@
+"""Painel pré-renderizado para TVs passivas do videowall.
+
+O estado do dashboard é renderizado uma vez por atualização de dados, em
+JSON com as figuras Plotly já montadas. Qualquer número de telas busca
+esse arquivo com If-None-Match e recebe 304 enquanto nada mudou; o custo
+por tela fica em servir bytes prontos:
+
+    python ons_painel.py --porta 8600
+    # nas TVs: http://<servidor>:8600/
+
+Rotas: / (página das TVs), /estado.json (snapshot renderizado),
+/eventos (Server-Sent Events que avisam, assim que chega um instante novo,
+o ETag do estado já renderizado) e /plotly.min.js (servido do pacote
+plotly, sem depender de CDN).
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+from ons_calculos import TENDENCIA_NEUTRA, VARIACAO_NEUTRA
+from ons_charts import (
+    ENERGY_COLORS, LARGURA_TV_PX, atualizar_matriz, figura_geracao, figura_matriz, orcamento_pontos, series_geracao
+)
+from ons_estado import TENDENCIA_SIN, calcular_estado, criar_grafo
+from ons_fetch import CHAVE_CARGA, CHAVE_FREQUENCIA
+from ons_frequencia import evento_serializavel
+from ons_http import HandlerKeepAlive
+from ons_metricas import PAINEL_RESPOSTAS, cronometrado, iniciar_servidor_metricas
+from ons_poller import obter_poller
+
+PORTA_PADRAO = os.environ.get('ONS_PAINEL_PORTA', '8600')
+
+# Intervalo (s) com que as TVs revalidam /estado.json quando o push cai
+INTERVALO_CLIENTE = 10
+
+# Sem eventos por esse tempo (s), /eventos manda um comentário para manter a conexão
+KEEPALIVE_SSE = 15
+
+# Excursões de frequência encerradas listadas no painel, da mais recente
+EVENTOS_FREQUENCIA = 4
+
+# Corpo pronto para servir: bytes, versão gzip e ETag calculados uma única vez
+Arquivo = namedtuple('Arquivo', ['corpo', 'corpo_gz', 'etag', 'tipo'])
+
+
+def arquivo(corpo, tipo):
+    etag = '"' + hashlib.sha1(corpo).hexdigest()[:16] + '"'
+    return Arquivo(corpo, gzip.compress(corpo, compresslevel=6), etag, tipo)
+
+
+def _numero(valor, padrao=0.0):
+    return padrao if valor is None or pd.isna(valor) else float(valor)
+
+
+def _tendencia(tendencia):
+    return {'tipo': tendencia.get('tipo', 'stable'), 'variacao_pct': _numero(tendencia.get('variacao_pct'))}
+
+
+def kpis(estado):
+    """Números dos cards, no mesmo cálculo do streamlit_app.py"""
+    total_geracao, total_carga = _numero(estado['total_geracao']), _numero(estado['total_carga'])
+    excursoes = estado['excursoes']
+    fontes = []
+    for fonte, valor in sorted(estado['fonte_totals'].items(), key=lambda x: x[1], reverse=True):
+        if valor > 0:
+            fontes.append({
+                'nome': fonte,
+                'valor': _numero(valor),
+                'percentual': valor / total_geracao * 100 if total_geracao > 0 else 0.0,
+                'cor': ENERGY_COLORS.get(fonte, '#94A3B8'),
+                'pico_hora': estado['variacoes'].get(fonte, VARIACAO_NEUTRA).get('pico_hora', 'N/A'),
+                **_tendencia(estado['tendencias'].get(fonte, TENDENCIA_NEUTRA))
+            })
+    return {
+        'total_geracao': total_geracao,
+        'total_carga': total_carga,
+        'percentual_renovavel': _numero(estado['percentual_renovavel']),
+        'eficiencia': _numero(estado['eficiencia']),
+        'frequencia': _numero(excursoes.atual, 60.0),
+        'excursoes': {
+            'faixa': excursoes.faixa,
+            'rocof': excursoes.rocof,
+            'evento': evento_serializavel(excursoes.evento) if excursoes.evento is not None else None,
+            'eventos': [evento_serializavel(evento) for evento in reversed(excursoes.eventos[-EVENTOS_FREQUENCIA:])]
+        },
+        'tendencia_geracao': _tendencia(estado['tendencias'].get(TENDENCIA_SIN, TENDENCIA_NEUTRA)),
+        'tendencia_carga': _tendencia(estado['tendencias'].get(CHAVE_CARGA, TENDENCIA_NEUTRA)),
+        'tendencia_frequencia': _tendencia(estado['tendencias'].get(CHAVE_FREQUENCIA, TENDENCIA_NEUTRA)),
+        'pico_geracao': estado['variacao_geracao'].get('pico_hora', 'N/A'),
+        'pico_carga': estado['variacao_carga'].get('pico_hora', 'N/A'),
+        'fontes': fontes
+    }
+
+
+def evento_sse(versao, nome, conteudo):
+    dados = json.dumps(conteudo, ensure_ascii=False, separators=(',', ':'))
+    return f'id: {versao}\nevent: {nome}\ndata: {dados}\n\n'.encode()
+
+
+class Painel:
+    """Renderiza cada snapshot novo do poller e guarda o resultado para as TVs"""
+
+    def __init__(self, poller):
+        self._poller = poller
+        self._grafo = criar_grafo()
+        self._geracao = figura_geracao()
+        self._matriz = figura_matriz()
+        self._estado = None
+        self._evento = None
+        self._versao_dados = 0
+        self._lock = threading.Lock()
+        self._novo_evento = threading.Condition(self._lock)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='ons-painel', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def estado(self):
+        """Último /estado.json renderizado (None antes do primeiro snapshot)"""
+        with self._lock:
+            return self._estado
+
+    def aguardar_evento(self, versao, timeout=None):
+        """Bloquear até sair um evento mais novo que 'versao'; devolve (versao, bytes) ou None"""
+        with self._novo_evento:
+            self._novo_evento.wait_for(lambda: self._evento is not None and self._evento[0] > versao, timeout)
+            return self._evento
+
+    def versao_evento(self):
+        with self._lock:
+            return self._evento[0] if self._evento else 0
+
+    def figuras(self, estado):
+        series = series_geracao(estado['timeline_data'], estado['carga_data'], orcamento_pontos(LARGURA_TV_PX // 2))
+        geracao = self._geracao.atualizar(series)
+        matriz = atualizar_matriz(self._matriz, estado['fonte_totals'], estado['total_geracao'])
+        return {'geracao': geracao.to_plotly_json(), 'matriz': matriz.to_plotly_json()}
+
+    @cronometrado('painel')
+    def renderizar(self, snapshot):
+        estado = calcular_estado(snapshot, self._grafo)
+        conteudo = {
+            'versao': snapshot.versao_dados,
+            'atualizado_em': snapshot.atualizado_em,
+            'faltantes': list(snapshot.faltantes),
+            'disponivel': estado['disponivel']
+        }
+        if estado['disponivel']:
+            conteudo['kpis'] = kpis(estado)
+            conteudo['figuras'] = self.figuras(estado)
+        corpo = json.dumps(conteudo, cls=PlotlyJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        return arquivo(corpo.encode(), 'application/json; charset=utf-8')
+
+    def _loop(self):
+        versao = 0
+        while not self._parar.is_set():
+            snapshot = self._poller.aguardar_versao(versao, timeout=1.0)
+            if snapshot is None or snapshot.versao <= versao:
+                continue
+            versao = snapshot.versao
+            # Ciclos sem pontos novos não mudam o painel: as TVs seguem recebendo 304
+            if snapshot.versao_dados <= self._versao_dados:
+                continue
+            try:
+                renderizado = self.renderizar(snapshot)
+                evento = evento_sse(snapshot.versao_dados, 'atualizacao', {
+                    'versao': snapshot.versao_dados,
+                    'etag': renderizado.etag
+                })
+            except Exception:
+                continue
+            with self._novo_evento:
+                self._estado = renderizado
+                self._evento = (snapshot.versao_dados, evento)
+                self._versao_dados = snapshot.versao_dados
+                self._novo_evento.notify_all()
+
+
+PAGINA = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Sistema Elétrico Brasileiro</title>
+<script src="plotly.min.js"></script>
+<style>
+  body { margin: 0; padding: 16px; background: #0B0F19; color: #F8FAFC; font-family: Inter, sans-serif; }
+  .cards { display: grid; grid-template-columns: repeat(4, 1fr); gap: 16px; margin-bottom: 16px; }
+  .card { background: #252B3A; border: 1px solid #2A3441; border-radius: 12px; padding: 16px; }
+  .valor { font-size: 2.4rem; font-weight: 700; }
+  .rotulo { color: #94A3B8; font-size: 0.85rem; text-transform: uppercase; }
+  .status { font-size: 0.9rem; margin-top: 6px; }
+  .corpo { display: grid; grid-template-columns: 1fr 2fr 1fr; gap: 16px; }
+  .fonte { display: flex; justify-content: space-between; background: #1A1F2E; border-left: 4px solid;
+           border-radius: 8px; padding: 10px; margin-bottom: 8px; }
+  #rodape { color: #94A3B8; font-size: 0.75rem; margin-top: 8px; }
+</style>
+</head>
+<body>
+<div class="cards" id="cards"></div>
+<div class="corpo">
+  <div id="fontes"></div>
+  <div id="geracao"></div>
+  <div><div id="matriz"></div><div id="status"></div><div id="eventos"></div></div>
+</div>
+<div id="rodape">Aguardando dados...</div>
+<script>
+const INTERVALO = __INTERVALO__ * 1000;
+const CONFIG = {displayModeBar: false, responsive: true};
+let etag = null;
+let push = false;
+
+const fmt = (v, d = 0) => v.toLocaleString('pt-BR', {minimumFractionDigits: d, maximumFractionDigits: d});
+const seta = t => t.tipo === 'up' ? '↗' : t.tipo === 'down' ? '↘' : '→';
+const sinal = (v, d) => (v >= 0 ? '+' : '') + fmt(v, d);
+const duracao = s => s >= 60 ? `${Math.floor(s / 60)}min${String(s % 60).padStart(2, '0')}s` : `${s}s`;
+const CORES_FAIXA = {normal: '#34D399', atencao: '#FBBF24', critico: '#F87171'};
+const ROTULOS_FAIXA = {normal: 'Normal', atencao: 'Atenção', critico: 'Crítico'};
+
+function card(valor, rotulo, cor, texto, estilo = '') {
+  return `<div class="card" style="${estilo}"><div class="valor" style="color:${cor}">${valor}</div>` +
+         `<div class="rotulo">${rotulo}</div><div class="status" style="color:${cor}">${texto}</div></div>`;
+}
+
+function desenhar(estado) {
+  const k = estado.kpis;
+  const tg = k.tendencia_geracao, tc = k.tendencia_carga, tf = k.tendencia_frequencia;
+  const corG = tg.tipo === 'up' ? '#34D399' : tg.tipo === 'down' ? '#F87171' : '#FBBF24';
+  const corC = tc.tipo === 'stable' ? '#34D399' : tc.tipo === 'up' ? '#FBBF24' : '#F87171';
+  const r = k.percentual_renovavel;
+  const corR = r > 70 ? '#34D399' : r > 50 ? '#FBBF24' : '#F87171';
+  const f = k.frequencia, x = k.excursoes;
+  const corF = CORES_FAIXA[x.faixa];
+  document.getElementById('cards').innerHTML =
+    card(fmt(k.total_geracao), 'Geração Total (MW)', corG, `${seta(tg)} ${sinal(tg.variacao_pct, 1)}% • Pico: ${k.pico_geracao}`) +
+    card(fmt(k.total_carga), 'Carga Total (MW)', corC, `${seta(tc)} ${sinal(tc.variacao_pct, 1)}% • Pico: ${k.pico_carga}`) +
+    card(fmt(r, 1) + '%', 'Energia Renovável', corR, r > 70 ? 'Matriz Limpa' : r > 50 ? 'Moderada' : 'Crítica') +
+    card(fmt(f, 2), 'Frequência SIN (Hz)', corF,
+         `${ROTULOS_FAIXA[x.faixa]}${x.evento ? ' há ' + duracao(x.evento.duracao) : ''} • ${sinal(tf.variacao_pct, 3)}% • ${sinal(x.rocof, 4)} Hz/s`,
+         `border: 2px solid ${corF}`);
+  document.getElementById('fontes').innerHTML = k.fontes.map(fonte =>
+    `<div class="fonte" style="border-color:${fonte.cor}"><div>${fonte.nome}<div class="rotulo">` +
+    `${fmt(fonte.percentual, 1)}% • P: ${fonte.pico_hora}</div></div><div style="text-align:right;color:${fonte.cor}">` +
+    `${fmt(fonte.valor)}<div class="rotulo">${seta(fonte)} ${sinal(fonte.variacao_pct, 1)}%</div></div></div>`).join('');
+  document.getElementById('status').innerHTML = card(fmt(k.eficiencia, 1) + '%', 'Eficiência', '#60A5FA', '');
+  // Excursão em curso e as últimas encerradas
+  const lista = (x.evento ? [x.evento] : []).concat(x.eventos);
+  document.getElementById('eventos').innerHTML = lista.length ? lista.map(ev =>
+    `<div class="fonte" style="border-color:${CORES_FAIXA[ev.severidade]}"><div>${ev.sentido === 'sub' ? 'Subfrequência' : 'Sobrefrequência'}` +
+    `<div class="rotulo">${ev.inicio}${ev.fim ? ' – ' + ev.fim : ' • em curso'} • ${duracao(ev.duracao)}</div></div>` +
+    `<div style="text-align:right;color:${CORES_FAIXA[ev.severidade]}">${fmt(ev.nadir, 2)} Hz` +
+    `<div class="rotulo">ROCOF ${fmt(ev.rocof, 4)} Hz/s</div></div></div>`).join('') :
+    '<div class="rotulo">Sem excursões fora de 59,9–60,1 Hz</div>';
+  Plotly.react('geracao', estado.figuras.geracao.data, estado.figuras.geracao.layout, CONFIG);
+  Plotly.react('matriz', estado.figuras.matriz.data, estado.figuras.matriz.layout, CONFIG);
+}
+
+async function atualizar() {
+  try {
+    const resposta = await fetch('estado.json', {cache: 'no-store', headers: etag ? {'If-None-Match': etag} : {}});
+    if (resposta.status === 200) {
+      const estado = await resposta.json();
+      etag = resposta.headers.get('ETag');
+      if (estado.disponivel) desenhar(estado);
+      const faltantes = estado.faltantes.length ? ` • sem resposta: ${estado.faltantes.join(', ')}` : '';
+      document.getElementById('rodape').textContent =
+        'Atualizado às ' + new Date(estado.atualizado_em * 1000).toLocaleTimeString('pt-BR') + faltantes;
+    }
+  } catch (e) {}
+}
+
+async function revalidar() {
+  if (!push) await atualizar();
+  setTimeout(revalidar, INTERVALO);
+}
+
+// Push: cada evento traz o ETag do estado já renderizado; só busca se mudou
+const eventos = new EventSource('eventos');
+eventos.onopen = () => { push = true; };
+eventos.onerror = () => { push = false; };
+eventos.addEventListener('atualizacao', e => {
+  if (JSON.parse(e.data).etag !== etag) atualizar();
+});
+revalidar();
+</script>
+</body>
+</html>
+"""
+
+
+def criar_handler(painel, pagina, plotlyjs):
+    rotas = {'/': lambda: pagina, '/index.html': lambda: pagina, '/plotly.min.js': lambda: plotlyjs,
+             '/estado.json': painel.estado}
+
+    class Handler(HandlerKeepAlive):
+        def _responder(self, rota, status, arquivo=None):
+            PAINEL_RESPOSTAS.inc(rota=rota, status=status)
+            corpo, cabecalhos = b'', []
+            if arquivo is not None:
+                cabecalhos += [('ETag', arquivo.etag), ('Cache-Control', 'no-cache')]
+            if status == 200:
+                corpo = arquivo.corpo
+                cabecalhos.append(('Content-Type', arquivo.tipo))
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    corpo = arquivo.corpo_gz
+                    cabecalhos.append(('Content-Encoding', 'gzip'))
+                cabecalhos.append(('Vary', 'Accept-Encoding'))
+            self.responder(status, corpo, cabecalhos)
+
+        def _eventos(self):
+            PAINEL_RESPOSTAS.inc(rota='/eventos', status=200)
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            versao = painel.versao_evento()
+            try:
+                self.wfile.write(b'retry: 3000\n\n')
+                self.wfile.flush()
+                while True:
+                    evento = painel.aguardar_evento(versao, timeout=KEEPALIVE_SSE)
+                    if evento is None or evento[0] <= versao:
+                        self.wfile.write(b': keepalive\n\n')
+                    else:
+                        versao, corpo = evento
+                        self.wfile.write(corpo)
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def do_GET(self):
+            rota = self.path.split('?', 1)[0]
+            if rota == '/eventos' and self.command == 'GET':
+                self._eventos()
+                return
+            if rota not in rotas:
+                self._responder('outra', 404)
+                return
+            atual = rotas[rota]()
+            if atual is None:
+                self._responder(rota, 503)
+            elif atual.etag in self.headers.get('If-None-Match', ''):
+                self._responder(rota, 304, atual)
+            else:
+                self._responder(rota, 200, atual)
+
+        do_HEAD = do_GET
+
+    return Handler
+
+
+def servir(painel, host='0.0.0.0', porta=PORTA_PADRAO, intervalo=INTERVALO_CLIENTE):
+    """Iniciar o servidor HTTP do painel em segundo plano; devolve o servidor"""
+    pagina = arquivo(PAGINA.replace('__INTERVALO__', str(intervalo)).encode(), 'text/html; charset=utf-8')
+    plotlyjs = arquivo(get_plotlyjs().encode(), 'application/javascript')
+    servidor = ThreadingHTTPServer((host, int(porta)), criar_handler(painel, pagina, plotlyjs))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='ons-painel-http', daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--porta', type=int, default=int(PORTA_PADRAO))
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_CLIENTE, help='revalidação das TVs (s)')
+    args = parser.parse_args(argv)
+
+    iniciar_servidor_metricas()
+    painel = Painel(obter_poller()).start()
+    servidor = servir(painel, args.host, args.porta, args.intervalo)
+    print(f"Painel ONS em http://{args.host}:{servidor.server_address[1]}/")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+        painel.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Poller único por processo que busca os dados do ONS e publica snapshots.
+
+Cada endpoint tem a própria agenda (ons_agenda): buscado logo depois da
+publicação esperada, com recuo exponencial em erros ou sem dado novo.
+Buscas próximas no tempo saem num snapshot só.
+"""
+import atexit
+import logging
+import threading
+import time
+import types
+from collections import namedtuple
+from datetime import date
+
+import pandas as pd
+
+from ons_agenda import ESPALHAMENTO, INTERVALO_INICIAL, Agenda
+from ons_cliente import buscar_varios
+from ons_fetch import PRAZO_CICLO, requisicoes_padrao
+from ons_history import DIRETORIO_PADRAO, HISTORICO_DISPONIVEL, HistoricoStore
+from ons_metricas import CADENCIA, CICLO_DURACAO, IDADE_SERIE, POLLER_ERROS, SERIES_FALTANTES
+from ons_series import SeriesStore
+
+_log = logging.getLogger(__name__)
+
+# Cadência inicial (s) de cada endpoint, até a agenda aprender a real
+INTERVALO = INTERVALO_INICIAL
+
+# Séries falhando sem resposta válida há mais que isso são exibidas como atrasadas
+LIMITE_ATRASO = 2 * INTERVALO
+
+# Publicar quando nenhuma outra busca vence nesse prazo (s), para não gerar um
+# snapshot por endpoint; PRAZO_CICLO limita quanto um grupo espera
+AGRUPAMENTO = ESPALHAMENTO + 1
+
+# Estado imutável de um ciclo de busca; as sessões apenas leem.
+# 'dados' traz a série completa do dia (último dado válido de cada endpoint),
+# 'deltas' só os pontos novos do ciclo, 'faltantes' as séries cuja última
+# busca falhou e 'obtido_em' quando cada série recebeu a última resposta
+# válida. 'versao_dados' só avança quando o ciclo trouxe pontos novos ou
+# mudou o conjunto de séries faltantes: é a versão que as telas acompanham
+# para redesenhar
+Snapshot = namedtuple(
+    'Snapshot', ['versao', 'versao_dados', 'dados', 'deltas', 'faltantes', 'obtido_em', 'atualizado_em', 'duracao']
+)
+
+
+class Poller:
+    """Dono do agendamento de buscas; independe do número de sessões conectadas"""
+
+    def __init__(self, intervalo=INTERVALO, fetch=None, requisicoes=None, historico=None):
+        self.intervalo = intervalo
+        self._requisicoes = requisicoes or requisicoes_padrao()
+        # fetch(requisicoes) busca só as séries vencidas na agenda
+        self._fetch = fetch or buscar_varios
+        self.agenda = Agenda(self._requisicoes, intervalo)
+        self._faltantes = set(self._requisicoes)
+        self._pendentes = {}
+        self._duracao_pendente = 0.0
+        self._store = SeriesStore()
+        self.historico = historico
+        self._dia = date.today()
+        self._obtido_em = {}
+        self._lock = threading.Lock()
+        self._nova_versao = threading.Condition(self._lock)
+        self._snapshot = None
+        self._pronto = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='ons-poller', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._parar.set()
+        self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def snapshot(self):
+        """Último snapshot publicado (None antes do primeiro ciclo)"""
+        with self._lock:
+            return self._snapshot
+
+    def aguardar_snapshot(self, timeout=None):
+        """Bloquear até existir um snapshot, útil na primeira sessão após o boot"""
+        self._pronto.wait(timeout)
+        return self.snapshot()
+
+    def aguardar_versao(self, versao, timeout=None):
+        """Bloquear até sair um snapshot mais novo que 'versao' (ou o timeout); devolve o último"""
+        with self._nova_versao:
+            self._nova_versao.wait_for(lambda: self._snapshot is not None and self._snapshot.versao > versao, timeout)
+            return self._snapshot
+
+    def _restaurar(self):
+        """Partida a quente: publicar o dia corrente gravado em disco antes do 1º ciclo"""
+        if self.historico is None:
+            return
+        try:
+            self.historico.compactar_dias_encerrados()
+            restauradas = []
+            for chave, (_, parser, coluna) in self._requisicoes.items():
+                df = self.historico.carregar_dia(chave)
+                if not df.empty:
+                    self._store.restaurar(chave, df, parser, coluna)
+                    restauradas.append(chave)
+            if restauradas:
+                self._publicar()
+        except Exception:
+            POLLER_ERROS.inc(etapa='restaurar')
+            _log.exception('Falha ao restaurar o dia corrente do histórico')
+
+    def _ingerir(self, ciclo):
+        deltas = {}
+        agora = time.time()
+        for chave, payload in ciclo['dados'].items():
+            if chave not in self._requisicoes:
+                continue
+            if payload:
+                self._obtido_em[chave] = agora
+            _, parser, coluna = self._requisicoes[chave]
+            delta = self._store.ingerir(chave, payload, parser, coluna)
+            if not delta.empty:
+                deltas[chave] = delta
+            self._faltantes.discard(chave)
+            self.agenda.registrar(chave, delta['instante'].to_numpy() if not delta.empty else (), agora)
+        for chave in ciclo['faltantes']:
+            self._faltantes.add(chave)
+            self.agenda.falhou(chave, agora)
+        return deltas
+
+    def _gravar_historico(self, deltas):
+        if self.historico is None:
+            return
+        try:
+            for chave, delta in deltas.items():
+                self.historico.anexar(chave, delta)
+            if date.today() != self._dia:
+                self._dia = date.today()
+                self.historico.descarregar()
+                self.historico.compactar_dias_encerrados()
+        except Exception:
+            POLLER_ERROS.inc(etapa='historico')
+            _log.exception('Falha ao gravar o histórico')
+
+    def _acumular(self, ciclo):
+        """Ingerir uma rodada de buscas; os deltas esperam a publicação do grupo"""
+        deltas = self._ingerir(ciclo)
+        self._gravar_historico(deltas)
+        for chave, delta in deltas.items():
+            anterior = self._pendentes.get(chave)
+            self._pendentes[chave] = delta if anterior is None else pd.concat([anterior, delta], ignore_index=True)
+        self._duracao_pendente += ciclo['duracao']
+
+    def processar(self, ciclo):
+        """Ingerir uma rodada já buscada e publicar na hora, fora do loop (benchmark); devolve o snapshot"""
+        self._acumular(ciclo)
+        self._publicar()
+        return self.snapshot()
+
+    def _publicar(self):
+        deltas, self._pendentes = self._pendentes, {}
+        duracao, self._duracao_pendente = self._duracao_pendente, 0.0
+        dados = self._store.frames()
+        faltantes = tuple(sorted(self._faltantes))
+        with self._lock:
+            anterior = self._snapshot
+            versao = anterior.versao + 1 if anterior else 1
+            alterado = anterior is None or bool(deltas) or faltantes != anterior.faltantes
+            self._snapshot = Snapshot(
+                versao=versao,
+                versao_dados=versao if alterado else anterior.versao_dados,
+                dados=types.MappingProxyType(dados),
+                deltas=types.MappingProxyType(deltas),
+                faltantes=faltantes,
+                obtido_em=types.MappingProxyType(dict(self._obtido_em)),
+                atualizado_em=time.time(),
+                duracao=duracao
+            )
+            self._nova_versao.notify_all()
+        CICLO_DURACAO.set(duracao)
+        SERIES_FALTANTES.set(len(faltantes))
+        self._pronto.set()
+
+    def _loop(self):
+        self._restaurar()
+        grupo = None
+        while not self._parar.is_set():
+            vencidas = self.agenda.vencidas()
+            if vencidas:
+                grupo = grupo or time.monotonic()
+                try:
+                    self._acumular(self._fetch({chave: self._requisicoes[chave] for chave in vencidas}))
+                except Exception:
+                    POLLER_ERROS.inc(etapa='ciclo')
+                    _log.exception('Falha no ciclo de busca de %s', ', '.join(vencidas))
+                    self._ingerir({'dados': {}, 'faltantes': vencidas})
+            espera = self.agenda.espera()
+            if grupo and (espera > AGRUPAMENTO or time.monotonic() - grupo > PRAZO_CICLO):
+                try:
+                    self._publicar()
+                except Exception:
+                    POLLER_ERROS.inc(etapa='publicar')
+                    _log.exception('Falha ao publicar o snapshot')
+                grupo = None
+            self._parar.wait(espera)
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def obter_poller(intervalo=INTERVALO):
+    """Poller compartilhado pelo processo, iniciado na primeira chamada"""
+    global _poller
+    with _poller_lock:
+        if _poller is None or not _poller.is_alive():
+            historico = HistoricoStore(DIRETORIO_PADRAO) if HISTORICO_DISPONIVEL and DIRETORIO_PADRAO else None
+            if historico is not None:
+                atexit.register(historico.descarregar)
+            _poller = Poller(intervalo=intervalo, historico=historico).start()
+        return _poller
+
+
+IDADE_SERIE.registrar_coletor(lambda: idades_series(_poller.snapshot() if _poller else None))
+CADENCIA.registrar_coletor(
+    lambda: {(('serie', chave),): intervalo for chave, intervalo in _poller.agenda.cadencias().items()} if _poller else {}
+)
+
+
+def snapshot_atual(timeout=PRAZO_CICLO + 2):
+    """Snapshot mais recente, aguardando o primeiro ciclo se necessário"""
+    poller = obter_poller()
+    return poller.snapshot() or poller.aguardar_snapshot(timeout)
+
+
+def idades_series(snapshot, agora=None):
+    """Idade (s) do último dado válido de cada série, no formato dos coletores de métricas"""
+    if snapshot is None:
+        return {}
+    agora = agora or time.time()
+    return {
+        (('serie', chave),): agora - snapshot.obtido_em.get(chave, snapshot.atualizado_em)
+        for chave in snapshot.dados
+    }
+
+
+def series_atrasadas(snapshot, limite=LIMITE_ATRASO, agora=None):
+    """Séries servidas com o último dado válido enquanto a busca falha: chave -> idade em segundos.
+
+    Com a agenda adaptativa, uma série saudável pode ficar mais que 'limite'
+    sem ser buscada; só as que estão falhando contam como atrasadas.
+    """
+    if snapshot is None:
+        return {}
+    agora = agora or time.time()
+    atrasadas = {}
+    for chave in set(snapshot.dados) & set(snapshot.faltantes):
+        idade = agora - snapshot.obtido_em.get(chave, snapshot.atualizado_em)
+        if idade > limite:
+            atrasadas[chave] = idade
+    return atrasadas
@@ -0,0 +1,310 @@
+"""Armazenamento incremental das séries do ONS (fonte × região, carga, frequência)"""
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ons_fetch import Colunas, itens_do_payload, separar_chave
+
+# Séries regionais pivotadas num índice de instantes comum
+Agregado = namedtuple('Agregado', ['instantes', 'chaves', 'matriz', 'por_fonte', 'por_regiao', 'sin'])
+
+
+# Capacidade inicial (pontos) dos arrays de uma série; dobra quando enche
+CAPACIDADE_INICIAL = 1536
+
+
+class SerieIncremental:
+    """Série de um endpoint que recebe apenas os pontos novos de cada payload.
+
+    Os pontos ficam em arrays pré-alocados: a cauda nova é copiada para o fim
+    e frame() expõe views até o último ponto, sem concatenar o dia. Um frame
+    já entregue nunca muda: os arrays só crescem depois dele, e uma realocação
+    ou a virada de dia cria arrays novos.
+    """
+
+    def __init__(self, coluna, parser):
+        self.coluna = coluna
+        self.parser = parser
+        self._frame_vazio = pd.DataFrame(columns=['instante', coluna])
+        self.dia = None
+        self.ultimo_instante = None
+        self._restaurado = False
+        self._payload = None
+        self._alocar(0)
+
+    def _vazio(self):
+        # Mesmo DataFrame vazio sempre: payloads sem novidade não criam objetos (não alterar)
+        return self._frame_vazio
+
+    def _alocar(self, capacidade):
+        self._instantes = np.empty(capacidade, dtype='datetime64[ns]')
+        self._valores = np.empty(capacidade, dtype=np.float64)
+        self._tamanho = 0
+        self._frame = self._vazio()
+        # Texto do primeiro e do último 'instante' conhecidos, como vieram no JSON
+        self._primeiro_texto = None
+        self._ultimo_texto = None
+
+    def _anexar(self, instantes, valores):
+        n = len(instantes)
+        if self._tamanho + n > len(self._instantes):
+            capacidade = max(CAPACIDADE_INICIAL, 2 * len(self._instantes), self._tamanho + n)
+            anteriores = self._instantes[:self._tamanho], self._valores[:self._tamanho]
+            tamanho = self._tamanho
+            self._instantes = np.empty(capacidade, dtype='datetime64[ns]')
+            self._valores = np.empty(capacidade, dtype=np.float64)
+            self._instantes[:tamanho], self._valores[:tamanho] = anteriores
+        self._instantes[self._tamanho:self._tamanho + n] = instantes
+        self._valores[self._tamanho:self._tamanho + n] = valores
+        self._tamanho += n
+        self._frame = None
+
+    def _cauda(self, payload):
+        """Posição onde começa a cauda nova; None quando o payload precisa ser lido inteiro"""
+        if self.ultimo_instante is None or self._restaurado:
+            return None
+        # Mesmo primeiro instante: mesma série do dia, que só cresce no fim
+        if self._primeiro_texto is None or payload.texto(0) != self._primeiro_texto:
+            return None
+        return payload.depois_de(self._ultimo_texto)
+
+    def ingerir(self, payload):
+        """Mesclar um payload completo do dia (Colunas ou lista JSON) e devolver somente a cauda nova"""
+        # O cliente devolve o mesmo objeto quando o conteúdo não mudou: nada a fazer
+        if payload is self._payload:
+            return self._vazio()
+        self._payload = payload
+        if isinstance(payload, list):
+            payload = itens_do_payload(payload, self.coluna)
+        if not isinstance(payload, Colunas) or not len(payload):
+            return self._vazio()
+
+        # Caminho comum: só a cauda depois do último instante é convertida
+        inicio = self._cauda(payload)
+        if inicio is None:
+            instantes = payload.instantes
+            validos = instantes[~np.isnat(instantes)]
+            if not len(validos):
+                return self._vazio()
+
+            # Virada de dia: o endpoint passa a devolver a série do novo dia.
+            # Dados restaurados do disco são substituídos pelo primeiro payload real
+            dia_payload = validos[0].astype('datetime64[D]')
+            if self._restaurado or (self.dia is not None and dia_payload != self.dia):
+                self.reiniciar()
+            self.dia = dia_payload
+
+            # O payload vem ordenado por instante (NaT ao fim): a cauda nova começa
+            # logo depois do último ponto conhecido
+            inicio = 0 if self.ultimo_instante is None else int(np.searchsorted(instantes, self.ultimo_instante, side='right'))
+            self._primeiro_texto = payload.texto(0)
+
+        novos = payload[inicio:]
+        if not len(novos):
+            return self._vazio()
+        presentes = np.flatnonzero(~np.isnat(novos.instantes))
+        if not len(presentes):
+            return self._vazio()
+
+        try:
+            delta = self.parser(novos)
+        except Exception:
+            return self._vazio()
+
+        self.ultimo_instante = novos.instantes[presentes[-1]]
+        self._ultimo_texto = payload.texto(inicio + int(presentes[-1]))
+        if not delta.empty:
+            self._anexar(delta['instante'].to_numpy(), delta[self.coluna].to_numpy(dtype=np.float64))
+        return delta
+
+    def reiniciar(self):
+        self.dia = None
+        self.ultimo_instante = None
+        self._restaurado = False
+        self._alocar(0)
+
+    def restaurar(self, df):
+        """Partir de uma série gravada em disco até o primeiro payload chegar"""
+        self.reiniciar()
+        self._payload = None
+        if not df.empty:
+            self._alocar(max(CAPACIDADE_INICIAL, len(df)))
+            self._anexar(df['instante'].to_numpy(dtype='datetime64[ns]'), df[self.coluna].to_numpy(dtype=np.float64))
+        self._restaurado = True
+
+    def frame(self):
+        """Série completa do dia: views sobre os arrays, montada só quando chegam pontos novos"""
+        if self._frame is None:
+            self._frame = pd.DataFrame({
+                'instante': self._instantes[:self._tamanho],
+                self.coluna: self._valores[:self._tamanho]
+            }, copy=False)
+        return self._frame
+
+
+class SeriesStore:
+    """Conjunto de séries incrementais indexado pela chave do endpoint"""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def ingerir(self, chave, payload, parser, coluna):
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = SerieIncremental(coluna, parser)
+            return serie.ingerir(payload)
+
+    def restaurar(self, chave, df, parser, coluna):
+        with self._lock:
+            serie = self._series[chave] = SerieIncremental(coluna, parser)
+            serie.restaurar(df)
+
+    def frames(self):
+        with self._lock:
+            return {
+                chave: serie.frame() for chave, serie in self._series.items()
+                if serie.ultimo_instante is not None or not serie.frame().empty
+            }
+
+    def ultimo_instante(self, chave):
+        serie = self._series.get(chave)
+        return serie.ultimo_instante if serie else None
+
+
+def _indicadora(rotulos):
+    """Matriz 0/1 (séries × grupos) para somar colunas por grupo com um único produto"""
+    grupos = list(dict.fromkeys(rotulos))
+    posicao = {grupo: i for i, grupo in enumerate(grupos)}
+    indicadora = np.zeros((len(rotulos), len(grupos)))
+    indicadora[np.arange(len(rotulos)), [posicao[r] for r in rotulos]] = 1.0
+    return grupos, indicadora
+
+
+def agregar_series(dataframes, coluna='geracao'):
+    """Alinhar todas as séries regionais por instante e somar por fonte, região e SIN.
+
+    Cada série é posicionada no índice de instantes comum; lacunas são
+    preenchidas com o último valor conhecido da própria série, de modo que
+    timestamps desalinhados não derrubam nem deslocam os totais.
+    """
+    series = {}
+    for chave, df in dataframes.items():
+        if df is None or df.empty or coluna not in df.columns:
+            continue
+        serie = pd.Series(df[coluna].to_numpy(dtype='float64'), index=pd.DatetimeIndex(df['instante']))
+        series[chave] = serie[~serie.index.duplicated(keep='last')]
+
+    if not series:
+        return None
+
+    pivot = pd.concat(series, axis=1, sort=True).ffill()
+    instantes = pivot.index
+    chaves = list(pivot.columns)
+    matriz = np.nan_to_num(pivot.to_numpy(), nan=0.0)
+
+    fontes, por_fonte = _indicadora([separar_chave(chave)[0] for chave in chaves])
+    regioes, por_regiao = _indicadora([separar_chave(chave)[1] for chave in chaves])
+
+    return Agregado(
+        instantes=instantes,
+        chaves=chaves,
+        matriz=matriz,
+        por_fonte=pd.DataFrame(matriz @ por_fonte, index=instantes, columns=fontes),
+        por_regiao=pd.DataFrame(matriz @ por_regiao, index=instantes, columns=regioes),
+        sin=pd.Series(matriz.sum(axis=1), index=instantes, name=coluna)
+    )
+
+
+class SeriesCompactas:
+    """Séries num índice comum de minutos (int32, relativos à 0h de 'dia') com valores float32.
+
+    Cada série é uma coluna contígua (ordem Fortran): serie(chave) é uma
+    view, sem cópia. Minutos em que uma série não tem ponto ficam NaN.
+    Guarda dias fechados (histórico, app.py); o dia corrente fica no SeriesStore.
+    """
+
+    def __init__(self, dia, minutos, chaves, valores):
+        self.dia = np.datetime64(dia, 'D')
+        self.minutos = minutos
+        self.chaves = tuple(chaves)
+        self.valores = valores
+        self._posicao = {chave: j for j, chave in enumerate(self.chaves)}
+        self._instantes = None
+
+    @classmethod
+    def vazia(cls, dia=None):
+        dia = dia if dia is not None else np.datetime64('today', 'D')
+        return cls(dia, np.empty(0, dtype=np.int32), (), np.empty((0, 0), dtype=np.float32, order='F'))
+
+    @classmethod
+    def de_colunas(cls, colunas, dia=None):
+        """chave -> Colunas (ou (instantes, valores)) num único bloco compacto"""
+        pares = {}
+        for chave, par in colunas.items():
+            instantes, valores = (par.instantes, par.valores) if isinstance(par, Colunas) else par
+            instantes = np.asarray(instantes, dtype='datetime64[m]')
+            validos = ~np.isnat(instantes)
+            if validos.any():
+                pares[chave] = (instantes[validos], np.asarray(valores, dtype=np.float64)[validos])
+        if not pares:
+            return cls.vazia(dia)
+
+        if dia is None:
+            dia = min(instantes[0] for instantes, _ in pares.values()).astype('datetime64[D]')
+        base = np.datetime64(dia, 'D').astype('datetime64[m]')
+        offsets = {chave: (instantes - base).astype(np.int32) for chave, (instantes, _) in pares.items()}
+        minutos = np.unique(np.concatenate(list(offsets.values())))
+
+        valores = np.full((len(minutos), len(pares)), np.nan, dtype=np.float32, order='F')
+        for j, (chave, (_, serie)) in enumerate(pares.items()):
+            valores[np.searchsorted(minutos, offsets[chave]), j] = serie
+        return cls(dia, minutos, pares, valores)
+
+    @classmethod
+    def de_frames(cls, frames, dia=None):
+        """chave -> DataFrame(instante, <valor>) num único bloco compacto"""
+        colunas = {}
+        for chave, df in frames.items():
+            if df is None or df.empty:
+                continue
+            coluna = next(c for c in df.columns if c != 'instante')
+            colunas[chave] = (df['instante'].to_numpy(), df[coluna].to_numpy())
+        return cls.de_colunas(colunas, dia)
+
+    def __contains__(self, chave):
+        return chave in self._posicao
+
+    def __len__(self):
+        return len(self.minutos)
+
+    @property
+    def nbytes(self):
+        return self.minutos.nbytes + self.valores.nbytes
+
+    def instantes(self):
+        """Índice de tempo em datetime64[ns], montado uma vez e compartilhado por todas as séries"""
+        if self._instantes is None:
+            base = self.dia.astype('datetime64[m]')
+            self._instantes = (base + self.minutos.astype('timedelta64[m]')).astype('datetime64[ns]')
+        return self._instantes
+
+    def serie(self, chave):
+        """Valores da série (view float32 sobre o bloco)"""
+        return self.valores[:, self._posicao[chave]]
+
+    def frame(self, chave, coluna):
+        """DataFrame(instante, coluna) da série; só copia se houver minutos sem ponto"""
+        if chave not in self._posicao:
+            return pd.DataFrame(columns=['instante', coluna])
+        instantes, valores = self.instantes(), self.serie(chave)
+        presentes = ~np.isnan(valores)
+        if not presentes.all():
+            instantes, valores = instantes[presentes], valores[presentes]
+        return pd.DataFrame({'instante': instantes, coluna: valores}, copy=False)
+
+    def frames(self, coluna):
+        return {chave: self.frame(chave, coluna) for chave in self.chaves}
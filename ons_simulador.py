@@ -0,0 +1,286 @@
+"""Gravador de fixtures e simulador local da API Energia Agora do ONS.
+
+Gravar as respostas reais de todos os endpoints usados pelos dashboards:
+
+    python ons_simulador.py gravar --saida fixtures/
+
+Servir as fixtures (ou séries sintéticas) com latência, jitter e erros:
+
+    python ons_simulador.py servir --fixtures fixtures/ --latencia 80 --jitter 40 --taxa-erro 0.05
+    python ons_simulador.py servir --dias 30
+    python ons_simulador.py servir --etag        # ETag e 304 para buscas condicionais
+
+Os dashboards passam a usar o simulador com
+ONS_API_BASE_URL=http://localhost:8765/api/energiaagora/Get
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+from ons_http import HandlerKeepAlive
+
+PREFIXO = '/api/energiaagora/Get/'
+FORMATO_INSTANTE = '%Y-%m-%dT%H:%M:%S'
+
+# Perfil aproximado (MW) de cada fonte no SIN, repartido entre as regiões
+CAPACIDADE_FONTE = {
+    'Hidraulica': 45000.0,
+    'Eolica': 14000.0,
+    'Solar': 9000.0,
+    'Termica': 9000.0,
+    'Nuclear': 1900.0
+}
+PESO_REGIAO = {
+    'SIN': 1.0,
+    'Norte': 0.15,
+    'Nordeste': 0.45,
+    'SudesteECentroOeste': 0.3,
+    'Sul': 0.1
+}
+
+
+def nome_endpoint(url):
+    """'https://.../Get/Carga_SIN_json' -> 'Carga_SIN_json'"""
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def coluna_endpoint(nome):
+    if nome.startswith('Carga'):
+        return 'carga'
+    if nome.startswith('Frequencia'):
+        return 'frequencia'
+    return 'geracao'
+
+
+def serie_sintetica(nome, fim, dias=1):
+    """Série minuto a minuto do início do (primeiro) dia até 'fim', determinística por endpoint"""
+    inicio = (fim - timedelta(days=dias - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    n = int((fim - inicio).total_seconds() // 60) + 1
+    minutos = np.arange(n)
+    hora = (minutos % 1440) / 60.0
+    rng = np.random.default_rng(zlib.crc32(nome.encode()))
+    ruido = rng.normal(0, 1, n)
+    coluna = coluna_endpoint(nome)
+
+    if coluna == 'frequencia':
+        valores = 60.0 + 0.02 * ruido + 0.01 * np.sin(minutos / 7.0)
+    elif coluna == 'carga':
+        valores = 70000 + 12000 * np.sin((hora - 9) / 24 * 2 * np.pi) + 300 * ruido
+    else:
+        partes = nome.split('_')
+        regiao, fonte = (partes[1], partes[2]) if len(partes) >= 4 else ('SIN', 'Hidraulica')
+        base = CAPACIDADE_FONTE.get(fonte, 1000.0) * PESO_REGIAO.get(regiao, 0.25)
+        if fonte == 'Solar':
+            valores = base * np.clip(np.sin((hora - 6) / 12 * np.pi), 0, None) + 0.01 * base * ruido
+        elif fonte == 'Eolica':
+            valores = base * (0.55 + 0.25 * np.sin(minutos / 240.0) + 0.03 * np.cumsum(ruido) / np.sqrt(n))
+        else:
+            valores = base * (0.7 + 0.1 * np.sin((hora - 12) / 24 * 2 * np.pi)) + 0.005 * base * ruido
+        valores = np.clip(valores, 0, None)
+
+    instantes = [(inicio + timedelta(minutes=int(m))).strftime(FORMATO_INSTANTE) for m in minutos]
+    return [{'instante': t, coluna: round(float(v), 3)} for t, v in zip(instantes, valores)]
+
+
+def deslocar_para_hoje(payload, agora):
+    """Reposicionar uma fixture gravada no dia atual, liberando os pontos até 'agora'"""
+    hoje = agora.strftime('%Y-%m-%d')
+    limite = agora.strftime(FORMATO_INSTANTE)
+    saida = []
+    for item in payload:
+        instante = str(item.get('instante', ''))
+        novo = hoje + instante[10:]
+        if novo > limite:
+            break
+        saida.append(dict(item, instante=novo))
+    return saida
+
+
+def gravar(saida, urls=None, timeout=10):
+    """Capturar o payload atual de cada endpoint em <saida>/<endpoint>.json"""
+    from ons_cliente import buscar_json
+    from ons_fetch import todas_as_urls
+
+    os.makedirs(saida, exist_ok=True)
+    gravados = {}
+    for url in urls or todas_as_urls():
+        payload = buscar_json(url, timeout)
+        if payload is None:
+            print(f"falhou: {url}")
+            continue
+        nome = nome_endpoint(url)
+        with open(os.path.join(saida, f'{nome}.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(payload, arquivo, ensure_ascii=False)
+        gravados[nome] = len(payload)
+        print(f"{nome}: {len(payload)} pontos")
+
+    with open(os.path.join(saida, 'manifest.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'gravado_em': datetime.now().isoformat(), 'endpoints': gravados}, arquivo, indent=2)
+    return gravados
+
+
+class Simulador:
+    """Fonte dos payloads servidos: fixtures gravadas ou séries sintéticas"""
+
+    def __init__(self, fixtures=None, dias=1, tempo_real=True, latencia_ms=0, jitter_ms=0,
+                 taxa_erro=0.0, taxa_timeout=0.0, etag=False, semente=None, relogio=datetime.now):
+        # relogio() dá o momento servido: o benchmark avança um minuto por ciclo
+        self.relogio = relogio
+        self.fixtures = fixtures
+        self.dias = dias
+        self.tempo_real = tempo_real
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_timeout = taxa_timeout
+        self.etag = etag
+        self._random = random.Random(semente)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+
+    def _carregar_fixture(self, nome):
+        caminho = os.path.join(self.fixtures, f'{nome}.json') if self.fixtures else None
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        return None
+
+    def corpo(self, nome):
+        """Payload JSON (bytes) do endpoint; recalculado no máximo uma vez por minuto"""
+        agora = self.relogio().replace(second=0, microsecond=0)
+        chave = (nome, agora)
+        with self._lock:
+            if chave in self._cache:
+                return self._cache[chave]
+
+        payload = self._carregar_fixture(nome)
+        if payload is None:
+            payload = serie_sintetica(nome, agora, self.dias)
+        elif self.tempo_real:
+            payload = deslocar_para_hoje(payload, agora)
+        corpo = json.dumps(payload).encode()
+
+        with self._lock:
+            self._cache = {k: v for k, v in self._cache.items() if k[1] == agora}
+            self._cache[chave] = corpo
+        return corpo
+
+    def atraso(self):
+        return max(0.0, self.latencia_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def sortear_falha(self):
+        sorteio = self._random.random()
+        if sorteio < self.taxa_timeout:
+            return 'timeout'
+        if sorteio < self.taxa_timeout + self.taxa_erro:
+            return 'erro'
+        return None
+
+
+def criar_handler(simulador):
+    class Handler(HandlerKeepAlive):
+        def _responder(self, status, corpo=b'', tipo='application/json', etag=None):
+            cabecalhos = [('Content-Type', tipo)]
+            if etag:
+                cabecalhos.append(('ETag', etag))
+            if corpo and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                corpo = gzip.compress(corpo, compresslevel=5)
+                cabecalhos.append(('Content-Encoding', 'gzip'))
+            self.responder(status, corpo, cabecalhos)
+
+        def do_GET(self):
+            simulador.requisicoes += 1
+            if not self.path.startswith(PREFIXO):
+                self._responder(404)
+                return
+
+            time.sleep(simulador.atraso())
+            falha = simulador.sortear_falha()
+            if falha == 'timeout':
+                time.sleep(60)
+                return
+            if falha == 'erro':
+                self._responder(503, b'{"erro": "indisponivel"}')
+                return
+
+            nome = self.path[len(PREFIXO):].split('?', 1)[0]
+            corpo = simulador.corpo(nome)
+            etag = f'"{zlib.crc32(corpo):08x}"' if simulador.etag else None
+            if etag and self.headers.get('If-None-Match') == etag:
+                self._responder(304, etag=etag)
+                return
+            self._responder(200, corpo, etag=etag)
+
+    return Handler
+
+
+def servir(simulador, host='127.0.0.1', porta=8765):
+    """Iniciar o servidor HTTP do simulador em segundo plano; devolve o servidor"""
+    servidor = ThreadingHTTPServer((host, porta), criar_handler(simulador))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='ons-simulador', daemon=True).start()
+    return servidor
+
+
+def base_url(servidor):
+    host, porta = servidor.server_address[:2]
+    return f"http://{host}:{porta}{PREFIXO.rstrip('/')}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_gravar = sub.add_parser('gravar', help='gravar fixtures a partir da API real')
+    p_gravar.add_argument('--saida', default='fixtures')
+
+    p_servir = sub.add_parser('servir', help='servir fixtures ou séries sintéticas')
+    p_servir.add_argument('--fixtures', default=None, help='diretório gravado com "gravar"')
+    p_servir.add_argument('--host', default='127.0.0.1')
+    p_servir.add_argument('--porta', type=int, default=8765)
+    p_servir.add_argument('--latencia', type=float, default=0, help='latência média (ms)')
+    p_servir.add_argument('--jitter', type=float, default=0, help='variação uniforme da latência (ms)')
+    p_servir.add_argument('--taxa-erro', type=float, default=0.0, help='fração de respostas 503')
+    p_servir.add_argument('--taxa-timeout', type=float, default=0.0, help='fração de requisições que não respondem')
+    p_servir.add_argument('--dias', type=int, default=1, help='dias de histórico nas séries sintéticas')
+    p_servir.add_argument('--etag', action='store_true', help='enviar ETag e responder 304 quando nada mudou')
+    p_servir.add_argument('--sem-tempo-real', action='store_true', help='servir as fixtures como gravadas')
+    p_servir.add_argument('--semente', type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.comando == 'gravar':
+        gravar(args.saida)
+        return
+
+    simulador = Simulador(
+        fixtures=args.fixtures,
+        dias=args.dias,
+        tempo_real=not args.sem_tempo_real,
+        latencia_ms=args.latencia,
+        jitter_ms=args.jitter,
+        taxa_erro=args.taxa_erro,
+        taxa_timeout=args.taxa_timeout,
+        etag=args.etag,
+        semente=args.semente
+    )
+    servidor = servir(simulador, args.host, args.porta)
+    print(f"Simulador ONS em {base_url(servidor)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
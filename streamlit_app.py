@@ -1,11 +1,17 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import requests
-from datetime import datetime, timedelta
-import numpy as np
-import time
+from datetime import date, datetime, timedelta
+
+from ons_calculos import TENDENCIA_NEUTRA, VARIACAO_NEUTRA, MotorTendencias, process_data
+from ons_charts import (
+    ENERGY_COLORS, LARGURA_TV_PX, atualizar_matriz, figura_geracao, figura_matriz, orcamento_pontos, series_geracao
+)
+from ons_estado import calcular_estado, criar_grafo
+from ons_fetch import URLS_GERACAO, CHAVE_CARGA, CHAVE_FREQUENCIA, chave_serie
+from ons_frequencia import ATENCAO, CRITICO, evento_serializavel
+from ons_metricas import cache_instrumentado, iniciar_servidor_metricas
+from ons_poller import obter_poller, series_atrasadas, snapshot_atual
+from ons_series import SeriesCompactas
 
 # Configuração da página para TV widescreen
 st.set_page_config(
@@ -14,6 +20,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# /metrics do processo (ONS_METRICAS_PORTA)
+iniciar_servidor_metricas()
+
 # Paleta dark mode original
 COLORS = {
     'background': '#0B0F19',
@@ -29,240 +38,51 @@ COLORS = {
     'glow': '#4C1D95'
 }
 
-# Cores originais para fontes de energia
-ENERGY_COLORS = {
-    'Hidráulica': '#60A5FA',    # Blue 400
-    'Eólica': '#34D399',        # Emerald 400
-    'Solar': '#FBBF24',         # Amber 400
-    'Térmica': '#F87171',       # Red 400
-    'Nuclear': '#A78BFA',       # Purple 400
-    'Carga': '#EC4899'          # Pink 400
-}
+# Janela do gráfico Geração vs Carga em dias, escolhida pela URL da TV (?janela=7)
+JANELAS_DIAS = (1, 7, 30)
 
-# Funções de obtenção de dados expandidas com tratamento de NaN
-@st.cache_data(ttl=20)
-def get_data(url):
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200 and response.content:
-            data = response.json()
-            if isinstance(data, list) and data:
-                df = pd.DataFrame(data)
-                if not df.empty:
-                    df['instante'] = pd.to_datetime(df['instante'], errors='coerce')
-                    df = df.dropna(subset=['instante'])
-                    # Tratar valores NaN na coluna geracao
-                    if 'geracao' in df.columns:
-                        df['geracao'] = pd.to_numeric(df['geracao'], errors='coerce')
-                        df['geracao'] = df['geracao'].fillna(0)  # Substituir NaN por 0
-                        df = df[df['geracao'] >= 0]  # Remover valores negativos
-                    return df
-        return pd.DataFrame(columns=['instante', 'geracao'])
-    except Exception:
-        return pd.DataFrame(columns=['instante', 'geracao'])
-
-@st.cache_data(ttl=20)
-def get_carga_data():
-    url = "https://integra.ons.org.br/api/energiaagora/Get/Carga_SIN_json"
+def janela_dias():
     try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            df = pd.DataFrame(data)
-            df['instante'] = pd.to_datetime(df['instante'])
-            # Tratar valores NaN na coluna carga
-            if 'carga' in df.columns:
-                df['carga'] = pd.to_numeric(df['carga'], errors='coerce')
-                df['carga'] = df['carga'].fillna(method='ffill')  # Forward fill para NaN
-                df = df.dropna(subset=['carga'])  # Remover linhas ainda com NaN
-            return df
-        return pd.DataFrame(columns=['instante', 'carga'])
-    except Exception:
-        return pd.DataFrame(columns=['instante', 'carga'])
+        dias = int(st.query_params.get('janela', 1))
+    except (TypeError, ValueError):
+        dias = 1
+    return dias if dias in JANELAS_DIAS else 1
 
-@st.cache_data(ttl=20)
-def get_frequencia_sin():
-    url = "https://integra.ons.org.br/api/energiaagora/Get/Frequencia_SIN_json"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            df = pd.DataFrame(data)
-            df['instante'] = pd.to_datetime(df['instante'])
-            # Tratar valores NaN na frequência
-            if 'frequencia' in df.columns:
-                df['frequencia'] = pd.to_numeric(df['frequencia'], errors='coerce')
-                df['frequencia'] = df['frequencia'].fillna(60.0)  # Usar 60Hz como padrão
-                # Filtrar valores anômalos de frequência
-                df = df[(df['frequencia'] >= 58.0) & (df['frequencia'] <= 62.0)]
-            return df
-        return pd.DataFrame(columns=['instante', 'frequencia'])
-    except Exception:
-        return pd.DataFrame(columns=['instante', 'frequencia'])
+# Dias encerrados ficam residentes em formato compacto (float32, minutos int32),
+# um bloco por dia compartilhado por todas as sessões
+@cache_instrumentado('dia_compacto', st.cache_resource(ttl=3600, max_entries=max(JANELAS_DIAS)))
+def dia_compacto(dia_iso):
+    dia = date.fromisoformat(dia_iso)
+    historico = obter_poller().historico
+    if historico is None:
+        return SeriesCompactas.vazia(dia)
+    chaves = [chave_serie(fonte, regiao) for fonte, regioes in URLS_GERACAO.items() for regiao in regioes]
+    return historico.carregar_compacto(chaves + [CHAVE_CARGA], dia)
 
-def calcular_variacao_horaria(df, coluna='geracao'):
-    """Calcular variação horária e identificar picos/vales"""
-    if len(df) < 2:
-        return {"variacao_media": 0, "pico_hora": "N/A", "vale_hora": "N/A", "maior_variacao": 0}
-    
-    try:
-        # Calcular diferenças horárias
-        df_sorted = df.sort_values('instante')
-        df_sorted['variacao'] = df_sorted[coluna].diff()
-        
-        # Encontrar pico e vale
-        pico_idx = df_sorted[coluna].idxmax()
-        vale_idx = df_sorted[coluna].idxmin()
-        
-        pico_hora = df_sorted.loc[pico_idx, 'instante'].strftime('%H:%M')
-        vale_hora = df_sorted.loc[vale_idx, 'instante'].strftime('%H:%M')
-        
-        variacao_media = df_sorted['variacao'].mean()
-        maior_variacao = df_sorted['variacao'].abs().max()
-        
-        return {
-            "variacao_media": variacao_media,
-            "pico_hora": pico_hora,
-            "vale_hora": vale_hora,
-            "maior_variacao": maior_variacao,
-            "pico_valor": df_sorted.loc[pico_idx, coluna],
-            "vale_valor": df_sorted.loc[vale_idx, coluna]
-        }
-    except Exception:
-        return {"variacao_media": 0, "pico_hora": "N/A", "vale_hora": "N/A", "maior_variacao": 0}
-
-def calcular_tendencia_avancada(df, janela=10):
-    """Calcular tendência mais detalhada com variação percentual"""
-    if len(df) < janela or len(df) == 0:
-        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-    
-    coluna = 'geracao' if 'geracao' in df.columns else 'carga' if 'carga' in df.columns else 'frequencia'
-    valores_recentes = df[coluna].tail(janela).values
-    
-    if len(valores_recentes) < 2:
-        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-    
-    try:
-        # Remover valores NaN e infinitos
-        valores_recentes = valores_recentes[~np.isnan(valores_recentes)]
-        valores_recentes = valores_recentes[np.isfinite(valores_recentes)]
-        
-        if len(valores_recentes) < 2:
-            return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-        
-        x = np.arange(len(valores_recentes))
-        coef = np.polyfit(x, valores_recentes, 1)[0]
-        
-        # Calcular variação percentual
-        valor_inicial = valores_recentes[0]
-        valor_final = valores_recentes[-1]
-        variacao_absoluta = valor_final - valor_inicial
-        variacao_pct = (variacao_absoluta / valor_inicial * 100) if valor_inicial != 0 else 0
-        
-        # Verificar se os valores são válidos
-        if np.isnan(variacao_pct) or np.isinf(variacao_pct):
-            variacao_pct = 0
-        if np.isnan(variacao_absoluta) or np.isinf(variacao_absoluta):
-            variacao_absoluta = 0
-        if np.isnan(coef) or np.isinf(coef):
-            coef = 0
-        
-        if coef > 5:
-            tipo = "up"
-        elif coef < -5:
-            tipo = "down"
-        else:
-            tipo = "stable"
-            
-        return {
-            "coef": coef,
-            "tipo": tipo,
-            "variacao_pct": variacao_pct,
-            "variacao_absoluta": variacao_absoluta
-        }
-    except Exception:
-        return {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-
-def load_data():
-    urls = {
-        'Eólica': {
-            'Norte': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Eolica_json",
-            'Nordeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Eolica_json",
-            'Sudeste/Centro-Oeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Eolica_json",
-            'Sul': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Eolica_json"
-        },
-        'Solar': {
-            'Norte': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Solar_json",
-            'Nordeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Solar_json",
-            'Sudeste/Centro-Oeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Solar_json",
-            'Sul': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Solar_json"
-        },
-        'Hidráulica': {
-            'Norte': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Hidraulica_json",
-            'Nordeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Hidraulica_json",
-            'Sudeste/Centro-Oeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Hidraulica_json",
-            'Sul': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Hidraulica_json"
-        },
-        'Nuclear': {
-            'Sudeste/Centro-Oeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Nuclear_json"
-        },
-        'Térmica': {
-            'Norte': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Norte_Termica_json",
-            'Nordeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Nordeste_Termica_json",
-            'Sudeste/Centro-Oeste': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_SudesteECentroOeste_Termica_json",
-            'Sul': "https://integra.ons.org.br/api/energiaagora/Get/Geracao_Sul_Termica_json"
-        }
-    }
-    
-    dataframes = {}
-    for fonte, regioes in urls.items():
-        for regiao, url in regioes.items():
-            df = get_data(url)
-            if df is not None and not df.empty:
-                key = f'{fonte} - {regiao}'
-                dataframes[key] = df
-    
-    return dataframes
-
-def process_data(dataframes):
-    if not dataframes:
-        return {}, {}
-    
-    # Agregar dados por fonte
-    fonte_totals = {}
-    for key, df in dataframes.items():
-        if df.empty:
-            continue
-        fonte = key.split(' - ')[0]
-        valor_atual = df['geracao'].iloc[-1] if len(df) > 0 else 0
-        
-        # Verificar se o valor é válido
-        if pd.isna(valor_atual) or np.isinf(valor_atual) or valor_atual < 0:
-            valor_atual = 0
-            
-        if fonte not in fonte_totals:
-            fonte_totals[fonte] = valor_atual
-        else:
-            fonte_totals[fonte] += valor_atual
-    
-    # Preparar dados para gráfico de 24h
-    timeline_data = {}
-    for key, df in dataframes.items():
-        if df.empty:
-            continue
-        fonte = key.split(' - ')[0]
-        if fonte not in timeline_data:
-            timeline_data[fonte] = df.copy()
-        else:
-            # Verificar se os dados podem ser somados
-            if len(timeline_data[fonte]) == len(df):
-                timeline_data[fonte]['geracao'] += df['geracao']
-            else:
-                # Se os tamanhos forem diferentes, usar o maior dataset
-                if len(df) > len(timeline_data[fonte]):
-                    timeline_data[fonte] = df.copy()
+def historico_dias_anteriores(dias, hoje_iso):
+    hoje = date.fromisoformat(hoje_iso)
+    blocos = [dia_compacto((hoje - timedelta(days=n)).isoformat()) for n in range(dias - 1, 0, -1)]
+    return [bloco for bloco in blocos if len(bloco)]
+
+def series_janela(dataframes, carga_data, dias):
+    """Séries do dia estendidas com o histórico local quando a janela passa de 24h"""
+    if dias <= 1:
+        return dataframes, carga_data
+    anteriores = historico_dias_anteriores(dias, datetime.now().date().isoformat())
+    if not anteriores:
+        return dataframes, carga_data
+    
+    def estender(chave, df, coluna):
+        partes = [bloco.frame(chave, coluna) for bloco in anteriores if chave in bloco]
+        if not partes:
+            return df
+        if df is not None and not df.empty:
+            partes.append(df)
+        return pd.concat(partes, ignore_index=True)
     
-    return fonte_totals, timeline_data
+    chaves = set(dataframes).union(*(bloco.chaves for bloco in anteriores)) - {CHAVE_CARGA}
+    regionais = {chave: estender(chave, dataframes.get(chave), 'geracao') for chave in chaves}
+    return regionais, estender(CHAVE_CARGA, carga_data, 'carga')
 
 # CSS Dark Mode para TV
 st.markdown("""
@@ -486,62 +306,69 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Carregar dados simples
-try:
-    dataframes = load_data()
-    carga_data = get_carga_data()
-    fonte_totals, timeline_data = process_data(dataframes)
-    frequencia_data = get_frequencia_sin()
-    
-    # Verificar se os dados foram carregados
-    if not fonte_totals:
-        fonte_totals = {'Hidráulica': 0, 'Eólica': 0, 'Solar': 0, 'Térmica': 0, 'Nuclear': 0}
-        
-except Exception as e:
-    st.error(f"Erro ao carregar dados: {e}")
-    fonte_totals = {}
-    timeline_data = {}
-    carga_data = pd.DataFrame()
-    frequencia_data = pd.DataFrame()
+# Cada região de dados roda no próprio intervalo e confere a versão publicada
+# pelo poller; a página e o CSS não são reenviados. Um fragment que não
+# desenha nada é limpo pelo Streamlit, então com a versão já exibida a região
+# repete o que desenhou a partir do estado em cache, e as figuras não são
+# remontadas. O intervalo acompanha a cadência mínima da agenda (ons_agenda)
+ATUALIZACAO_DADOS = 10
+ATUALIZACAO_RELOGIO = 5
+# Sem dados, a tela de indisponível confere o poller até os primeiros chegarem
+ATUALIZACAO_INDISPONIVEL = 5
 
-# Layout principal
-if fonte_totals and not carga_data.empty:
-    # Métricas principais com tratamento seguro de NaN
-    total_geracao = sum(v for v in fonte_totals.values() if not pd.isna(v) and v > 0)
-    total_carga = carga_data['carga'].iloc[-1] if len(carga_data) > 0 and not pd.isna(carga_data['carga'].iloc[-1]) else 0
-    renovaveis = sum([
-        fonte_totals.get('Hidráulica', 0),
-        fonte_totals.get('Eólica', 0),
-        fonte_totals.get('Solar', 0)
-    ])
-    percentual_renovavel = (renovaveis / total_geracao * 100) if total_geracao > 0 else 0
-    
-    # Verificar se os valores são válidos
-    if pd.isna(percentual_renovavel):
-        percentual_renovavel = 0
-    
-    # Calcular análises avançadas com tratamento de erros
-    try:
-        trend_carga = calcular_tendencia_avancada(carga_data)
-        variacao_carga = calcular_variacao_horaria(carga_data, 'carga')
-    except:
-        trend_carga = {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-        variacao_carga = {"pico_hora": "N/A", "vale_hora": "N/A"}
-    
-    # Calcular tendência total de geração
-    if timeline_data:
-        try:
-            primeira_fonte = list(timeline_data.keys())[0]
-            df_total_temp = pd.DataFrame({'instante': timeline_data[primeira_fonte]['instante']})
-            df_total_temp['geracao'] = sum(timeline_data[fonte]['geracao'] for fonte in timeline_data.keys())
-            trend_geracao = calcular_tendencia_avancada(df_total_temp)
-            variacao_geracao = calcular_variacao_horaria(df_total_temp, 'geracao')
-        except:
-            trend_geracao = {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-            variacao_geracao = {"pico_hora": "N/A", "vale_hora": "N/A"}
-    else:
-        trend_geracao = {"coef": 0, "tipo": "stable", "variacao_pct": 0, "variacao_absoluta": 0}
-        variacao_geracao = {"pico_hora": "N/A", "vale_hora": "N/A"}
+# Excursões de frequência exibidas lado a lado na TV
+LIMITE_EVENTOS_TELA = 4
+
+# st.fragment estabilizou na 1.37; versões anteriores expõem experimental_fragment
+fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+
+# Grafo dos KPIs do processo: cada nó só recalcula quando as séries de que depende mudam
+@st.cache_resource
+def grafo_kpis():
+    return criar_grafo(MotorTendencias())
+
+# Derivados de um snapshot, calculados uma vez e compartilhados por sessões e fragments
+@cache_instrumentado('estado_dashboard', st.cache_resource(max_entries=2))
+def estado_dashboard(_snapshot, versao):
+    return calcular_estado(_snapshot, grafo_kpis())
+
+def versao_dados(snapshot):
+    return snapshot.versao_dados if snapshot else 0
+
+def dados_novos(regiao):
+    """Se a versão dos dados mudou desde o último desenho da região nesta sessão"""
+    versao = versao_dados(snapshot_atual())
+    chave = f'versao_{regiao}'
+    novos = st.session_state.get(chave) != versao
+    st.session_state[chave] = versao
+    return novos
+
+def estado_atual():
+    snapshot = snapshot_atual()
+    return estado_dashboard(snapshot, versao_dados(snapshot))
+
+# Figuras ficam na sessão: o layout é montado uma vez e cada ciclo só troca os dados
+def figura_sessao(chave, criar):
+    if chave not in st.session_state:
+        st.session_state[chave] = criar()
+    return st.session_state[chave]
+
+# Faixas de frequência do detector (ons_frequencia)
+CORES_FAIXA = {'normal': "#34D399", ATENCAO: "#FBBF24", CRITICO: "#F87171"}
+ROTULOS_FAIXA = {'normal': "Normal", ATENCAO: "Atenção", CRITICO: "Crítico"}
+
+def formatar_duracao(segundos):
+    return f"{segundos // 60:.0f}min{segundos % 60:02.0f}s" if segundos >= 60 else f"{segundos:.0f}s"
+
+@fragment(run_every=ATUALIZACAO_DADOS)
+def cards_principais():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    total_geracao, total_carga = estado['total_geracao'], estado['total_carga']
+    percentual_renovavel = estado['percentual_renovavel']
+    trend_carga, variacao_carga = estado['trend_carga'], estado['variacao_carga']
+    trend_geracao, variacao_geracao = estado['trend_geracao'], estado['variacao_geracao']
     
     # Cards de métricas principais expandidos
     col1, col2, col3, col4 = st.columns(4)
@@ -600,15 +427,15 @@ if fonte_totals and not carga_data.empty:
         """, unsafe_allow_html=True)
     
     with col4:
-        # Card de Frequência do SIN - MAIOR e mais visível
-        freq_atual = frequencia_data['frequencia'].iloc[-1] if not frequencia_data.empty and not pd.isna(frequencia_data['frequencia'].iloc[-1]) else 60.0
-        try:
-            freq_trend = calcular_tendencia_avancada(frequencia_data)
-        except:
-            freq_trend = {"variacao_pct": 0}
+        # Card de Frequência do SIN - MAIOR e mais visível; faixa e excursão vêm do detector
+        excursoes = estado['excursoes']
+        freq_atual = excursoes.atual if excursoes.atual is not None else 60.0
+        freq_trend = estado['tendencias'].get(CHAVE_FREQUENCIA, TENDENCIA_NEUTRA)
         
-        freq_color = "#34D399" if 59.9 <= freq_atual <= 60.1 else "#FBBF24" if 59.5 <= freq_atual <= 60.5 else "#F87171"
-        freq_status = "Normal" if 59.9 <= freq_atual <= 60.1 else "Atenção" if 59.5 <= freq_atual <= 60.5 else "Crítico"
+        freq_color = CORES_FAIXA[excursoes.faixa]
+        freq_status = ROTULOS_FAIXA[excursoes.faixa]
+        if excursoes.evento is not None:
+            freq_status += f" há {formatar_duracao(excursoes.evento.duracao)}"
         
         freq_var_pct = freq_trend.get("variacao_pct", 0)
         if pd.isna(freq_var_pct):
@@ -621,215 +448,154 @@ if fonte_totals and not carga_data.empty:
             <div class="metric-status">
                 <div class="status-indicator" style="background: {freq_color}; width: 16px; height: 16px;"></div>
                 <span style="color: {freq_color}; font-size: 1rem; font-weight: 600;">
-                    {freq_status} • {freq_var_pct:+.3f}%
+                    {freq_status} • {freq_var_pct:+.3f}% • {excursoes.rocof:+.4f} Hz/s
                 </span>
             </div>
         </div>
         """, unsafe_allow_html=True)
 
-    # Layout em 3 colunas para otimizar espaço na TV
-    col_left, col_center, col_right = st.columns([1, 2, 1])
-    
-    with col_left:
-        # Geração por fonte - compacto para TV
-        st.markdown('<div class="section-title">🔋 Fontes</div>', unsafe_allow_html=True)
-        
-        # Ordenar fontes por geração
-        fontes_ordenadas = sorted(fonte_totals.items(), key=lambda x: x[1], reverse=True)
-        
-        for fonte, valor in fontes_ordenadas:
-            if valor > 0:
-                # Calcular tendência da fonte com análise detalhada
-                if fonte in timeline_data:
-                    try:
-                        trend_fonte = calcular_tendencia_avancada(timeline_data[fonte])
-                        variacao_fonte = calcular_variacao_horaria(timeline_data[fonte], 'geracao')
-                        trend_icon = "↗" if trend_fonte["tipo"] == "up" else "↘" if trend_fonte["tipo"] == "down" else "→"
-                        trend_class = f"trend-{trend_fonte['tipo']}"
-                    except:
-                        trend_fonte = {"variacao_pct": 0}
-                        variacao_fonte = {"pico_hora": "N/A"}
-                        trend_icon = "→"
-                        trend_class = "trend-stable"
-                else:
+@fragment(run_every=ATUALIZACAO_DADOS)
+def coluna_fontes():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    fonte_totals, timeline_data = estado['fonte_totals'], estado['timeline_data']
+    total_geracao = estado['total_geracao']
+    
+    # Ordenar fontes por geração
+    fontes_ordenadas = sorted(fonte_totals.items(), key=lambda x: x[1], reverse=True)
+    
+    for fonte, valor in fontes_ordenadas:
+        if valor > 0:
+            # Calcular tendência da fonte com análise detalhada
+            if fonte in timeline_data:
+                try:
+                    trend_fonte = estado['tendencias'].get(fonte, TENDENCIA_NEUTRA)
+                    variacao_fonte = estado['variacoes'].get(fonte, VARIACAO_NEUTRA)
+                    trend_icon = "↗" if trend_fonte["tipo"] == "up" else "↘" if trend_fonte["tipo"] == "down" else "→"
+                    trend_class = f"trend-{trend_fonte['tipo']}"
+                except:
                     trend_fonte = {"variacao_pct": 0}
                     variacao_fonte = {"pico_hora": "N/A"}
                     trend_icon = "→"
                     trend_class = "trend-stable"
-                
-                percentual = (valor / total_geracao * 100) if total_geracao > 0 else 0
-                source_color = ENERGY_COLORS.get(fonte, '#94A3B8')
-                
-                variacao_pct_fonte = trend_fonte.get("variacao_pct", 0)
-                if pd.isna(variacao_pct_fonte):
-                    variacao_pct_fonte = 0
-                
-                st.markdown(f"""
-                <div class="source-card" style="--source-color: {source_color};">
-                    <div>
-                        <div class="source-name" style="font-size: 0.9rem;">{fonte}</div>
-                        <div class="source-percentage" style="font-size: 0.75rem;">{percentual:.1f}% • P: {variacao_fonte.get("pico_hora", "N/A")}</div>
-                    </div>
-                    <div style="text-align: right;">
-                        <div class="source-value" style="color: {source_color}; font-size: 1.1rem;">{valor:,.0f}</div>
-                        <div class="trend-badge {trend_class}" style="font-size: 0.65rem;">
-                            {trend_icon} {variacao_pct_fonte:+.1f}%
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-    
-    with col_center:
-        # Gráfico principal maximizado para TV
-        st.markdown('<div class="section-title">📈 Geração vs Carga (24h)</div>', unsafe_allow_html=True)
-        
-        if timeline_data and not carga_data.empty:
-            fig_gen_load = go.Figure()
-            
-            # Adicionar área empilhada para geração por fonte
-            fontes_disponiveis = list(timeline_data.keys())
-            if 'Hidráulica' in fontes_disponiveis:
-                fontes_ordenadas = sorted(fontes_disponiveis, key=lambda x: 0 if x == 'Hidráulica' else 1)
             else:
-                fontes_ordenadas = fontes_disponiveis
-            
-            for fonte in fontes_ordenadas:
-                df = timeline_data[fonte]
-                if not df.empty:
-                    fig_gen_load.add_trace(go.Scatter(
-                        x=df['instante'],
-                        y=df['geracao'],
-                        name=fonte,
-                        stackgroup='geracao',
-                        line=dict(width=0),
-                        fillcolor=ENERGY_COLORS.get(fonte, '#94A3B8'),
-                        hovertemplate=f'<b>{fonte}</b><br>%{{x|%H:%M}}<br>%{{y:,.0f}} MW<extra></extra>'
-                    ))
+                trend_fonte = {"variacao_pct": 0}
+                variacao_fonte = {"pico_hora": "N/A"}
+                trend_icon = "→"
+                trend_class = "trend-stable"
             
-            # Adicionar linha de carga original
-            fig_gen_load.add_trace(go.Scatter(
-                x=carga_data['instante'],
-                y=carga_data['carga'],
-                name='Carga Total',
-                line=dict(color='#EC4899', width=4, dash='solid'),
-                hovertemplate='<b>Carga Total</b><br>%{x|%H:%M}<br>%{y:,.0f} MW<extra></extra>'
-            ))
+            percentual = (valor / total_geracao * 100) if total_geracao > 0 else 0
+            source_color = ENERGY_COLORS.get(fonte, '#94A3B8')
             
-            fig_gen_load.update_layout(
-                height=500,
-                margin=dict(t=10, b=50, l=20, r=20),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(37, 43, 58, 0.3)',
-                hovermode='x unified',
-                hoverlabel=dict(
-                    bgcolor='rgba(37, 43, 58, 0.95)',
-                    bordercolor='#3B4252',
-                    font=dict(color='#F8FAFC', family='Inter', size=11)
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=-0.15,
-                    xanchor="center",
-                    x=0.5,
-                    bgcolor='rgba(37, 43, 58, 0.8)',
-                    bordercolor='#3B4252',
-                    borderwidth=1,
-                    font=dict(color='#F8FAFC', family='Inter', size=10)
-                ),
-                xaxis=dict(
-                    showgrid=True,
-                    gridcolor='rgba(59, 66, 82, 0.3)',
-                    gridwidth=1,
-                    title="Horário",
-                    titlefont=dict(color='#94A3B8', size=12, family='Inter'),
-                    tickfont=dict(color='#94A3B8', size=10, family='Inter'),
-                    linecolor='#3B4252'
-                ),
-                yaxis=dict(
-                    showgrid=True,
-                    gridcolor='rgba(59, 66, 82, 0.3)',
-                    gridwidth=1,
-                    title="Potência (MW)",
-                    titlefont=dict(color='#94A3B8', size=12, family='Inter'),
-                    tickfont=dict(color='#94A3B8', size=10, family='Inter'),
-                    linecolor='#3B4252'
-                )
-            )
+            variacao_pct_fonte = trend_fonte.get("variacao_pct", 0)
+            if pd.isna(variacao_pct_fonte):
+                variacao_pct_fonte = 0
             
-            st.plotly_chart(fig_gen_load, use_container_width=True)
-    
-    with col_right:
-        # Composição da matriz - mais compacta
-        st.markdown('<div class="section-title">📊 Matriz</div>', unsafe_allow_html=True)
-        
-        # Gráfico de rosca compacto para TV
-        fig_pie = go.Figure(data=[go.Pie(
-            labels=list(fonte_totals.keys()),
-            values=list(fonte_totals.values()),
-            hole=0.6,
-            marker=dict(
-                colors=[ENERGY_COLORS.get(fonte, '#94A3B8') for fonte in fonte_totals.keys()],
-                line=dict(color='#252B3A', width=2)
-            ),
-            textinfo='percent',
-            textfont=dict(size=10, color='#F8FAFC', family='Inter'),
-            hovertemplate='<b>%{label}</b><br>%{value:,.0f} MW<extra></extra>'
-        )])
-        
-        fig_pie.add_annotation(
-            text=f"<b>{total_geracao:,.0f}</b><br><span style='font-size:10px;'>MW</span>",
-            x=0.5, y=0.5,
-            font=dict(size=14, family='Inter', color='#F8FAFC'),
-            showarrow=False
-        )
-        
-        fig_pie.update_layout(
-            height=220,
-            margin=dict(t=5, b=5, l=5, r=5),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_pie, use_container_width=True)
-        
-        # Estatísticas compactas empilhadas
-        st.markdown('<div class="section-title" style="margin-top: 20px;">📊 Status</div>', unsafe_allow_html=True)
-        
-        # Eficiência
-        eficiencia = (total_carga / total_geracao * 100) if total_geracao > 0 else 0
-        st.markdown(f"""
-        <div class="metric-card" style="height: 100px; padding: 12px;">
-            <div class="metric-value" style="color: #60A5FA; font-size: 1.5rem;">{eficiencia:.1f}%</div>
-            <div class="metric-label" style="font-size: 0.7rem;">Eficiência</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Fonte dominante
-        if fonte_totals:
-            fonte_dominante = max(fonte_totals.items(), key=lambda x: x[1])
-            percentual_dominante = (fonte_dominante[1] / total_geracao * 100) if total_geracao > 0 else 0
-            cor_dominante = ENERGY_COLORS.get(fonte_dominante[0], '#94A3B8')
             st.markdown(f"""
-            <div class="metric-card" style="height: 100px; padding: 12px;">
-                <div class="metric-value" style="color: {cor_dominante}; font-size: 1.5rem;">{percentual_dominante:.1f}%</div>
-                <div class="metric-label" style="font-size: 0.7rem;">{fonte_dominante[0]}</div>
+            <div class="source-card" style="--source-color: {source_color};">
+                <div>
+                    <div class="source-name" style="font-size: 0.9rem;">{fonte}</div>
+                    <div class="source-percentage" style="font-size: 0.75rem;">{percentual:.1f}% • P: {variacao_fonte.get("pico_hora", "N/A")}</div>
+                </div>
+                <div style="text-align: right;">
+                    <div class="source-value" style="color: {source_color}; font-size: 1.1rem;">{valor:,.0f}</div>
+                    <div class="trend-badge {trend_class}" style="font-size: 0.65rem;">
+                        {trend_icon} {variacao_pct_fonte:+.1f}%
+                    </div>
+                </div>
             </div>
             """, unsafe_allow_html=True)
+
+@fragment(run_every=ATUALIZACAO_DADOS)
+def grafico_geracao_carga():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    dias = janela_dias()
+    chave = f'fig_gen_load_{dias}'
+    
+    # Sem dados novos, a figura da sessão é redesenhada como está: o fragment
+    # apaga o que não redesenha, e o elemento idêntico sai só como referência
+    # ao cache de mensagens do navegador (.streamlit/config.toml)
+    if not dados_novos(chave) and chave in st.session_state:
+        st.plotly_chart(st.session_state[chave].fig, use_container_width=True)
+        return
+    dataframes, carga_data, timeline_data = estado['dataframes'], estado['carga_data'], estado['timeline_data']
+    
+    # Janelas maiores que 24h combinam o histórico local com o dia corrente
+    if dias > 1:
+        regionais_janela, carga_grafico = series_janela(dataframes, carga_data, dias)
+        _, timeline_grafico, _ = process_data(regionais_janela)
+    else:
+        timeline_grafico, carga_grafico = timeline_data, carga_data
+    formato_hora = '%H:%M' if dias == 1 else '%d/%m %H:%M'
+    
+    # Downsampling para a largura da coluna central (metade da TV), preservando picos e vales
+    series = series_geracao(timeline_grafico, carga_grafico, orcamento_pontos(LARGURA_TV_PX // 2))
+    
+    if series:
+        figura = figura_sessao(chave, lambda: figura_geracao(formato_hora))
+        fig_gen_load = figura.atualizar(series)
         
-        # Reserva
-        margem = total_geracao - total_carga
-        margem_color = "#34D399" if margem > 1000 else "#FBBF24" if margem > 0 else "#F87171"
+        st.plotly_chart(fig_gen_load, use_container_width=True)
+
+@fragment(run_every=ATUALIZACAO_DADOS)
+def coluna_matriz():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    fonte_totals = estado['fonte_totals']
+    total_geracao = estado['total_geracao']
+    
+    figura = figura_sessao('fig_pie', figura_matriz)
+    # Como no gráfico de geração, sem dados novos a figura sai idêntica
+    fig_pie = figura.fig
+    if dados_novos('fig_pie'):
+        fig_pie = atualizar_matriz(figura, fonte_totals, total_geracao)
+    
+    st.plotly_chart(fig_pie, use_container_width=True)
+    
+    # Estatísticas compactas empilhadas
+    st.markdown('<div class="section-title" style="margin-top: 20px;">📊 Status</div>', unsafe_allow_html=True)
+    
+    # Eficiência
+    eficiencia = estado['eficiencia']
+    st.markdown(f"""
+    <div class="metric-card" style="height: 100px; padding: 12px;">
+        <div class="metric-value" style="color: #60A5FA; font-size: 1.5rem;">{eficiencia:.1f}%</div>
+        <div class="metric-label" style="font-size: 0.7rem;">Eficiência</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Fonte dominante
+    if estado['fonte_dominante']:
+        fonte_dominante, percentual_dominante = estado['fonte_dominante']
+        cor_dominante = ENERGY_COLORS.get(fonte_dominante, '#94A3B8')
         st.markdown(f"""
         <div class="metric-card" style="height: 100px; padding: 12px;">
-            <div class="metric-value" style="color: {margem_color}; font-size: 1.5rem;">{margem:,.0f}</div>
-            <div class="metric-label" style="font-size: 0.7rem;">Reserva MW</div>
+            <div class="metric-value" style="color: {cor_dominante}; font-size: 1.5rem;">{percentual_dominante:.1f}%</div>
+            <div class="metric-label" style="font-size: 0.7rem;">{fonte_dominante}</div>
         </div>
         """, unsafe_allow_html=True)
+    
+    # Reserva
+    margem = estado['margem']
+    margem_color = "#34D399" if margem > 1000 else "#FBBF24" if margem > 0 else "#F87171"
+    st.markdown(f"""
+    <div class="metric-card" style="height: 100px; padding: 12px;">
+        <div class="metric-value" style="color: {margem_color}; font-size: 1.5rem;">{margem:,.0f}</div>
+        <div class="metric-label" style="font-size: 0.7rem;">Reserva MW</div>
+    </div>
+    """, unsafe_allow_html=True)
 
-    # Cards de análise operacional detalhada
-    st.markdown('<div class="section-title" style="margin-top: 16px;">📊 Análise Operacional</div>', unsafe_allow_html=True)
+@fragment(run_every=ATUALIZACAO_DADOS)
+def analise_operacional():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    trend_carga, variacao_carga = estado['trend_carga'], estado['variacao_carga']
+    trend_geracao, variacao_geracao = estado['trend_geracao'], estado['variacao_geracao']
     
     col_analise1, col_analise2, col_analise3, col_analise4 = st.columns(4)
     
@@ -871,18 +637,7 @@ if fonte_totals and not carga_data.empty:
     
     with col_analise3:
         # Maior Fonte em Crescimento
-        maior_crescimento = 0
-        fonte_crescimento = "Estável"
-        if timeline_data:
-            for fonte in timeline_data:
-                try:
-                    trend_f = calcular_tendencia_avancada(timeline_data[fonte])
-                    variacao_pct_f = trend_f.get("variacao_pct", 0)
-                    if not pd.isna(variacao_pct_f) and variacao_pct_f > maior_crescimento:
-                        maior_crescimento = variacao_pct_f
-                        fonte_crescimento = fonte
-                except:
-                    continue
+        fonte_crescimento, maior_crescimento = estado['maior_crescimento']
         
         cor_crescimento = ENERGY_COLORS.get(fonte_crescimento, '#34D399')
         st.markdown(f"""
@@ -899,10 +654,7 @@ if fonte_totals and not carga_data.empty:
     
     with col_analise4:
         # Reserva Operativa
-        margem = total_geracao - total_carga
-        reserva_pct = (margem / total_carga * 100) if total_carga > 0 else 0
-        if pd.isna(reserva_pct):
-            reserva_pct = 0
+        margem, reserva_pct = estado['margem'], estado['reserva_pct']
         reserva_color = "#34D399" if reserva_pct > 5 else "#FBBF24" if reserva_pct > 2 else "#F87171"
         st.markdown(f"""
         <div class="metric-card" style="height: 140px;">
@@ -916,7 +668,50 @@ if fonte_totals and not carga_data.empty:
         </div>
         """, unsafe_allow_html=True)
 
-    # Footer com indicador ao vivo e estatísticas do sistema
+@fragment(run_every=ATUALIZACAO_DADOS)
+def eventos_frequencia():
+    estado = estado_atual()
+    if not estado['disponivel']:
+        return
+    excursoes = estado['excursoes']
+    # Excursão em curso primeiro, depois as encerradas da mais recente para a mais antiga
+    eventos = ([excursoes.evento] if excursoes.evento is not None else []) + list(reversed(excursoes.eventos))
+    if not eventos:
+        st.markdown('<div class="metric-label" style="font-size: 0.85rem;">Sem excursões fora de 59,9–60,1 Hz</div>', unsafe_allow_html=True)
+        return
+    
+    colunas = st.columns(LIMITE_EVENTOS_TELA)
+    for coluna, evento in zip(colunas, eventos[:LIMITE_EVENTOS_TELA]):
+        dados = evento_serializavel(evento)
+        cor = CORES_FAIXA[dados['severidade']]
+        periodo = f"{dados['inicio']} – {dados['fim']}" if dados['fim'] else f"{dados['inicio']} • em curso"
+        with coluna:
+            st.markdown(f"""
+            <div class="metric-card" style="height: 120px; border: 1px solid {cor};">
+                <div class="metric-value" style="color: {cor}; font-size: 1.6rem;">{dados['nadir']:.2f} Hz</div>
+                <div class="metric-label" style="font-size: 0.8rem;">{"SUBFREQUÊNCIA" if dados['sentido'] == 'sub' else "SOBREFREQUÊNCIA"} • {ROTULOS_FAIXA[dados['severidade']]}</div>
+                <div class="metric-status">
+                    <span style="color: {cor}; font-size: 0.8rem;">
+                        {periodo} • {formatar_duracao(dados['duracao'])} • ROCOF {dados['rocof']:.4f} Hz/s
+                    </span>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+
+@fragment(run_every=ATUALIZACAO_RELOGIO)
+def rodape():
+    estado = estado_atual()
+    carga_data = estado['carga_data'] if estado['disponivel'] else pd.DataFrame()
+    
+    # Séries exibidas com o último dado válido enquanto o ONS não responde
+    atrasadas = series_atrasadas(snapshot_atual())
+    if atrasadas:
+        status_cor = "#FBBF24"
+        status_texto = f"ÚLTIMO DADO VÁLIDO • {len(atrasadas)} série(s) há {max(atrasadas.values()):.0f}s"
+    else:
+        status_cor = "#34D399"
+        status_texto = f"AO VIVO • {datetime.now().strftime('%H:%M:%S')}"
+    
     st.markdown(f"""
     <div class="footer">
         <div class="footer-content">
@@ -927,16 +722,61 @@ if fonte_totals and not carga_data.empty:
                 <strong style="color: #F8FAFC;">Análise:</strong> 
                 <span style="color: #94A3B8;">Dados do dia atual • Tendências baseadas em {len(carga_data)} pontos</span>
             </div>
-            <div class="live-indicator">
-                <div class="live-dot"></div>
-                <span style="color: #34D399; font-weight: 600;">
-                    AO VIVO • {datetime.now().strftime('%H:%M:%S')}
+            <div class="live-indicator" style="border-color: {status_cor};">
+                <div class="live-dot" style="background: {status_cor}; box-shadow: 0 0 10px {status_cor};"></div>
+                <span style="color: {status_cor}; font-weight: 600;">
+                    {status_texto}
                 </span>
             </div>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+# Sem dados na montagem da página: monta o layout completo quando os primeiros chegarem
+@fragment(run_every=ATUALIZACAO_INDISPONIVEL)
+def aguardar_dados():
+    if estado_atual()['disponivel']:
+        st.rerun()
+
+# Layout principal
+estado = estado_atual()
+if estado['erro'] is not None:
+    st.error(f"Erro ao carregar dados: {estado['erro']}")
+
+if estado['disponivel']:
+    cards_principais()
+    
+    # Layout em 3 colunas para otimizar espaço na TV
+    col_left, col_center, col_right = st.columns([1, 2, 1])
+    
+    with col_left:
+        # Geração por fonte - compacto para TV
+        st.markdown('<div class="section-title">🔋 Fontes</div>', unsafe_allow_html=True)
+        coluna_fontes()
+    
+    with col_center:
+        # Gráfico principal maximizado para TV
+        dias = janela_dias()
+        rotulo_janela = "24h" if dias == 1 else f"{dias} dias"
+        st.markdown(f'<div class="section-title">📈 Geração vs Carga ({rotulo_janela})</div>', unsafe_allow_html=True)
+        grafico_geracao_carga()
+    
+    with col_right:
+        # Composição da matriz - mais compacta
+        st.markdown('<div class="section-title">📊 Matriz</div>', unsafe_allow_html=True)
+        coluna_matriz()
+
+    # Cards de análise operacional detalhada
+    st.markdown('<div class="section-title" style="margin-top: 16px;">📊 Análise Operacional</div>', unsafe_allow_html=True)
+    analise_operacional()
+
+    # Excursões de frequência detectadas no dia (em curso e encerradas)
+    st.markdown('<div class="section-title" style="margin-top: 16px;">⚡ Eventos de Frequência</div>', unsafe_allow_html=True)
+    eventos_frequencia()
+
+    # Footer com indicador ao vivo e estatísticas do sistema
+    rodape()
+
 else:
     # Estado de erro com design elegante
     st.markdown("""
@@ -953,7 +793,4 @@ else:
         </div>
     </div>
     """, unsafe_allow_html=True)
-
-# Auto-refresh a cada 30 segundos
-time.sleep(30)
-st.rerun()
+    aguardar_dados()
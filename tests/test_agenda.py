@@ -0,0 +1,85 @@
+"""Agenda contra um relógio simulado: cadência aprendida, espera mínima e recuo"""
+import time
+
+import numpy as np
+import pytest
+
+from ons_agenda import ESPALHAMENTO, ESPERA_MAXIMA, ESPERA_MINIMA, INTERVALO_MINIMO, Agenda
+
+# O ONS publica um instante por minuto, disponível 25 s depois; instantes no fuso -3h
+CADENCIA = 60
+ATRASO = 25
+FUSO = -3 * 3600
+
+
+def _publicado(agora):
+    """Último instante disponível (segundos, sem fuso) no momento 'agora'"""
+    return int((agora - ATRASO) // CADENCIA) * CADENCIA + FUSO
+
+
+def _instantes(inicio, fim):
+    return np.arange(inicio, fim + 1, CADENCIA).astype('datetime64[s]')
+
+
+def _simular(agenda, inicio, duracao, passo=0.5):
+    """Roda a agenda sobre o relógio simulado; devolve (buscas, atrasos até achar cada instante novo)"""
+    ultimo, buscas, atrasos = None, 0, []
+    agora = inicio
+    while agora < inicio + duracao:
+        if agenda.vencidas(agora):
+            buscas += 1
+            publicado = _publicado(agora)
+            if ultimo is None:
+                instantes = _instantes(publicado - 600, publicado)
+            elif publicado > ultimo:
+                instantes = _instantes(ultimo + CADENCIA, publicado)
+                atrasos.append(agora - (publicado - FUSO + ATRASO))
+            else:
+                instantes = ()
+            if len(instantes):
+                ultimo = publicado
+                agenda.registrar('x', instantes, agora)
+                # Depois de um instante novo nunca volta antes de INTERVALO_MINIMO
+                assert agenda.espera(agora) >= INTERVALO_MINIMO
+            else:
+                agenda.registrar('x', instantes, agora)
+        agora += passo
+    return buscas, atrasos
+
+
+@pytest.fixture
+def inicio():
+    # Depois da primeira rodada, que é sorteada em até ESPALHAMENTO segundos
+    return time.time() + ESPALHAMENTO
+
+
+def test_aprende_a_cadencia_de_publicacao(inicio):
+    agenda = Agenda(['x'], 20, semente=1)
+    buscas, atrasos = _simular(agenda, inicio, 3600)
+    assert agenda.cadencias()['x'] == pytest.approx(CADENCIA)
+    # Uma busca por publicação mais as sondagens vazias, longe das 180 de um intervalo fixo de 20 s
+    assert buscas < 2 * 3600 / CADENCIA
+    assert len(atrasos) >= 3600 / CADENCIA - 2
+    assert np.median(atrasos) < ESPERA_MINIMA + 2 * ESPALHAMENTO
+
+
+def test_recuo_dobra_ate_o_teto(inicio):
+    agenda = Agenda(['x'], 20, semente=1)
+    esperas = []
+    for _ in range(10):
+        agenda.falhou('x', inicio)
+        esperas.append(agenda.espera(inicio))
+    for falhas, espera in enumerate(esperas, start=1):
+        base = min(ESPERA_MINIMA * 2 ** (falhas - 1), ESPERA_MAXIMA)
+        assert base <= espera <= base + ESPALHAMENTO
+    assert esperas[-1] >= ESPERA_MAXIMA
+
+
+def test_sucesso_zera_o_recuo(inicio):
+    agenda = Agenda(['x'], 20, semente=1)
+    for _ in range(6):
+        agenda.falhou('x', inicio)
+    agora = inicio + ESPERA_MAXIMA
+    agenda.registrar('x', _instantes(_publicado(agora) - 600, _publicado(agora)), agora)
+    agenda.registrar('x', (), agora + INTERVALO_MINIMO)
+    assert agenda.espera(agora + INTERVALO_MINIMO) <= ESPERA_MINIMA + ESPALHAMENTO
@@ -0,0 +1,141 @@
+"""RegressaoMovel e MotorTendencias contra np.polyfit; analisar_rampas contra o cálculo por série com pandas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ons_calculos import (
+    JANELAS_TENDENCIA, PERCENTIS_RAMPA, RECALCULO_JANELAS, VARIACAO_NEUTRA, MotorTendencias, RegressaoMovel,
+    analisar_frame, analisar_rampas, calcular_tendencia_avancada
+)
+
+JANELA = JANELAS_TENDENCIA[0]
+
+
+def _serie(n, semente=0, inicio='2024-01-01T00:00'):
+    sorteio = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'instante': pd.date_range(inicio, periods=n, freq='min'),
+        'carga': 70000 + np.cumsum(sorteio.normal(0, 50, n))
+    })
+
+
+def _conferir(obtido, esperado):
+    assert obtido['tipo'] == esperado['tipo']
+    for campo in ('coef', 'variacao_pct', 'variacao_absoluta'):
+        assert obtido[campo] == pytest.approx(esperado[campo], rel=1e-9, abs=1e-9)
+
+
+def test_regressao_movel_igual_polyfit_em_cada_janela():
+    # Passa de RECALCULO_JANELAS janelas: cobre a recomposição das somas correntes
+    valores = _serie(RECALCULO_JANELAS * JANELA * 2 + 7)['carga'].to_numpy()
+    regressao = RegressaoMovel(JANELA)
+    for i, valor in enumerate(valores):
+        regressao.adicionar(valor)
+        if i + 1 >= JANELA:
+            janela = valores[i + 1 - JANELA:i + 1]
+            coef = np.polyfit(np.arange(JANELA), janela, 1)[0]
+            # As somas correntes acumulam arredondamento entre recomposições
+            assert regressao.resultado()['coef'] == pytest.approx(coef, rel=1e-6, abs=1e-6)
+
+
+def test_regressao_movel_com_nan_igual_calculo_direto():
+    df = _serie(40, semente=1)
+    df.loc[[12, 13, 25], 'carga'] = np.nan
+    regressao = RegressaoMovel(JANELA)
+    for i, valor in enumerate(df['carga']):
+        regressao.adicionar(valor)
+        if i + 1 >= JANELA:
+            _conferir(regressao.resultado(), calcular_tendencia_avancada(df.iloc[:i + 1], JANELA))
+
+
+def test_regressao_movel_neutra_antes_de_encher_a_janela():
+    regressao = RegressaoMovel(JANELA)
+    for valor in range(JANELA - 1):
+        regressao.adicionar(valor)
+    assert regressao.resultado() == calcular_tendencia_avancada(_serie(JANELA - 1), JANELA)
+
+
+def test_motor_incremental_igual_calculo_sobre_o_frame_completo():
+    df = _serie(300, semente=2)
+    motor = MotorTendencias()
+    # Blocos de tamanhos variados, como os deltas do poller
+    fim = 0
+    for passo in (5, 1, 1, 12, 3, 40, 1, 100, 137):
+        fim += passo
+        parcial = df.iloc[:fim]
+        motor.atualizar('Carga', parcial)
+        _conferir(motor.tendencia('Carga'), calcular_tendencia_avancada(parcial, JANELA))
+
+
+def test_motor_reconstroi_quando_pontos_vistos_sao_revisados():
+    df = _serie(60, semente=3)
+    motor = MotorTendencias()
+    motor.atualizar('Carga', df.iloc[:50])
+    revisado = df.copy()
+    revisado.loc[45:49, 'carga'] += 500
+    motor.atualizar('Carga', revisado)
+    _conferir(motor.tendencia('Carga'), calcular_tendencia_avancada(revisado, JANELA))
+
+
+def test_motor_reconstroi_na_virada_de_dia():
+    motor = MotorTendencias()
+    motor.atualizar('Carga', _serie(100, semente=4, inicio='2024-01-01T20:00'))
+    novo_dia = _serie(15, semente=5, inicio='2024-01-01T00:00')
+    motor.atualizar('Carga', novo_dia)
+    _conferir(motor.tendencia('Carga'), calcular_tendencia_avancada(novo_dia, JANELA))
+
+
+def calcular_variacao_horaria(df, coluna='geracao'):
+    """Referência: o cálculo por série com pandas que analisar_rampas substituiu"""
+    if len(df) < 2:
+        return dict(VARIACAO_NEUTRA)
+    df_sorted = df.sort_values('instante')
+    variacao = df_sorted[coluna].diff()
+    pico_idx = df_sorted[coluna].idxmax()
+    vale_idx = df_sorted[coluna].idxmin()
+    return {
+        "variacao_media": variacao.mean(),
+        "pico_hora": df_sorted.loc[pico_idx, 'instante'].strftime('%H:%M'),
+        "vale_hora": df_sorted.loc[vale_idx, 'instante'].strftime('%H:%M'),
+        "maior_variacao": variacao.abs().max(),
+        "pico_valor": df_sorted.loc[pico_idx, coluna],
+        "vale_valor": df_sorted.loc[vale_idx, coluna]
+    }
+
+
+def _conferir_variacao(obtido, esperado, rampa=None):
+    assert obtido['pico_hora'] == esperado['pico_hora']
+    assert obtido['vale_hora'] == esperado['vale_hora']
+    for campo in ('variacao_media', 'maior_variacao', 'pico_valor', 'vale_valor'):
+        assert obtido[campo] == pytest.approx(esperado[campo], rel=1e-9)
+    if rampa is not None:
+        for p in PERCENTIS_RAMPA:
+            assert obtido[f'rampa_p{p}'] == pytest.approx(np.percentile(rampa, p), rel=1e-9)
+
+
+def test_analisar_rampas_igual_calculo_por_serie():
+    sorteio = np.random.default_rng(6)
+    instantes = pd.date_range('2024-01-01', periods=1440, freq='min')
+    nomes = ['Hidráulica', 'Eólica', 'Solar']
+    matriz = 3000 + np.cumsum(sorteio.normal(0, 40, (1440, len(nomes))), axis=0)
+    # Lacunas no meio da série: pandas e numpy pulam as diferenças com NaN
+    matriz[[100, 101, 700], 1] = np.nan
+
+    resultado = analisar_rampas(instantes.to_numpy(), matriz, nomes)
+    for j, nome in enumerate(nomes):
+        df = pd.DataFrame({'instante': instantes, 'geracao': matriz[:, j]})
+        rampa = np.abs(np.diff(matriz[:, j]))
+        _conferir_variacao(resultado[nome], calcular_variacao_horaria(df), rampa[np.isfinite(rampa)])
+
+
+def test_analisar_frame_igual_calculo_por_serie():
+    df = _serie(500, semente=7)
+    _conferir_variacao(analisar_frame(df, 'carga'), calcular_variacao_horaria(df, 'carga'))
+
+
+def test_analisar_rampas_neutra_sem_dados():
+    instantes = pd.date_range('2024-01-01', periods=3, freq='min').to_numpy()
+    resultado = analisar_rampas(instantes, np.array([[1.0, np.nan], [2.0, np.nan], [3.0, np.nan]]), ['A', 'B'])
+    assert resultado['B'] == VARIACAO_NEUTRA
+    assert analisar_rampas(instantes[:1], np.array([[1.0]]), ['A']) == {'A': VARIACAO_NEUTRA}
+    assert analisar_frame(_serie(1), 'carga') == VARIACAO_NEUTRA
@@ -0,0 +1,83 @@
+"""Redução de pontos: orçamento, pico e vale globais e eixo x comum das séries empilhadas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ons_charts import minmax_indices, reduzir_serie, reduzir_series_alinhadas
+
+N = 1440
+ORCAMENTO = 100
+
+
+def _serie(n=N, semente=0, coluna='geracao'):
+    sorteio = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'instante': pd.date_range('2024-01-01', periods=n, freq='min'),
+        coluna: 5000 + np.cumsum(sorteio.normal(0, 30, n))
+    })
+
+
+def _com_picos(df, coluna='geracao'):
+    """Pico e vale de um minuto só, estreitos demais para caírem por acaso no bucket"""
+    df = df.copy()
+    pico, vale = len(df) * 2 // 9, len(df) * 5 // 7
+    df.loc[pico, coluna] = df[coluna].max() + 4000
+    df.loc[vale, coluna] = df[coluna].min() - 4000
+    return df
+
+
+@pytest.mark.parametrize('metodo', ['lttb', 'minmax'])
+@pytest.mark.parametrize('n', [N, N - 1, 1000])
+def test_reduzir_serie_mantem_pico_vale_e_orcamento(metodo, n):
+    df = _com_picos(_serie(n))
+    reduzido = reduzir_serie(df, 'geracao', ORCAMENTO, metodo)
+    # lttb/minmax cabem no orçamento; pico e vale globais entram por fora, no máximo 2 a mais
+    assert len(reduzido) <= ORCAMENTO + 2
+    assert reduzido['geracao'].max() == df['geracao'].max()
+    assert reduzido['geracao'].min() == df['geracao'].min()
+    assert reduzido['instante'].is_monotonic_increasing
+    if metodo == 'lttb':
+        # LTTB sempre mantém o primeiro e o último ponto
+        assert reduzido['instante'].iloc[[0, -1]].tolist() == df['instante'].iloc[[0, -1]].tolist()
+
+
+def test_minmax_cobre_a_serie_inteira_sem_passar_do_orcamento():
+    # 1000 pontos em 150 buckets: a sobra da divisão não pode virar pontos extras
+    y = _serie(1000)['geracao'].to_numpy()
+    indices = minmax_indices(y, 300)
+    assert len(indices) <= 300
+    assert indices[-1] >= 1000 - 1000 // 150 - 1
+
+
+def test_reduzir_serie_curta_devolve_o_mesmo_frame():
+    df = _serie(50)
+    assert reduzir_serie(df, 'geracao', ORCAMENTO) is df
+    assert reduzir_serie(None, 'geracao', ORCAMENTO) is None
+
+
+@pytest.mark.parametrize('metodo', ['lttb', 'minmax'])
+def test_reduzir_series_alinhadas_compartilham_instantes_e_extremos(metodo):
+    frames = {
+        'Hidráulica': _serie(semente=1),
+        'Eólica': _com_picos(_serie(semente=2)),
+        'Solar': _serie(semente=3).assign(geracao=lambda df: np.clip(np.sin(np.arange(N) / N * np.pi) * 3000, 0, None)),
+    }
+    reduzidos = reduzir_series_alinhadas(frames, 'geracao', ORCAMENTO, metodo)
+
+    assert list(reduzidos) == list(frames)
+    instantes = reduzidos['Hidráulica']['instante'].to_numpy()
+    for nome, df in reduzidos.items():
+        # Mesmo eixo x em todas: o empilhamento não mistura instantes diferentes
+        np.testing.assert_array_equal(df['instante'].to_numpy(), instantes)
+        assert df['geracao'].max() == frames[nome]['geracao'].max()
+        assert df['geracao'].min() == frames[nome]['geracao'].min()
+    # Orçamento da soma mais pico e vale da soma e de cada série
+    assert len(instantes) <= ORCAMENTO + 2 + 2 * len(frames)
+
+
+def test_reduzir_series_alinhadas_tamanhos_diferentes_reduz_cada_uma():
+    frames = {'Hidráulica': _com_picos(_serie()), 'Eólica': _serie(N - 60, semente=2), 'Vazia': _serie(0)}
+    reduzidos = reduzir_series_alinhadas(frames, 'geracao', ORCAMENTO)
+    assert list(reduzidos) == ['Hidráulica', 'Eólica']
+    assert reduzidos['Hidráulica']['geracao'].max() == frames['Hidráulica']['geracao'].max()
+    assert all(len(df) <= ORCAMENTO + 2 for df in reduzidos.values())
@@ -0,0 +1,137 @@
+"""ClienteONS: o prazo do lote cancela o endpoint travado; CacheSWR serve o vencido e guarda o último bom"""
+import asyncio
+import json
+import threading
+import time
+
+from ons_cliente import CacheSWR, ClienteONS
+from ons_fetch import PRAZO_CICLO, TIMEOUT, parse_carga
+from ons_metricas import FETCH_ERROS
+
+CORPO = json.dumps([{'instante': '2024-01-01T00:00:00', 'carga': 70000.0}]).encode()
+
+
+async def _servidor():
+    """HTTP local: /rapido responde na hora, /lento aceita a conexão e nunca responde"""
+    async def atender(leitor, escritor):
+        linha = await leitor.readline()
+        while (await leitor.readline()).strip():
+            pass
+        if b'/lento' in linha:
+            await leitor.read()
+            escritor.close()
+            return
+        escritor.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                       b'Content-Length: %d\r\n\r\n' % len(CORPO) + CORPO)
+        await escritor.drain()
+        escritor.close()
+    servidor = await asyncio.start_server(atender, '127.0.0.1', 0)
+    return servidor, f'http://127.0.0.1:{servidor.sockets[0].getsockname()[1]}'
+
+
+def test_prazo_padrao_menor_que_o_timeout():
+    # Senão o timeout de cada requisição estoura antes e o prazo do lote nunca cancela nada
+    assert PRAZO_CICLO < TIMEOUT
+
+
+def test_prazo_do_lote_cancela_endpoint_travado():
+    async def cenario():
+        servidor, base = await _servidor()
+        async with ClienteONS() as cliente:
+            requisicoes = {
+                'rapido': (f'{base}/rapido', parse_carga, 'carga'),
+                'lento': (f'{base}/lento', parse_carga, 'carga')
+            }
+            inicio = time.monotonic()
+            ciclo = await cliente.buscar_varios(requisicoes, prazo=0.5, timeout=TIMEOUT)
+            decorrido = time.monotonic() - inicio
+            # A requisição cancelada registra a falha na próxima volta do event loop
+            await asyncio.sleep(0.05)
+            falhas = cliente.disjuntor(f'{base}/lento').falhas
+        servidor.close()
+        return ciclo, decorrido, falhas
+
+    antes = FETCH_ERROS.valor(endpoint='lento', motivo='prazo')
+    ciclo, decorrido, falhas = asyncio.run(cenario())
+    assert decorrido < 0.5 + 1.0 < TIMEOUT
+    assert list(ciclo['dados']) == ['rapido']
+    assert len(ciclo['dados']['rapido']) == 1
+    assert ciclo['faltantes'] == ['lento']
+    # O cancelamento conta como falha do endpoint, para o disjuntor
+    assert falhas == 1
+    assert FETCH_ERROS.valor(endpoint='lento', motivo='prazo') == antes + 1
+
+
+class _BuscaControlada:
+    """buscar injetado no CacheSWR: devolve as respostas em ordem; 'liberar' segura a próxima"""
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.chamadas = 0
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def __call__(self, url, timeout):
+        self.chamadas += 1
+        self.liberar.wait(5)
+        resposta = self.respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+
+def _esperar(condicao, limite=2.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, 'revalidação não terminou'
+        time.sleep(0.005)
+
+
+def test_swr_serve_vencido_enquanto_revalida():
+    antigo, novo = [{'carga': 1}], [{'carga': 2}]
+    buscar = _BuscaControlada(antigo, novo)
+    cache = CacheSWR(ttl=60, buscar=buscar)
+    # Só a primeira busca bloqueia
+    primeiro = cache.obter('/carga')
+    assert primeiro.payload is antigo and not primeiro.stale and primeiro.versao == 1
+
+    # Vencido com a revalidação travada: o antigo sai na hora e só uma busca fica em voo
+    cache.ttl = 0
+    buscar.liberar.clear()
+    inicio = time.monotonic()
+    for _ in range(3):
+        resultado = cache.obter('/carga')
+        assert resultado.payload is antigo and resultado.stale and resultado.versao == 1
+    assert time.monotonic() - inicio < 0.5
+    _esperar(lambda: buscar.chamadas == 2)
+
+    cache.ttl = 60
+    buscar.liberar.set()
+    _esperar(lambda: cache.obter('/carga').versao == 2)
+    resultado = cache.obter('/carga')
+    assert resultado.payload is novo and not resultado.stale
+    assert buscar.chamadas == 2
+
+
+def test_swr_falha_mantem_ultimo_payload_bom():
+    bom = [{'carga': 1}]
+    # Falha (None), exceção e lista vazia: nenhuma substitui o payload bom; o mesmo objeto não avança a versão
+    buscar = _BuscaControlada(bom, None, RuntimeError('rede'), [], bom)
+    cache = CacheSWR(ttl=60, buscar=buscar)
+    cache.obter('/carga')
+
+    cache.ttl = 0
+    for chamadas in (2, 3, 4, 5):
+        resultado = cache.obter('/carga')
+        assert resultado.payload is bom and resultado.versao == 1
+        # Espera a revalidação acabar (inclusive a que levantou) antes de disparar a próxima
+        _esperar(lambda: buscar.chamadas == chamadas and '/carga' not in cache._em_voo)
+    cache.ttl = 60
+    assert cache.obter('/carga').payload is bom and buscar.chamadas == 5
+
+
+def test_swr_primeira_busca_sem_resposta():
+    cache = CacheSWR(ttl=60, buscar=_BuscaControlada(None, [{'carga': 1}]))
+    assert cache.obter('/carga') == (None, None, True, 0)
+    # Sem payload bom, a próxima leitura tenta de novo, bloqueando
+    assert cache.obter('/carga').versao == 1
@@ -0,0 +1,60 @@
+"""Estados do Disjuntor: abre após falhas seguidas, sonda uma vez e recua até o teto"""
+from ons_cliente import ESPERA_ABERTO, ESPERA_ABERTO_MAXIMA, FALHAS_PARA_ABRIR, Disjuntor
+
+
+def _abrir(disjuntor, agora=0.0):
+    for _ in range(FALHAS_PARA_ABRIR):
+        assert disjuntor.permitir(agora)
+        disjuntor.falha(agora)
+
+
+def test_abre_so_depois_de_falhas_seguidas():
+    disjuntor = Disjuntor()
+    for _ in range(FALHAS_PARA_ABRIR - 1):
+        disjuntor.falha(0.0)
+        assert disjuntor.estado == Disjuntor.FECHADO
+        assert disjuntor.permitir(0.0)
+    disjuntor.falha(0.0)
+    assert disjuntor.estado == Disjuntor.ABERTO
+    assert disjuntor.aberto_ate == ESPERA_ABERTO
+
+
+def test_sucesso_zera_as_falhas():
+    disjuntor = Disjuntor()
+    for _ in range(FALHAS_PARA_ABRIR - 1):
+        disjuntor.falha(0.0)
+    disjuntor.sucesso()
+    disjuntor.falha(0.0)
+    assert disjuntor.estado == Disjuntor.FECHADO
+
+
+def test_recusa_enquanto_aberto_e_sonda_uma_vez():
+    disjuntor = Disjuntor()
+    _abrir(disjuntor)
+    assert not disjuntor.permitir(ESPERA_ABERTO - 0.1)
+    assert disjuntor.permitir(ESPERA_ABERTO)
+    assert disjuntor.estado == Disjuntor.MEIO_ABERTO
+    # Só uma sondagem em voo
+    assert not disjuntor.permitir(ESPERA_ABERTO)
+    disjuntor.sucesso()
+    assert disjuntor.estado == Disjuntor.FECHADO
+    assert disjuntor.permitir(ESPERA_ABERTO)
+
+
+def test_sondagem_que_falha_dobra_a_espera_ate_o_maximo():
+    disjuntor = Disjuntor()
+    _abrir(disjuntor)
+    agora, esperada = 0.0, ESPERA_ABERTO
+    for _ in range(10):
+        agora = disjuntor.aberto_ate
+        assert disjuntor.permitir(agora)
+        disjuntor.falha(agora)
+        esperada = min(esperada * 2, ESPERA_ABERTO_MAXIMA)
+        assert disjuntor.estado == Disjuntor.ABERTO
+        assert disjuntor.aberto_ate == agora + esperada
+    assert esperada == ESPERA_ABERTO_MAXIMA
+    # Fechar devolve a espera inicial para a próxima abertura
+    disjuntor.permitir(disjuntor.aberto_ate)
+    disjuntor.sucesso()
+    _abrir(disjuntor, agora)
+    assert disjuntor.aberto_ate == agora + ESPERA_ABERTO
@@ -0,0 +1,88 @@
+"""DetectorFrequencia: faixas, excursões com nadir e ROCOF, leitura só das amostras novas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ons_frequencia import ATENCAO, CRITICO, NORMAL, DetectorFrequencia, classificar
+
+
+def _serie(valores, inicio='2024-01-01T00:00', freq='min'):
+    return pd.DataFrame({
+        'instante': pd.date_range(inicio, periods=len(valores), freq=freq),
+        'frequencia': np.asarray(valores, dtype=float)
+    })
+
+
+@pytest.mark.parametrize('valor, faixa', [
+    (60.0, NORMAL), (59.9, NORMAL), (60.1, NORMAL),
+    (59.89, ATENCAO), (60.5, ATENCAO), (59.5, ATENCAO),
+    (59.49, CRITICO), (60.51, CRITICO)
+])
+def test_classificar(valor, faixa):
+    assert classificar(valor) == faixa
+
+
+def test_excursao_aberta_e_encerrada():
+    # Minuto a minuto: cai até 59,4 Hz e volta à faixa normal no minuto 5
+    detector = DetectorFrequencia()
+    df = _serie([60.0, 59.85, 59.6, 59.4, 59.7, 60.0, 60.02])
+
+    estado = detector.atualizar(df.iloc[:4])
+    assert estado.faixa == CRITICO
+    assert estado.evento is not None and estado.evento.fim is None
+    assert estado.eventos == ()
+
+    estado = detector.atualizar(df)
+    assert estado.evento is None
+    evento, = estado.eventos
+    assert evento.sentido == 'sub'
+    assert evento.severidade == CRITICO
+    assert evento.nadir == pytest.approx(59.4)
+    assert evento.duracao == 4 * 60
+    assert evento.amostras == 4
+    assert evento.inicio == np.datetime64('2024-01-01T00:01', 's')
+    assert evento.fim == np.datetime64('2024-01-01T00:05', 's')
+    # Maior |df/dt| dentro da excursão: 0,3 Hz em 60 s
+    assert evento.rocof == pytest.approx(0.3 / 60)
+
+
+def test_cruzar_direto_para_o_outro_lado_abre_outra_excursao():
+    detector = DetectorFrequencia()
+    estado = detector.atualizar(_serie([60.0, 59.8, 60.2, 60.0]))
+    assert [evento.sentido for evento in estado.eventos] == ['sub', 'sobre']
+
+
+def test_atualizar_le_so_amostras_novas():
+    detector = DetectorFrequencia()
+    df = _serie([60.0, 59.8, 59.7])
+    detector.atualizar(df)
+    # Pontos já vistos, mesmo revisados, não são relidos
+    revisado = df.copy()
+    revisado.loc[1, 'frequencia'] = 58.0
+    estado = detector.atualizar(revisado)
+    assert len(detector) == 3
+    assert estado.evento.nadir == pytest.approx(59.7)
+    estado = detector.atualizar(_serie([60.0, 59.8, 59.7, 60.0]))
+    assert len(detector) == 4
+    assert estado.eventos[-1].nadir == pytest.approx(59.7)
+
+
+def test_ignora_nan_e_fora_de_ordem():
+    detector = DetectorFrequencia()
+    detector.adicionar(np.datetime64('2024-01-01T00:01'), 60.0)
+    detector.adicionar(np.datetime64('2024-01-01T00:00'), 59.0)
+    detector.adicionar(np.datetime64('2024-01-01T00:02'), np.nan)
+    assert len(detector) == 1
+    assert detector.estado().faixa == NORMAL
+
+
+def test_anel_guarda_as_ultimas_amostras():
+    detector = DetectorFrequencia(capacidade=8)
+    valores = 60 + np.arange(20) / 1000
+    detector.atualizar(_serie(valores))
+    assert len(detector) == 8
+    instantes, recentes = detector.recentes()
+    np.testing.assert_array_equal(recentes, valores[-8:])
+    np.testing.assert_array_equal(instantes, _serie(valores)['instante'].to_numpy()[-8:].astype('datetime64[s]'))
+    _, ultimas = detector.recentes(3)
+    np.testing.assert_array_equal(ultimas, valores[-3:])
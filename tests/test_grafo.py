@@ -0,0 +1,94 @@
+"""Grafo: só os nós sujos recalculam e o corte antecipado segura os dependentes"""
+from collections import Counter
+
+import pandas as pd
+
+from ons_grafo import Grafo, _igual
+from ons_metricas import GRAFO_RECALCULOS
+
+
+def _grafo():
+    """a, b -> soma -> dobro; a -> sinal; chamadas conta quantas vezes cada nó rodou"""
+    grafo, chamadas = Grafo(), Counter()
+
+    def no(nome, dependencias, funcao):
+        def contada(*valores):
+            chamadas[nome] += 1
+            return funcao(*valores)
+        grafo.no(nome, dependencias, contada)
+
+    no('soma', ['a', 'b'], lambda a, b: a + b)
+    no('dobro', ['soma'], lambda soma: soma * 2)
+    no('sinal', ['a'], lambda a: a >= 0)
+    return grafo, chamadas
+
+
+def test_so_os_nos_sujos_recalculam():
+    grafo, chamadas = _grafo()
+    assert grafo.calcular({'a': 1, 'b': 2}, ['dobro', 'sinal']) == {'dobro': 6, 'sinal': True}
+    assert chamadas == {'soma': 1, 'dobro': 1, 'sinal': 1}
+
+    # Nada mudou: nenhuma função roda
+    grafo.calcular({'a': 1, 'b': 2}, ['dobro', 'sinal'])
+    assert chamadas == {'soma': 1, 'dobro': 1, 'sinal': 1}
+
+    # Só b mudou: 'sinal' depende só de a e fica de fora
+    recalculos_sinal = GRAFO_RECALCULOS.valor(no='sinal')
+    assert grafo.calcular({'a': 1, 'b': 5}, ['dobro', 'sinal']) == {'dobro': 12, 'sinal': True}
+    assert chamadas == {'soma': 2, 'dobro': 2, 'sinal': 1}
+    assert GRAFO_RECALCULOS.valor(no='sinal') == recalculos_sinal
+
+
+def test_entrada_versionada_por_identidade():
+    grafo, chamadas = _grafo()
+    frame = pd.DataFrame({'x': [1.0]})
+    grafo.no('linhas', ['serie'], lambda df: chamadas.update(['linhas']) or len(df))
+    assert grafo.calcular({'serie': frame}, ['linhas']) == {'linhas': 1}
+    versao = grafo.versao('serie')
+
+    # Mesmo objeto: não avança nem recalcula, ainda que o conteúdo seja o mesmo de outro frame
+    grafo.entrada('serie', frame)
+    assert grafo.versao('serie') == versao
+    grafo.entrada('serie', frame.copy())
+    assert grafo.versao('serie') == versao + 1
+    grafo.valor('linhas')
+    assert chamadas['linhas'] == 2
+
+
+def test_corte_antecipado_resultado_igual_nao_avanca_versao():
+    grafo, chamadas = _grafo()
+    grafo.calcular({'a': 1, 'b': 2}, ['dobro'])
+    versao_soma = grafo.versao('soma')
+
+    # a e b mudaram mas a soma é a mesma: soma roda, dobro não
+    assert grafo.calcular({'a': 2, 'b': 1}, ['dobro']) == {'dobro': 6}
+    assert chamadas == {'soma': 2, 'dobro': 1}
+    assert grafo.versao('soma') == versao_soma
+
+    # Dict igual também corta
+    grafo.no('resumo', ['a'], lambda a: {'positivo': a > 0})
+    grafo.no('texto', ['resumo'], lambda resumo: chamadas.update(['texto']) or str(resumo))
+    grafo.valor('texto')
+    grafo.entrada('a', 3)
+    grafo.valor('texto')
+    assert chamadas['texto'] == 1
+
+
+def test_resultado_dataframe_sempre_conta_como_novo():
+    grafo = Grafo()
+    grafo.no('frame', ['a'], lambda a: pd.DataFrame({'x': [1.0]}))
+    grafo.entrada('a', 1)
+    versao = grafo.versao('frame')
+    grafo.entrada('a', 2)
+    assert grafo.versao('frame') == versao + 1
+
+
+def test_igual_nao_propaga_erro_de_comparacao():
+    frame = pd.DataFrame({'x': [1.0, 2.0]})
+    # Dicts com frames: == vira ValueError (verdade ambígua) e conta como diferente
+    assert not _igual({'df': frame}, {'df': frame.copy()})
+    assert _igual({'df': frame}, {'df': frame})  # mesmo objeto dentro: dict compara por identidade primeiro
+    assert not _igual(frame, frame.copy())
+    assert not _igual(1, 1.0)
+    assert _igual((1, 'a'), (1, 'a'))
+    assert not _igual(float('nan'), float('nan'))
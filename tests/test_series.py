@@ -0,0 +1,202 @@
+"""SerieIncremental e SeriesStore: cauda nova, virada de dia, revisões e partida a quente"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ons_fetch
+from ons_fetch import decodificar_colunas, parse_carga, parse_geracao
+from ons_series import CAPACIDADE_INICIAL, SerieIncremental, SeriesStore, agregar_series
+
+
+def _itens(n, inicio='2024-01-01T00:00', coluna='carga', base=70000.0):
+    instantes = pd.date_range(inicio, periods=n, freq='min').strftime(ons_fetch.FORMATO_INSTANTE)
+    return [{'instante': t, coluna: base + i} for i, t in enumerate(instantes)]
+
+
+def _payload(itens, coluna='carga'):
+    """Como o cliente entrega: bytes da API decodificados em Colunas ainda não convertidas"""
+    return decodificar_colunas(json.dumps(itens).encode(), coluna)
+
+
+def _esperado(itens, parser=parse_carga):
+    return parser(ons_fetch.colunas_do_payload(itens, parser.__name__.split('_')[1]))
+
+
+def _conferir(frame, esperado):
+    np.testing.assert_array_equal(frame['instante'].to_numpy(), esperado['instante'].to_numpy())
+    np.testing.assert_array_equal(frame.iloc[:, 1].to_numpy(), esperado.iloc[:, 1].to_numpy())
+
+
+@pytest.fixture
+def conversoes(monkeypatch):
+    """Tamanho de cada lista de instantes convertida"""
+    tamanhos = []
+    original = ons_fetch.converter_instantes
+
+    def contar(textos):
+        tamanhos.append(len(textos))
+        return original(textos)
+    monkeypatch.setattr(ons_fetch, 'converter_instantes', contar)
+    return tamanhos
+
+
+def test_payloads_crescentes_viram_so_a_cauda(conversoes):
+    itens = _itens(600)
+    esperado = _esperado(itens)
+    serie = SerieIncremental('carga', parse_carga)
+    del conversoes[:]
+    assert len(serie.ingerir(_payload(itens[:500]))) == 500
+    convertidos, anterior = [], 500
+    for fim in (501, 503, 503, 560, 600):
+        antes = len(conversoes)
+        delta = serie.ingerir(_payload(itens[:fim]))
+        convertidos.append(sum(conversoes[antes:]))
+        _conferir(delta, esperado.iloc[anterior:fim])
+        _conferir(serie.frame(), esperado.iloc[:fim])
+        anterior = fim
+    # Depois da primeira leitura, só os pontos novos são convertidos
+    assert convertidos == [1, 2, 0, 57, 40]
+
+
+def test_mesmo_payload_nao_gera_delta():
+    serie = SerieIncremental('carga', parse_carga)
+    payload = _payload(_itens(10))
+    serie.ingerir(payload)
+    frame = serie.frame()
+    assert serie.ingerir(payload).empty
+    assert serie.ingerir(_payload(_itens(10))).empty
+    assert serie.frame() is frame
+
+
+def test_frame_entregue_nao_muda_quando_a_serie_cresce():
+    itens = _itens(CAPACIDADE_INICIAL + 10)
+    serie = SerieIncremental('carga', parse_carga)
+    serie.ingerir(_payload(itens[:100]))
+    anterior = serie.frame()
+    copia = anterior.copy()
+    # Cresce dentro da capacidade e depois realoca os arrays
+    serie.ingerir(_payload(itens[:200]))
+    serie.ingerir(_payload(itens))
+    pd.testing.assert_frame_equal(anterior, copia)
+    _conferir(serie.frame(), _esperado(itens))
+
+
+def test_virada_de_dia_recomeca_a_serie():
+    serie = SerieIncremental('carga', parse_carga)
+    serie.ingerir(_payload(_itens(1440)))
+    novo_dia = _itens(3, inicio='2024-01-02T00:00', base=60000.0)
+    delta = serie.ingerir(_payload(novo_dia))
+    assert len(delta) == 3
+    _conferir(serie.frame(), _esperado(novo_dia))
+    assert serie.dia == np.datetime64('2024-01-02')
+
+
+def test_revisao_de_ponto_ja_visto_nao_reescreve_a_serie():
+    # Só pontos posteriores ao último instante entram; revisões dos já vistos são ignoradas
+    itens = _itens(20)
+    serie = SerieIncremental('carga', parse_carga)
+    serie.ingerir(_payload(itens[:10]))
+    revisados = [dict(item) for item in itens[:12]]
+    revisados[9]['carga'] = 1.0
+    delta = serie.ingerir(_payload(revisados))
+    _conferir(delta, _esperado(itens[10:12]))
+    _conferir(serie.frame(), _esperado(itens[:12]))
+
+
+def test_revisao_do_primeiro_ponto_cai_no_caminho_completo(conversoes):
+    itens = _itens(20)
+    serie = SerieIncremental('carga', parse_carga)
+    serie.ingerir(_payload(itens[:10]))
+    revisados = [dict(item) for item in itens[:12]]
+    revisados[0]['instante'] = revisados[0]['instante'][:-3]  # mesmo instante, outro texto
+    del conversoes[:]
+    delta = serie.ingerir(_payload(revisados))
+    # Primeiro texto diferente: o payload inteiro é convertido para achar a cauda
+    assert conversoes == [12]
+    _conferir(delta, _esperado(itens[10:12]))
+
+
+def test_pontos_sem_instante_no_fim_sao_ignorados():
+    itens = _itens(5) + [{'instante': None, 'carga': 1.0}]
+    serie = SerieIncremental('carga', parse_carga)
+    serie.ingerir(_payload(itens))
+    assert serie.ultimo_instante == np.datetime64('2024-01-01T00:04')
+    delta = serie.ingerir(_payload(_itens(6)))
+    _conferir(delta, _esperado(_itens(6)[5:]))
+
+
+def test_restaurar_serve_o_disco_ate_o_primeiro_payload():
+    store = SeriesStore()
+    gravado = _esperado(_itens(30))
+    store.restaurar('Carga', gravado, parse_carga, 'carga')
+    _conferir(store.frames()['Carga'], gravado)
+    assert store.ultimo_instante('Carga') is None
+
+    # O primeiro payload real substitui o que veio do disco, inteiro
+    itens = _itens(40, base=50000.0)
+    delta = store.ingerir('Carga', _payload(itens), parse_carga, 'carga')
+    assert len(delta) == 40
+    _conferir(store.frames()['Carga'], _esperado(itens))
+    # E daí em diante volta a ler só a cauda
+    delta = store.ingerir('Carga', _payload(_itens(42, base=50000.0)), parse_carga, 'carga')
+    assert len(delta) == 2
+
+
+def test_store_separa_as_series_por_chave():
+    store = SeriesStore()
+    geracao = _itens(10, coluna='geracao', base=100.0)
+    store.ingerir('Carga', _payload(_itens(5)), parse_carga, 'carga')
+    store.ingerir('Solar - Sul', _payload(geracao, 'geracao'), parse_geracao, 'geracao')
+    frames = store.frames()
+    assert set(frames) == {'Carga', 'Solar - Sul'}
+    _conferir(frames['Solar - Sul'], _esperado(geracao, parse_geracao))
+    assert store.ultimo_instante('Carga') == np.datetime64('2024-01-01T00:04')
+
+
+def _referencia_groupby(dataframes):
+    """Soma por fonte, região e SIN com pandas: último valor de cada série até o instante (merge_asof) e groupby"""
+    instantes = pd.DataFrame({'instante': np.unique(np.concatenate([df['instante'].to_numpy() for df in dataframes.values()]))})
+    linhas = []
+    for chave, df in dataframes.items():
+        fonte, regiao = chave.split(' - ')
+        serie = df.drop_duplicates('instante', keep='last').sort_values('instante')
+        alinhada = pd.merge_asof(instantes, serie, on='instante')
+        linhas.append(alinhada.assign(fonte=fonte, regiao=regiao))
+    longa = pd.concat(linhas, ignore_index=True)
+    return (
+        longa.groupby(['instante', 'fonte'])['geracao'].sum().unstack(),
+        longa.groupby(['instante', 'regiao'])['geracao'].sum().unstack(),
+        longa.groupby('instante')['geracao'].sum()
+    )
+
+
+def test_agregar_series_desalinhadas_igual_groupby():
+    sorteio = np.random.default_rng(0)
+    inicio = pd.Timestamp('2024-01-01')
+
+    def serie(passo, deslocamento, n):
+        instantes = inicio + pd.to_timedelta(deslocamento + passo * np.arange(n), unit='s')
+        return pd.DataFrame({'instante': instantes, 'geracao': sorteio.uniform(100, 1000, n)})
+
+    dataframes = {
+        'Hidráulica - Norte': serie(60, 0, 120),
+        'Hidráulica - Sul': serie(120, 30, 50),      # metade da cadência, meio minuto depois
+        'Eólica - Nordeste': serie(60, 600, 90),     # começa 10 min depois
+        'Solar - Sul': serie(60, 0, 60),             # termina uma hora antes
+    }
+    # Instante repetido: vale o último
+    dataframes['Solar - Sul'] = pd.concat([dataframes['Solar - Sul'], dataframes['Solar - Sul'].iloc[[10]].assign(geracao=1.0)])
+    dataframes['Solar - Sul'] = dataframes['Solar - Sul'].sort_values('instante', kind='stable')
+
+    agregado = agregar_series(dataframes)
+    por_fonte, por_regiao, sin = _referencia_groupby(dataframes)
+    pd.testing.assert_frame_equal(agregado.por_fonte[por_fonte.columns], por_fonte, check_names=False, check_freq=False)
+    pd.testing.assert_frame_equal(agregado.por_regiao[por_regiao.columns], por_regiao, check_names=False, check_freq=False)
+    pd.testing.assert_series_equal(agregado.sin, sin, check_names=False, check_freq=False)
+
+
+def test_agregar_series_ignora_vazias():
+    assert agregar_series({}) is None
+    assert agregar_series({'Solar - Sul': pd.DataFrame(columns=['instante', 'geracao'])}) is None